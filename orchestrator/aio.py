@@ -0,0 +1,206 @@
+# orchestrator/aio.py
+"""Blocking file work off the event loop.
+
+Agents stream many responses concurrently on one event loop; every synchronous
+read_text / write_text / mkdir / yaml.safe_load between two stream chunks
+stalls all other streams. ClaudeAgent hands that work to AsyncIO instead:
+
+  run()          a bounded thread pool (pipeline.yaml `async_io.max_workers`);
+                 the caller's context variables (tracing spans) carry over
+  write_files()  all files of one response in one job: each parent directory
+                 is created once, and directories already created by this
+                 process are not stat()ed again
+  atomic_write() temp file next to the target + os.replace — readers never
+                 see a half-written file
+
+A LoopLagMonitor runs on the loop while work is offloaded and samples how late
+its own wake-ups are: how long the loop was blocked. stats() reports the
+distribution (benchmark.py prints it per scale).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, TypeVar
+
+if TYPE_CHECKING:       # config.py writes its parse cache through atomic_write
+    from .config import PipelineConfig
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_LAG_INTERVAL = 0.05
+# Lag samples kept for the percentiles
+_LAG_SAMPLES = 4096
+
+# Directories this process has created (or found) already
+_known_dirs: set[Path] = set()
+_dirs_lock = threading.Lock()
+# Temp-file suffixes are unique per write (parallel products share state files)
+_tmp_ids = itertools.count()
+
+
+# ── Synchronous helpers (run inside the pool) ──────────────────────────────
+
+def ensure_dirs(paths: Iterable[Path]) -> None:
+    """Create the parent directories of all paths, each distinct one once."""
+    with _dirs_lock:
+        missing = {Path(p).parent for p in paths} - _known_dirs
+    for directory in sorted(missing):
+        directory.mkdir(parents=True, exist_ok=True)
+    with _dirs_lock:
+        _known_dirs.update(missing)
+
+
+def atomic_write(path: Path, data: str | bytes) -> None:
+    """Write text (UTF-8) or bytes via a temp file unique to this write + rename;
+    recreates the directory if it was removed since ensure_dirs() saw it. The one
+    atomic writer of the package: concurrent writers of a file never share a temp."""
+    path = Path(path)
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    ensure_dirs([path])
+    tmp = path.with_name(f".{path.name}.{os.getpid()}-{next(_tmp_ids)}.tmp")
+    try:
+        try:
+            tmp.write_bytes(payload)
+        except FileNotFoundError:
+            with _dirs_lock:
+                _known_dirs.discard(path.parent)
+            ensure_dirs([path])
+            tmp.write_bytes(payload)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_files(files: list[tuple[Path, str]]) -> None:
+    """Several files in one go: directories first (batched), then each file atomically."""
+    ensure_dirs(path for path, _ in files)
+    for path, text in files:
+        atomic_write(path, text)
+
+
+# ── Loop lag ───────────────────────────────────────────────────────────────
+
+class LoopLagMonitor:
+    """Samples how late a periodic wake-up on the event loop fires."""
+
+    def __init__(self, interval: float = DEFAULT_LAG_INTERVAL):
+        self.interval = interval
+        self._samples: deque[float] = deque(maxlen=_LAG_SAMPLES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag = 0.0
+        self.count = 0
+
+    def attach(self) -> None:
+        """Start sampling on the running loop (once per loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._watch(), name="loop-lag-monitor")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._task = self._loop = None
+
+    async def _watch(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._samples.append(lag)
+            self.count += 1
+            self.max_lag = max(self.max_lag, lag)
+
+    def reset(self) -> None:
+        self._samples.clear()
+        self.max_lag = 0.0
+        self.count = 0
+
+    def stats(self) -> dict[str, float]:
+        """Lag in ms over the recent samples (max: since the last reset)."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "mean_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def pct(q: float) -> float:
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+
+        return {
+            "samples": self.count,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_lag * 1000, 2),
+        }
+
+
+# ── Pool ───────────────────────────────────────────────────────────────────
+
+class AsyncIO:
+    """Bounded thread pool for blocking file work, plus loop-lag sampling."""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 lag_interval: float = DEFAULT_LAG_INTERVAL):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aio")
+        self.lag = LoopLagMonitor(lag_interval)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self.queued_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["AsyncIO"]:
+        """Build from pipeline.yaml `async_io`; None if disabled."""
+        settings = config.async_io()
+        if not settings.get("enabled", False):
+            return None
+        return cls(
+            max_workers=int(settings.get("max_workers", DEFAULT_MAX_WORKERS)),
+            lag_interval=settings.get("lag_interval_ms", DEFAULT_LAG_INTERVAL * 1000) / 1000,
+        )
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """fn(*args, **kwargs) in the pool, with the caller's context variables."""
+        self.lag.attach()
+        submitted = time.perf_counter()
+        ctx = contextvars.copy_context()
+
+        def job() -> T:
+            started = time.perf_counter()
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.calls += 1
+                    self.queued_seconds += started - submitted
+                    self.busy_seconds += finished - started
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, job)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "busy_s": round(self.busy_seconds, 4),
+                "queued_s": round(self.queued_seconds, 4),
+                "loop_lag": self.lag.stats(),
+            }
+
+    def shutdown(self) -> None:
+        self.lag.stop()
+        self._pool.shutdown(wait=True)
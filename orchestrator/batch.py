@@ -0,0 +1,221 @@
+# orchestrator/batch.py
+"""Message Batches execution for non-interactive agents.
+
+Agents in phases without a human checkpoint (`checkpoint: none`) are not
+latency-sensitive. With `batch_execution.enabled`, ClaudeAgent hands their
+requests to a BatchExecutor instead of streaming them: requests that become
+ready within `collect_seconds` of each other — across agents and products —
+are submitted as one Message Batch, polled until the batch has ended, and
+every caller gets its own message back. Output files and outcome checks then
+run through the usual ClaudeAgent path.
+
+Batches are billed at a discount and count against a separate batch queue
+limit instead of the per-minute token limits of the streaming API.
+For local runs, point ANTHROPIC_BASE_URL at orchestrator/mock_server.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .config import PipelineConfig
+
+# custom_id must match ^[a-zA-Z0-9_-]{1,64}$
+_CUSTOM_ID_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class BatchRequestError(RuntimeError):
+    """A batched request came back errored, canceled or expired."""
+
+
+@dataclass
+class _Pending:
+    custom_id: str
+    params: dict[str, Any]
+    future: asyncio.Future
+
+
+class BatchExecutor:
+    """Collects ready requests into Message Batches and resolves them on completion."""
+
+    def __init__(
+        self,
+        client: Any,
+        agent_ids: set[str],
+        collect_seconds: float = 2.0,
+        max_requests: int = 1000,
+        poll_interval: float = 30.0,
+        max_wait_seconds: float = 24 * 3600,
+        verbose: bool = False,
+    ):
+        # The AsyncAnthropic client, or a zero-argument callable that returns
+        # it: built on the first batch, not when the executor is configured
+        self._client = client
+        self.agent_ids = agent_ids
+        self.collect_seconds = collect_seconds
+        self.max_requests = max_requests
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+        self.verbose = verbose
+        self._queue: list[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        self.batches = 0
+        self.requests = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(
+        cls, config: PipelineConfig, client: Any, verbose: bool = False
+    ) -> Optional["BatchExecutor"]:
+        """Build from pipeline.yaml `batch_execution`; None if disabled."""
+        settings = config.batch_execution()
+        if not settings.get("enabled", False):
+            return None
+        return cls(
+            client,
+            batchable_agents(config, settings.get("phases")),
+            collect_seconds=float(settings.get("collect_seconds", 2.0)),
+            max_requests=int(settings.get("max_requests", 1000)),
+            poll_interval=float(settings.get("poll_interval_seconds", 30.0)),
+            max_wait_seconds=float(settings.get("max_wait_hours", 24)) * 3600,
+            verbose=verbose,
+        )
+
+    @property
+    def client(self) -> Any:
+        if callable(self._client) and not hasattr(self._client, "messages"):
+            self._client = self._client()
+        return self._client
+
+    def accepts(self, agent_cfg: dict[str, Any]) -> bool:
+        return agent_cfg["id"] in self.agent_ids and agent_cfg.get("batch", True) is not False
+
+    # ── Submission ─────────────────────────────────────────────────────────
+
+    async def submit(self, params: dict[str, Any], label: str = "req") -> Any:
+        """Queue one messages request; return its Message once the batch has ended."""
+        loop = asyncio.get_running_loop()
+        seq = next(self._seq)
+        custom_id = f"{_CUSTOM_ID_CHARS.sub('_', label)[:48]}-{seq}"
+        pending = _Pending(custom_id, params, loop.create_future())
+        self._queue.append(pending)
+        self.requests += 1
+
+        if len(self._queue) >= self.max_requests:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.collect_seconds, self.flush)
+        return await pending.future
+
+    def flush(self) -> None:
+        """Submit everything queued so far as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._queue = self._queue, []
+        if not items:
+            return
+        task = asyncio.ensure_future(self._run_batch(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        """Flush the queue and wait for all submitted batches to finish."""
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ── Batch lifecycle ────────────────────────────────────────────────────
+
+    async def _run_batch(self, items: list[_Pending]) -> None:
+        by_id = {p.custom_id: p for p in items}
+        try:
+            batch = await self.client.messages.batches.create(requests=[
+                {"custom_id": p.custom_id, "params": p.params} for p in items
+            ])
+            self.batches += 1
+            if self.verbose:
+                print(f"  ⏳ batch {batch.id}: {len(items)} request(s) submitted")
+
+            start = time.monotonic()
+            while batch.processing_status != "ended":
+                if time.monotonic() - start > self.max_wait_seconds:
+                    await self.client.messages.batches.cancel(batch.id)
+                    raise BatchRequestError(
+                        f"Batch {batch.id} did not end within {self.max_wait_seconds:.0f}s"
+                    )
+                await asyncio.sleep(self.poll_interval)
+                batch = await self.client.messages.batches.retrieve(batch.id)
+
+            if self.verbose:
+                print(f"  ✓ batch {batch.id} ended after {time.monotonic() - start:.0f}s")
+
+            async for entry in await self.client.messages.batches.results(batch.id):
+                pending = by_id.pop(entry.custom_id, None)
+                if pending is None or pending.future.done():
+                    continue
+                result = entry.result
+                if result.type == "succeeded":
+                    self.succeeded += 1
+                    pending.future.set_result(result.message)
+                else:
+                    self.failed += 1
+                    detail = getattr(result, "error", None)
+                    pending.future.set_exception(BatchRequestError(
+                        f"Batched request {entry.custom_id} {result.type}"
+                        + (f": {detail}" if detail else "")
+                    ))
+            for pending in by_id.values():
+                if not pending.future.done():
+                    self.failed += 1
+                    pending.future.set_exception(BatchRequestError(
+                        f"No result for {pending.custom_id} in batch {batch.id}"
+                    ))
+        except BaseException as exc:
+            for pending in by_id.values():
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "queued": len(self._queue),
+        }
+
+
+def batchable_agents(config: PipelineConfig, phases: Optional[list[str]] = None) -> set[str]:
+    """Agent ids eligible for batching: single-pass agents in the given phases,
+    or — by default — in every phase without a human checkpoint."""
+    agent_ids: set[str] = set()
+    for phase in config.phase_templates():
+        if phases is not None:
+            if phase["id"] not in phases:
+                continue
+        elif phase.get("checkpoint", "none") != "none":
+            continue
+        for agent_cfg in phase.get("agents", []):
+            # Pass 2 needs Pass 1's plan: two round trips through the queue
+            if agent_cfg.get("thinking_strategy") == "two_pass":
+                continue
+            agent_ids.add(agent_cfg["id"])
+    return agent_ids
+
+
+def message_text(message: Any) -> str:
+    """Concatenated text blocks of a Message (thinking blocks are skipped)."""
+    return "".join(
+        block.text for block in message.content if getattr(block, "type", "") == "text"
+    )
@@ -0,0 +1,332 @@
+# orchestrator/benchmark.py
+"""Orchestrator benchmark: the real pipeline.yaml DAG against the mock API.
+
+Runs N products concurrently through DagScheduler + ClaudeAgent (streaming,
+result cache, context store, tracing — everything but the model) against
+orchestrator/mock_server.py in a subprocess, and reports per scale:
+
+  wall_s            wall-clock time for all N pipelines
+  critical_path_s   longest dependency chain of measured agent times (mean per product)
+  efficiency        critical_path_s / the product's own wall time (1.0 = no queueing
+                    or scheduling overhead on top of generation)
+  cpu_ms_per_agent  orchestrator process CPU per agent run (server CPU excluded)
+  peak_rss_mb       peak RSS of this process so far (scales run in ascending order)
+  connection_waits  requests that found every pooled connection busy (client.py)
+  loop_lag_*_ms     event-loop lag sampled by aio.LoopLagMonitor (p95 / max): how
+                    long file work or parsing blocked all other streams
+
+Usage:
+  python3 -m orchestrator.benchmark
+  python3 -m orchestrator.benchmark --scales 1,5 --tier simple --json bench.json
+  python3 -m orchestrator.benchmark --baseline bench.json --max-regression 0.25   # CI
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .claude_agent import ClaudeAgent
+from .client import ClientPool
+from .config import PipelineConfig
+from .context_store import ContextStore
+from .scheduler import AgentNode, DagScheduler
+from .tracing import Span, Tracer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Everything agents read as context (prompts, policies, intake schema)
+_WORKSPACE_DIRS = ("agents", "governance", "exploration", "intake")
+
+DEFAULT_SCALES = (1, 5, 20, 100)
+
+ClientFactory = Callable[[str], Any]
+
+
+@dataclass
+class ScaleResult:
+    products: int
+    wall_s: float
+    agent_runs: int
+    failed: int
+    critical_path_s: float
+    efficiency: float
+    cpu_s: float
+    cpu_ms_per_agent: float
+    peak_rss_mb: float
+    semaphore_wait_s: float      # mean per agent run
+    ttft_s: float                # mean per stream
+    loop_lag_p95_ms: float = 0.0
+    loop_lag_max_ms: float = 0.0
+    connection_waits: int = 0
+
+
+class _CollectingTracer(Tracer):
+    """Keeps each finished run's spans in memory instead of writing a file."""
+
+    def __init__(self) -> None:
+        super().__init__(enabled=True)
+        self.runs: dict[str, list[Span]] = {}
+
+    def export_run(self, product_id: str) -> Optional[Path]:
+        self.runs[product_id] = self.drain(product_id)
+        return None
+
+
+# ── Mock server ────────────────────────────────────────────────────────────
+
+class MockServerProcess:
+    """mock_server.py in a subprocess, so its CPU is not counted as orchestrator CPU."""
+
+    def __init__(self, latency_ms: float, tokens_per_sec: float, error_rate: float,
+                 file_bytes: int, seed: int = 0, connect_ms: float = 0.0):
+        self.args = [
+            sys.executable, "-m", "orchestrator.mock_server", "--port", "0",
+            "--latency-ms", str(latency_ms), "--tokens-per-sec", str(tokens_per_sec),
+            "--error-rate", str(error_rate), "--file-bytes", str(file_bytes), "--seed", str(seed),
+            "--connect-ms", str(connect_ms),
+        ]
+        self.proc: Optional[subprocess.Popen] = None
+        self.base_url = ""
+
+    def __enter__(self) -> "MockServerProcess":
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            p for p in (str(REPO_ROOT), os.environ.get("PYTHONPATH", "")) if p
+        ))
+        self.proc = subprocess.Popen(self.args, cwd=REPO_ROOT, env=env,
+                                     stdout=subprocess.PIPE, text=True)
+        banner = self.proc.stdout.readline()
+        if "http://" not in banner:
+            self.proc.kill()
+            raise RuntimeError(f"mock_server did not start: {banner!r}")
+        self.base_url = banner.split()[4]
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait(timeout=10)
+
+
+# ── Workspace ──────────────────────────────────────────────────────────────
+
+def make_workspace(products: int, intake: Path) -> tuple[Path, list[str]]:
+    """Temp base_dir with pipeline.yaml, agent prompts, policies and N intake files."""
+    base = Path(tempfile.mkdtemp(prefix="orchestrator-bench-"))
+    shutil.copy(REPO_ROOT / "pipeline.yaml", base / "pipeline.yaml")
+    for name in _WORKSPACE_DIRS:
+        if (REPO_ROOT / name).is_dir():
+            shutil.copytree(REPO_ROOT / name, base / name)
+    (base / "intake").mkdir(exist_ok=True)
+    product_ids = [f"bench-{i:03d}" for i in range(products)]
+    for pid in product_ids:
+        shutil.copy(intake, base / "intake" / f"{pid}.yaml")
+    return base, product_ids
+
+
+def critical_path_seconds(nodes: dict[str, AgentNode], durations: dict[str, float]) -> float:
+    """Longest dependency chain, weighting each agent with its measured time."""
+    finish: dict[str, float] = {}
+
+    def visit(nid: str) -> float:
+        if nid not in finish:
+            start = max((visit(dep) for dep in nodes[nid].deps), default=0.0)
+            finish[nid] = start + durations.get(nid, 0.0)
+        return finish[nid]
+
+    return max((visit(nid) for nid in nodes), default=0.0)
+
+
+# ── Benchmark ──────────────────────────────────────────────────────────────
+
+async def run_scale(
+    products: int,
+    base_url: str,
+    tier: Optional[str],
+    intake: Path,
+    max_concurrency: int,
+    client_factory: Optional[ClientFactory] = None,
+    use_limiter: bool = False,
+    keep: bool = False,
+) -> ScaleResult:
+    base, product_ids = make_workspace(products, intake)
+    pool: Optional[ClientPool] = None
+    try:
+        # Own context store per scale: no warm entries carried over
+        config = PipelineConfig(base_dir=str(base), store=ContextStore())
+        tracer = _CollectingTracer()
+        agent = ClaudeAgent(
+            config,
+            semaphore=asyncio.Semaphore(max_concurrency),
+            tracer=tracer,
+        )
+        # Default: a pooled SDK client, pre-warmed like a real pipeline run
+        if client_factory is None:
+            pool = ClientPool(config.http_client(), base_url=base_url, api_key="mock", max_retries=0)
+            agent.http, agent.client = pool, pool.client()
+        else:
+            agent.client = client_factory(base_url)
+        if not use_limiter:
+            agent.limiter = None
+        if agent.aio is not None:
+            agent.aio.lag.reset()
+
+        async def approve(checkpoint: dict[str, Any], results: dict[str, Any]) -> bool:
+            return True
+
+        scheduler = DagScheduler(agent, on_checkpoint=approve)
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        outcomes = await asyncio.gather(*(scheduler.run(pid, tier=tier) for pid in product_ids))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        lag: dict[str, float] = {}
+        if agent.aio is not None:
+            lag = agent.aio.lag.stats()
+            agent.aio.lag.stop()
+        connection_waits = pool.stats()["connection_waits"] if pool else 0
+
+        agent_runs = failed = 0
+        semaphore_wait = ttft = 0.0
+        streams = 0
+        paths: list[float] = []
+        efficiencies: list[float] = []
+        for pid, outcome in zip(product_ids, outcomes):
+            failed += len(outcome.failed)
+            spans = tracer.runs.get(pid, [])
+            durations: dict[str, float] = {}
+            run_wall = 0.0
+            for span in spans:
+                if span.name == "agent.run":
+                    agent_runs += 1
+                    durations[span.attrs["agent_id"]] = (
+                        durations.get(span.attrs["agent_id"], 0.0) + span.duration
+                    )
+                elif span.name == "pipeline.run":
+                    run_wall = span.duration
+                elif span.name == "queue.semaphore":
+                    semaphore_wait += span.duration
+                elif span.name == "api.stream":
+                    streams += 1
+                    ttft += span.attrs.get("ttft_s", 0.0)
+            path = critical_path_seconds(scheduler.graph(pid, tier), durations)
+            paths.append(path)
+            if run_wall:
+                efficiencies.append(path / run_wall)
+
+        return ScaleResult(
+            products=products,
+            wall_s=round(wall, 3),
+            agent_runs=agent_runs,
+            failed=failed,
+            critical_path_s=round(sum(paths) / len(paths), 3),
+            efficiency=round(sum(efficiencies) / len(efficiencies), 3) if efficiencies else 0.0,
+            cpu_s=round(cpu, 3),
+            cpu_ms_per_agent=round(cpu * 1000 / agent_runs, 2) if agent_runs else 0.0,
+            peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            semaphore_wait_s=round(semaphore_wait / agent_runs, 4) if agent_runs else 0.0,
+            ttft_s=round(ttft / streams, 4) if streams else 0.0,
+            loop_lag_p95_ms=lag.get("p95_ms", 0.0),
+            loop_lag_max_ms=lag.get("max_ms", 0.0),
+            connection_waits=connection_waits,
+        )
+    finally:
+        if pool is not None:
+            await pool.aclose()
+        if not keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def compare(results: list[ScaleResult], baseline: list[dict[str, Any]], tolerance: float) -> list[str]:
+    """Regressions vs. a previous --json run: CPU per agent up or efficiency down."""
+    previous = {row["products"]: row for row in baseline}
+    problems = []
+    for result in results:
+        old = previous.get(result.products)
+        if old is None:
+            continue
+        if old["cpu_ms_per_agent"] and result.cpu_ms_per_agent > old["cpu_ms_per_agent"] * (1 + tolerance):
+            problems.append(f"{result.products} products: cpu_ms_per_agent "
+                            f"{old['cpu_ms_per_agent']} → {result.cpu_ms_per_agent}")
+        if result.efficiency < old["efficiency"] * (1 - tolerance):
+            problems.append(f"{result.products} products: efficiency "
+                            f"{old['efficiency']} → {result.efficiency}")
+    return problems
+
+
+def _print_table(results: list[ScaleResult]) -> None:
+    header = (f"{'products':>8} {'wall s':>8} {'agents':>7} {'failed':>6} {'crit s':>7} "
+              f"{'effic.':>6} {'cpu ms/agent':>12} {'rss MB':>7} {'sem wait s':>10} {'ttft s':>7} "
+              f"{'lag p95':>7} {'lag max':>7}")
+    print(header)
+    print("─" * len(header))
+    for r in results:
+        print(f"{r.products:>8} {r.wall_s:>8.2f} {r.agent_runs:>7} {r.failed:>6} "
+              f"{r.critical_path_s:>7.2f} {r.efficiency:>6.2f} {r.cpu_ms_per_agent:>12.2f} "
+              f"{r.peak_rss_mb:>7.1f} {r.semaphore_wait_s:>10.4f} {r.ttft_s:>7.4f} "
+              f"{r.loop_lag_p95_ms:>7.1f} {r.loop_lag_max_ms:>7.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the orchestrator against the mock Anthropic API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated product counts")
+    parser.add_argument("--tier", default="simple", help="Complexity tier (phase activation)")
+    parser.add_argument("--intake", default=str(REPO_ROOT / "intake" / "ki-radar.yaml"),
+                        help="Intake file copied for every benchmark product")
+    parser.add_argument("--max-concurrency", type=int, default=32,
+                        help="Shared semaphore for concurrent API calls")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected 429 fraction")
+    parser.add_argument("--file-bytes", type=int, default=600)
+    parser.add_argument("--connect-ms", type=float, default=0.0,
+                        help="Mock delay per new connection (TCP/TLS setup)")
+    parser.add_argument("--limiter", action="store_true", help="Keep the token rate limiter on")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp workspaces")
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Fail on regressions vs. this JSON")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    scales = sorted(int(s) for s in args.scales.split(",") if s.strip())
+    results: list[ScaleResult] = []
+    with MockServerProcess(args.latency_ms, args.tokens_per_sec, args.error_rate,
+                           args.file_bytes, connect_ms=args.connect_ms) as server:
+        for products in scales:
+            print(f"→ {products} product(s)…", flush=True)
+            results.append(asyncio.run(run_scale(
+                products, server.base_url, args.tier, Path(args.intake),
+                args.max_concurrency, use_limiter=args.limiter, keep=args.keep,
+            )))
+
+    print()
+    _print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in results], indent=2))
+    if args.baseline:
+        problems = compare(results, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for problem in problems:
+            print(f"✗ regression: {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
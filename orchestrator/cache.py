@@ -0,0 +1,258 @@
+# orchestrator/cache.py
+"""Content-addressed on-disk cache of Claude call results.
+
+Key = SHA-256 over the exact request sent to the API (model, max_tokens, system,
+messages, thinking). Identical requests on a re-run replay the stored
+(raw_output, output_tokens) instead of calling Claude again.
+
+PlanCache keeps the latest Pass 1 plan of each two-pass agent per product, so
+retries (whose request differs by the failure feedback) and re-runs go
+straight to Pass 2 while the plan's inputs are unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .aio import atomic_write
+from .config import PipelineConfig
+
+
+class ResultCache:
+    """Sharded JSON files under cache_dir with age- and size-based eviction.
+    Thread-safe: lookups and stores run on the I/O pool."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age_seconds: float = 7 * 24 * 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._total_bytes: Optional[int] = None   # computed lazily on first write
+        # Guards the counters and _total_bytes; file writes are atomic on their own
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["ResultCache"]:
+        """Build the cache from pipeline.yaml `result_cache`; None if disabled."""
+        settings = config.result_cache()
+        if not settings.get("enabled", False):
+            return None
+        return cls(
+            config.base_dir / settings.get("dir", "state/cache/agent-results"),
+            max_bytes=int(settings.get("max_size_mb", 512)) * 1024 * 1024,
+            max_age_seconds=float(settings.get("max_age_hours", 168)) * 3600,
+        )
+
+    # ── Keys ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def key_for(request: dict[str, Any]) -> str:
+        """Stable hash of an API request (kwargs passed to messages.stream)."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    # ── Lookup / store ─────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[tuple[str, int]]:
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return self._miss()
+
+        if time.time() - stat.st_mtime > self.max_age_seconds:
+            self._remove(path, stat.st_size)
+            return self._miss()
+
+        try:
+            entry = json.loads(path.read_text())
+            # Touch on hit so size eviction drops least-recently-used entries first
+            os.utime(path)
+        except (OSError, ValueError):
+            self._remove(path, stat.st_size)
+            return self._miss()
+
+        with self._lock:
+            self.hits += 1
+        return entry["raw_output"], int(entry["tokens"])
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: str, raw_output: str, tokens: int) -> None:
+        payload = json.dumps({
+            "raw_output": raw_output,
+            "tokens": tokens,
+            "created_at": time.time(),
+        })
+        atomic_write(self._path(key), payload)
+
+        with self._lock:
+            self.writes += 1
+            if self._total_bytes is None:
+                self._total_bytes = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._total_bytes += len(payload.encode("utf-8"))
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def delete(self, key: str) -> None:
+        """Forget one entry (its replay produced an invalid outcome)."""
+        path = self._path(key)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        self._remove(path, size)
+
+    # ── Eviction ───────────────────────────────────────────────────────────
+
+    def _entries(self) -> list[Path]:
+        return list(self.cache_dir.glob("??/*.json"))
+
+    def _remove(self, path: Path, size: int) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def evict(self) -> int:
+        """Drop expired entries, then oldest entries until under max_bytes."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        before = self.evictions
+        now = time.time()
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path, stat.st_size)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        self._total_bytes = total
+        # Leave 10% headroom so eviction does not run on every write
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            self._remove(path, size)
+            total -= size
+        self._total_bytes = total
+        return self.evictions - before
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self._entries():
+                self._remove(path, path.stat().st_size)
+            self._total_bytes = 0
+
+    # ── Stats ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+
+# ── Two-pass plans ─────────────────────────────────────────────────────────
+
+PLAN_DIR = "products/{product_id}/state/plans"
+
+
+class PlanCache:
+    """Latest Pass 1 plan per (product, agent); valid while its key matches."""
+
+    def __init__(self, config: PipelineConfig, max_age_seconds: float = 7 * 24 * 3600):
+        self.config = config
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["PlanCache"]:
+        """Build from pipeline.yaml `plan_cache`; None if disabled."""
+        settings = config.plan_cache()
+        if not settings.get("enabled", False):
+            return None
+        return cls(config, max_age_seconds=float(settings.get("max_age_hours", 168)) * 3600)
+
+    @staticmethod
+    def key_for(model: str, thinking_budget: int, system: Any, user_message: str) -> str:
+        """What the plan depends on: model, thinking budget, the stable prompt
+        prefix (role prompt, context files, output instructions) and the user
+        message without retry feedback."""
+        return ResultCache.key_for({
+            "model": model,
+            "thinking_budget": thinking_budget,
+            "system": system,
+            "user": user_message,
+        })
+
+    def _path(self, product_id: str, agent_id: str) -> Path:
+        return self.config.base_dir / PLAN_DIR.format(product_id=product_id) / f"{agent_id}.json"
+
+    def get(self, product_id: str, agent_id: str, key: str) -> Optional[tuple[str, int]]:
+        """(plan, output tokens it cost), or None if there is no valid plan for key."""
+        try:
+            entry = json.loads(self._path(product_id, agent_id).read_text())
+        except (OSError, ValueError):
+            entry = None
+        if (not entry or entry.get("key") != key
+                or time.time() - entry.get("created_at", 0) > self.max_age_seconds):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["plan"], int(entry["tokens"])
+
+    def put(self, product_id: str, agent_id: str, key: str, plan: str, tokens: int) -> None:
+        atomic_write(self._path(product_id, agent_id), json.dumps({
+            "key": key,
+            "plan": plan,
+            "tokens": tokens,
+            "created_at": time.time(),
+        }))
+
+    def invalidate(self, product_id: str, agent_id: str) -> None:
+        self._path(product_id, agent_id).unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
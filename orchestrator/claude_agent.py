@@ -6,14 +6,26 @@ from __future__ import annotations
 import asyncio
 import re
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Optional
-
-import anthropic
+from typing import Any, Callable, Optional
 
+from .aio import AsyncIO, atomic_write, write_files
+from .batch import BatchExecutor, message_text
+from .cache import PlanCache, ResultCache
+from .client import ClientPool, shared_pool
 from .config import PipelineConfig
+from .context_budget import ContextBudget
+from .file_stream import FileBlockParser, StreamAborted, StreamGuard
+from .fingerprints import FingerprintStore
+from .limiter import TokenRateLimiter, estimate_request_tokens, estimate_tokens
 from .models import AgentResult
+from .patcher import PatchOutcome, apply_patches, has_patches
 from .rate_limit import RateLimitHandler, PipelinePausedError
+from .routing import ModelRouter, RouteDecision
+from .static_gates import StaticGates, StaticReport
+from .tracing import Tracer
+from .validators import Artifact, OutcomeValidator
 
 # Pattern for multi-file output:
 #   --- FILE: path/to/file.ext ---
@@ -27,6 +39,55 @@ _FILE_BLOCK = re.compile(
 # Raw output below this threshold is treated as effectively empty
 _MIN_NONEMPTY_BYTES = 50
 
+# Prompt-cache breakpoint; prefixes up to a marked block are billed as cache reads
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Stream chunks are a few dozen characters; the FILE-block parser gets them in
+# batches of this size, or as soon as a line holding a block marker is
+# complete, so the I/O pool sees one hand-off per batch instead of per chunk
+_FEED_BATCH_CHARS = 4096
+_STREAM_MARKER = re.compile(r"---\s*(?:END\s*)?(?:FILE|PATCH)", re.IGNORECASE)
+
+
+def _anthropic() -> Any:
+    """The SDK module, imported on first use: it takes longer to import than the
+    rest of the orchestrator, and commands that make no model call never need it."""
+    import anthropic
+
+    return anthropic
+
+
+@dataclass
+class _Usage:
+    """Token usage accumulated over every API call of one agent run."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    plan_cache_hit: bool = False          # Pass 1 skipped, plan reused
+    # Result-cache entries of this run: stored only once the outcome check
+    # passes; replayed entries are dropped if it fails, so a retry calls the API
+    pending_cache: list[tuple[str, str, int]] = field(default_factory=list)
+    replayed: list[str] = field(default_factory=list)
+
+    def add(self, usage: Any) -> None:
+        self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+        self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+        self.cache_read_tokens += getattr(usage, "cache_read_input_tokens", 0) or 0
+        self.cache_write_tokens += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+
+def _with_usage(result: AgentResult, usage: _Usage) -> AgentResult:
+    """Attach the run's prompt-cache token counts and plan-cache hit to its
+    result. AgentResult (orchestrator/models.py) is not part of this tree and
+    its constructor has no such fields, so they are set as attributes after
+    construction."""
+    result.cache_read_tokens = usage.cache_read_tokens
+    result.cache_write_tokens = usage.cache_write_tokens
+    result.plan_cache_hit = usage.plan_cache_hit
+    return result
+
 
 class ClaudeAgent:
     """Wraps the Anthropic async client to execute a single agent turn."""
@@ -36,53 +97,338 @@ class ClaudeAgent:
         config: PipelineConfig,
         verbose: bool = False,
         semaphore: Optional[asyncio.Semaphore] = None,
+        cache: Optional[ResultCache] = None,
+        fingerprints: Optional[FingerprintStore] = None,
+        limiter: Optional[TokenRateLimiter] = None,
+        on_file_complete: Optional[Callable[[str, str, str], None]] = None,
+        batch: Optional[BatchExecutor] = None,
+        tracer: Optional[Tracer] = None,
+        context_budget: Optional[ContextBudget] = None,
+        validator: Optional[OutcomeValidator] = None,
+        static_gates: Optional[StaticGates] = None,
+        aio: Optional[AsyncIO] = None,
+        plan_cache: Optional[PlanCache] = None,
+        http: Optional[ClientPool] = None,
+        router: Optional[ModelRouter] = None,
     ):
         self.config = config
         self.verbose = verbose
-        self.client = anthropic.AsyncAnthropic()
+        # One pooled client per process (pipeline.yaml http_client): parallel
+        # pipelines and fleet products share connections and TLS sessions.
+        self.http = http or shared_pool(config)
+        # Built (and the SDK imported) on the first model call; see `client`
+        self._client: Optional[Any] = None
         self.rate_limit_handler = RateLimitHandler(verbose=verbose)
         # Shared semaphore limits concurrent API calls across parallel pipelines.
         # None → no limit (single-product mode).
         self._semaphore = semaphore
+        # Content-addressed result cache; share one instance across agents so
+        # hit/miss counters cover the whole run. Default: pipeline.yaml result_cache.
+        self.cache = cache if cache is not None else ResultCache.from_config(config)
+        # Records input/output digests of successful runs for incremental re-runs.
+        self.fingerprints = fingerprints or FingerprintStore(config)
+        # RPM/ITPM/OTPM budgets; pass one instance to every agent that shares
+        # an API key. Default: pipeline.yaml rate_limits (None → unthrottled).
+        self.limiter = limiter if limiter is not None else TokenRateLimiter.from_config(
+            config, verbose=verbose
+        )
+        # Called with (product_id, agent_id, rel_path) as soon as a streamed
+        # FILE block is complete on disk, before the response has finished.
+        # Runs on an I/O pool thread (the parser writes there), not the loop.
+        self.on_file_complete = on_file_complete
+        # Message Batches for non-interactive agents; share one executor across
+        # agents and products so their requests land in the same batch.
+        # Default: pipeline.yaml batch_execution (None → always stream).
+        self.batch = batch if batch is not None else BatchExecutor.from_config(
+            config, self.http.client, verbose=verbose
+        )
+        # Spans for queueing, context assembly, generation and file writes;
+        # share one tracer with the scheduler. Default: pipeline.yaml tracing.
+        self.tracer = tracer or Tracer.from_config(config)
+        # Fits context files into the token budget of each agent's context_size.
+        # Default: pipeline.yaml context_budget (None → every file in full).
+        self.context_budget = context_budget if context_budget is not None else (
+            ContextBudget.from_config(config)
+        )
+        # Outcome validators with a per-file-digest result cache; share one
+        # instance across agents so retries and re-runs hit the cache.
+        self.validator = validator or OutcomeValidator(config)
+        # Offline checks before gate agents with `static_precheck`.
+        # Default: pipeline.yaml static_gates (None → LLM gates only).
+        self.static_gates = static_gates if static_gates is not None else (
+            StaticGates.from_config(config)
+        )
+        # Thread pool for file reads/writes, YAML parsing and validation, so
+        # they do not stall other streams; share one instance across agents.
+        # Default: pipeline.yaml async_io (None → asyncio's default executor).
+        self.aio = aio if aio is not None else AsyncIO.from_config(config)
+        # Pass 1 plans of two-pass agents, reused by retries and re-runs.
+        # Default: pipeline.yaml plan_cache (None → always plan).
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache.from_config(config)
+        # Fast model first for agents with `routing:`, their own model on
+        # failure; share one instance so hit rates cover every product.
+        # Default: pipeline.yaml model_routing (None → every agent on its own model).
+        self.router = router if router is not None else ModelRouter.from_config(config)
+
+    @property
+    def client(self) -> Any:
+        """The AsyncAnthropic client: the pool's, unless replaced (benchmark, tests)."""
+        if self._client is None:
+            self._client = self.http.client()
+        return self._client
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        self._client = client
 
     # ── Public API ─────────────────────────────────────────────────────────
 
+    async def prewarm(self) -> None:
+        """Open API connections before the first call (no-op for a replaced client)."""
+        if self.http.owns(self.client):
+            with self.tracer.span("http.prewarm") as span:
+                await self.http.prewarm()
+                span.set(**{k: v for k, v in self.http.stats().items() if k.startswith("connections")})
+
+    async def aclose(self) -> None:
+        """Close the pooled client's connections at the end of a run."""
+        if self._client is not None and self.http.owns(self._client):
+            await self.http.aclose()
+            self._client = None
+
     async def run(
         self,
         agent_cfg: dict[str, Any],
         product_id: str,
         attempt: int = 1,
         extra_context: str = "",
+        priority: float = 0.0,
+        force_replan: bool = False,
+    ) -> AgentResult:
+        """Execute one agent call and return an AgentResult.
+        priority orders waiting calls in the rate limiter (higher goes first).
+        force_replan: run Pass 1 of a two-pass agent even if a valid plan is cached."""
+        with self.tracer.span(
+            "agent.run", product_id=product_id, agent_id=agent_cfg["id"],
+            attempt=attempt, priority=priority,
+        ) as span:
+            result = await self._run_routed(agent_cfg, product_id, attempt, extra_context,
+                                            priority, force_replan)
+            span.set(
+                success=result.success,
+                failure_type=result.failure_type or "",
+                output_tokens=result.tokens_used,
+            )
+            return result
+
+    async def _run_routed(
+        self,
+        agent_cfg: dict[str, Any],
+        product_id: str,
+        attempt: int,
+        extra_context: str,
+        priority: float,
+        force_replan: bool,
+    ) -> AgentResult:
+        """_run on each model of the agent's cascade until one result is accepted.
+        The returned result carries the tokens and time of every step."""
+        final_model: str = agent_cfg.get("model", self.config.default_model)
+        policy = self.router.policy_for(agent_cfg) if self.router is not None else None
+        models = self.router.models_for(agent_cfg, final_model, attempt) if policy else [final_model]
+        if len(models) == 1:
+            return await self._run(agent_cfg, product_id, attempt, extra_context, priority,
+                                   force_replan)
+
+        agent_id: str = agent_cfg["id"]
+        spent = _Usage()
+        duration = 0.0
+        for step, model in enumerate(models):
+            last = step == len(models) - 1
+            with self.tracer.span("model.route", policy=policy.name, model=model, step=step) as span:
+                result = await self._run({**agent_cfg, "model": model}, product_id, attempt,
+                                         extra_context, priority, force_replan)
+                accepted, reason = self.router.judge(policy, result, final=last)
+                outcome = "accepted" if accepted else ("failed" if last else "escalated")
+                span.set(outcome=outcome, reason=reason)
+            await self._offload(self.router.record, RouteDecision(
+                product_id=product_id, agent_id=agent_id, policy=policy.name, model=model,
+                step=step, outcome=outcome, reason=reason,
+                duration_s=round(result.duration_seconds, 3), output_tokens=result.tokens_used,
+            ))
+            if accepted or last:
+                break
+            if self.verbose:
+                print(f"  ⇢ [{agent_id}] {model}: {reason} — escalating to {models[step + 1]}")
+            spent.output_tokens += result.tokens_used
+            spent.cache_read_tokens += result.cache_read_tokens
+            spent.cache_write_tokens += result.cache_write_tokens
+            duration += result.duration_seconds
+
+        result.tokens_used += spent.output_tokens
+        result.cache_read_tokens += spent.cache_read_tokens
+        result.cache_write_tokens += spent.cache_write_tokens
+        result.duration_seconds += duration
+        return result
+
+    async def _run(
+        self,
+        agent_cfg: dict[str, Any],
+        product_id: str,
+        attempt: int,
+        extra_context: str,
+        priority: float,
+        force_replan: bool = False,
+    ) -> AgentResult:
+        usage = _Usage()
+        result = _with_usage(
+            await self._execute(agent_cfg, product_id, attempt, extra_context, priority,
+                                force_replan, usage),
+            usage,
+        )
+        if self.cache is not None and (usage.pending_cache or usage.replayed):
+            await self._offload(self._settle_cache, usage, result.success)
+        return result
+
+    def _settle_cache(self, usage: _Usage, ok: bool) -> None:
+        """Store this run's responses if its outcome passed; otherwise forget the
+        replayed ones too — they produced the invalid output."""
+        if ok:
+            for key, raw_output, tokens in usage.pending_cache:
+                self.cache.put(key, raw_output, tokens)
+        else:
+            for key in usage.replayed:
+                self.cache.delete(key)
+
+    async def _execute(
+        self,
+        agent_cfg: dict[str, Any],
+        product_id: str,
+        attempt: int,
+        extra_context: str,
+        priority: float,
+        force_replan: bool,
+        usage: _Usage,
     ) -> AgentResult:
-        """Execute one agent call and return an AgentResult."""
         agent_id: str = agent_cfg["id"]
         start = time.monotonic()
+        parser: Optional[FileBlockParser] = None
 
         try:
-            system_prompt = self._build_system(agent_cfg)
-            user_message = self._build_user(agent_cfg, product_id, extra_context)
+            input_digests = await self._offload(self.fingerprints.snapshot_inputs, agent_cfg, product_id)
+
+            # Deterministic gate pre-check: RED → report without a call, else
+            # the findings go into the LLM gate's context
+            static_outputs: list[str] = []
+            static_context = ""
+            gate = agent_cfg.get("static_precheck")
+            if gate and self.static_gates is not None:
+                with self.tracer.span("gate.static", gate=gate) as span:
+                    report = await self._offload(self.static_gates.run, gate, product_id)
+                    span.set(findings=len(report.findings), decision=report.decision)
+                if self.verbose:
+                    print(f"  → [{agent_id}] static {gate} pre-check: {report.decision} "
+                          f"({len(report.findings)} finding(s))")
+                if report.conclusive and self.static_gates.on_red == "skip":
+                    return await self._offload(self._static_gate_result, agent_cfg, product_id,
+                                               attempt, report, input_digests, start)
+                if report.findings:
+                    path = self.static_gates.report_path(gate, product_id)
+                    static_outputs.append(await self._offload(self._write_report, path, report.to_yaml()))
+                static_context = report.as_context()
+                extra_context = static_context + extra_context
+            # Stable prefix (role prompt, context files, output instructions) goes
+            # into cached system blocks; only volatile extra_context is in the user turn.
+            with self.tracer.span("context.build") as span:
+                system_prompt = self._system_blocks(
+                    *await self._offload(self._build_prefix, agent_cfg, product_id)
+                )
+                user_message = self._build_user(agent_cfg, product_id, extra_context)
+                span.set(chars=sum(len(b["text"]) for b in system_prompt) + len(user_message))
+            parser = self._file_parser(agent_cfg, product_id)
 
             if self.verbose:
                 strategy = agent_cfg.get("thinking_strategy", "disabled")
-                print(f"  → [{agent_id}] calling Claude ({self.config.default_model}, thinking={strategy})…")
+                model = agent_cfg.get("model", self.config.default_model)
+                print(f"  → [{agent_id}] calling Claude ({model}, thinking={strategy})…")
 
             thinking_strategy = agent_cfg.get("thinking_strategy", "disabled")
             if thinking_strategy == "two_pass":
+                # Retry feedback (attempt > 1) only steers Pass 2; the plan is
+                # keyed on the user message of the first attempt
+                plan_basis = user_message if attempt == 1 else self._build_user(
+                    agent_cfg, product_id, static_context
+                )
                 raw_output, tokens = await self._run_two_pass(
-                    system_prompt, user_message, agent_cfg, agent_id
+                    system_prompt, user_message, agent_cfg, agent_id,
+                    priority=priority, usage=usage, parser=parser, product_id=product_id,
+                    plan_basis=plan_basis,
+                    force_replan=force_replan or bool(agent_cfg.get("force_replan", False)),
                 )
             else:
                 raw_output, tokens = await self._call_claude(
-                    system_prompt, user_message, agent_cfg, agent_id
+                    system_prompt, user_message, agent_cfg, agent_id,
+                    priority=priority, usage=usage, parser=parser,
                 )
 
-            output_files = self._write_output_files(raw_output, agent_cfg, product_id)
-            parsed = self._try_parse_yaml(raw_output, output_files, product_id)
-
-            # Outcome validation — empty or missing files = explicit failure
-            ok, failure_reason, failure_type = self._check_outcome(
-                raw_output, output_files, agent_cfg, product_id
-            )
+            # Streamed runs have written their FILE blocks already; cache
+            # replays (parser never fed) go through the batch regex instead.
+            streamed = await self._offload(parser.close) if parser and parser.chars_seen else None
+            if parser and parser.truncated:
+                exc = StreamAborted(
+                    f"Output cut off by max_tokens inside {parser.truncated} "
+                    f"after {parser.guard.max_continuations} continuation(s)"
+                )
+                exc.partial, exc.output_tokens = raw_output, tokens
+                raise exc
+            patches: list[PatchOutcome] = []
+            with self.tracer.span("files.write", streamed=streamed is not None) as span:
+                output_files = await self._offload(
+                    self._write_output_files, raw_output, agent_cfg, product_id,
+                    streamed=streamed, patches=patches,
+                ) + static_outputs
+                span.set(files=len(output_files))
+                if patches:
+                    span.set(patched=sum(p.ok for p in patches),
+                             patch_failed=sum(not p.ok for p in patches))
+                if parser:
+                    span.set(stream_write_s=round(parser.write_seconds, 4))
+
+            # Patches that did not apply → regenerate those files in full
+            failed_patches = [p for p in patches if not p.ok]
+            if failed_patches:
+                regen_output, regen_tokens, regenerated = await self._regenerate_files(
+                    agent_cfg, product_id, failed_patches,
+                    priority=priority, usage=usage,
+                )
+                raw_output += "\n\n" + regen_output
+                tokens += regen_tokens
+                output_files += [rel for rel in regenerated if rel not in output_files]
+                unresolved = [p for p in failed_patches if p.path not in regenerated]
+                if unresolved:
+                    reason = "Patch failed and file was not regenerated: " + "; ".join(
+                        f"{p.path} ({p.error})" for p in unresolved
+                    )
+                    if self.verbose:
+                        print(f"  ✗ [{agent_id}] {reason}")
+                    return AgentResult(
+                        agent_id=agent_id,
+                        product_id=product_id,
+                        success=False,
+                        output_files=output_files,
+                        raw_output=raw_output,
+                        tokens_used=tokens,
+                        duration_seconds=time.monotonic() - start,
+                        attempt=attempt,
+                        error=reason,
+                        failure_type="outcome_invalid",
+                    )
+            # Outcome validation — empty or missing files = explicit failure.
+            # Each output file is read (and YAML parsed) once for parsed_data and
+            # validation; validators may spawn `node` — all off the event loop.
+            with self.tracer.span("outcome.validate", files=len(output_files)):
+                parsed, ok, failure_reason, failure_type = await self._offload(
+                    self._load_and_check, raw_output, output_files, agent_cfg, product_id
+                )
 
             duration = time.monotonic() - start
 
@@ -101,10 +447,13 @@ class ClaudeAgent:
                     attempt=attempt,
                     error=failure_reason,
                     failure_type=failure_type,
-                )
+                    )
+
+            await self._offload(self.fingerprints.record, product_id, agent_id, input_digests, output_files)
 
             if self.verbose:
-                print(f"  ✓ [{agent_id}] done in {duration:.1f}s ({tokens} tokens)")
+                cached = f", {usage.cache_read_tokens} cached" if usage.cache_read_tokens else ""
+                print(f"  ✓ [{agent_id}] done in {duration:.1f}s ({tokens} tokens{cached})")
 
             return AgentResult(
                 agent_id=agent_id,
@@ -122,6 +471,23 @@ class ClaudeAgent:
             # Re-raise so pipeline.py can save state and exit cleanly
             raise
 
+        except StreamAborted as exc:
+            duration = time.monotonic() - start
+            if self.verbose:
+                print(f"  ✗ [{agent_id}] stream aborted: {exc}")
+            return AgentResult(
+                agent_id=agent_id,
+                product_id=product_id,
+                success=False,
+                output_files=list(parser.written) if parser else [],
+                raw_output=exc.partial,
+                tokens_used=exc.output_tokens,
+                duration_seconds=duration,
+                attempt=attempt,
+                error=str(exc),
+                failure_type="stream_aborted",
+            )
+
         except Exception as exc:
             duration = time.monotonic() - start
             return AgentResult(
@@ -134,42 +500,87 @@ class ClaudeAgent:
                 attempt=attempt,
             )
 
+    async def _offload(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Blocking file work on the I/O pool, never on the event loop."""
+        if self.aio is not None:
+            return await self.aio.run(fn, *args, **kwargs)
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
     # ── Prompt builders ────────────────────────────────────────────────────
 
+    def _build_prefix(self, agent_cfg: dict[str, Any], product_id: str) -> tuple[str, str]:
+        """(role prompt, stable context) — reads files, runs on the I/O pool."""
+        return self._build_system(agent_cfg), self._build_context(agent_cfg, product_id)
+
     def _build_system(self, agent_cfg: dict[str, Any]) -> str:
         """Read the agent's .md prompt file as the system prompt."""
         prompt_path = self.config.base_dir / agent_cfg.get("prompt", "")
-        if prompt_path.exists():
-            return prompt_path.read_text()
+        if prompt_path.is_file():
+            return self.config.store.get(prompt_path) or ""
         return (
             f"You are the {agent_cfg['id']} agent in an AI-First Company pipeline. "
             "Follow your role description exactly and produce structured outputs."
         )
 
-    def _build_user(
-        self,
-        agent_cfg: dict[str, Any],
-        product_id: str,
-        extra_context: str = "",
-    ) -> str:
-        """Assemble the user turn from context files + output instructions."""
+    def _build_context(self, agent_cfg: dict[str, Any], product_id: str) -> str:
+        """Assemble the stable prompt prefix: context files + output instructions.
+        Identical across retries, both two-pass passes and re-runs → prompt-cached."""
         parts: list[str] = []
 
         # Inject context files
         context_files: list[str] = agent_cfg.get("context_files", [])
         if context_files:
-            context_text = self.config.read_context_files(context_files, product_id)
+            with self.tracer.span("context.read_files", files=len(context_files)) as span:
+                if self.context_budget is not None:
+                    context_text, context_parts = self.context_budget.assemble(agent_cfg, product_id)
+                    trimmed = [p.rel for p in context_parts if p.mode in ("outline", "omitted")]
+                    span.set(
+                        budget_tokens=self.context_budget.budget_for(agent_cfg),
+                        full_tokens=sum(p.tokens for p in context_parts),
+                        tokens=estimate_tokens(context_text),
+                        trimmed=len(trimmed),
+                    )
+                    if trimmed and self.verbose:
+                        print(f"  ✂ [{agent_cfg['id']}] context trimmed to budget: {', '.join(trimmed)}")
+                else:
+                    context_text = self.config.read_context_files(context_files, product_id)
+                span.set(chars=len(context_text))
             if context_text.strip():
                 parts.append("## CONTEXT FILES\n\n" + context_text)
 
-        # Extra context (e.g. gate violations for code-fixer, retry hints)
-        if extra_context.strip():
-            parts.append("## ADDITIONAL CONTEXT\n\n" + extra_context)
-
         # Output instructions
         output_files: list[str] = agent_cfg.get("output_files", [])
         output_format: str = agent_cfg.get("output_format", "text")
-        if output_files:
+        if output_files and output_format == "patch":
+            file_list = "\n".join(f"  - {f}" for f in output_files)
+            parts.append(
+                "## OUTPUT INSTRUCTIONS\n\n"
+                "Edit existing files with PATCH blocks instead of repeating them in full. "
+                "Each SEARCH text must be copied verbatim from the current file and be "
+                "unique in it; keep it to the few lines that change plus 1-2 lines of "
+                "context:\n\n"
+                "```\n"
+                "--- PATCH: path/to/file ---\n"
+                "<<<<<<< SEARCH\n"
+                "<exact lines from the current file>\n"
+                "=======\n"
+                "<replacement lines>\n"
+                ">>>>>>> REPLACE\n"
+                "--- END PATCH ---\n"
+                "```\n\n"
+                "A PATCH block may hold several SEARCH/REPLACE pairs, applied in order. "
+                "Write new files (and files you rewrite completely) as FILE blocks:\n\n"
+                "```\n"
+                "--- FILE: path/to/file ---\n"
+                "<file content here>\n"
+                "--- END FILE ---\n"
+                "```\n\n"
+                f"Files to produce or patch:\n{file_list}\n\n"
+                "Replace `{product_id}` with the actual product ID: "
+                f"`{product_id}`\n\n"
+                "After all blocks, add a brief summary of what you changed."
+            )
+        elif output_files:
             file_list = "\n".join(f"  - {f}" for f in output_files)
             parts.append(
                 "## OUTPUT INSTRUCTIONS\n\n"
@@ -185,25 +596,278 @@ class ClaudeAgent:
                 "After all FILE blocks, add a brief summary of what you produced."
             )
 
-        return "\n\n".join(parts) if parts else "Execute your role for product: " + product_id
+        return "\n\n".join(parts)
+
+    def _build_user(
+        self,
+        agent_cfg: dict[str, Any],
+        product_id: str,
+        extra_context: str = "",
+    ) -> str:
+        """Assemble the volatile user turn (e.g. gate violations, retry hints)."""
+        if extra_context.strip():
+            return "## ADDITIONAL CONTEXT\n\n" + extra_context
+        return "Execute your role for product: " + product_id
+
+    @staticmethod
+    def _system_blocks(system: str, context: str) -> list[dict[str, Any]]:
+        """System prompt as content blocks with a cache breakpoint after the role
+        prompt and after the stable context. System-level cache entries survive
+        the thinking on/off switch between Pass 1 and Pass 2."""
+        blocks = [{"type": "text", "text": system, "cache_control": _CACHE_CONTROL}]
+        if context:
+            blocks.append({"type": "text", "text": context, "cache_control": _CACHE_CONTROL})
+        return blocks
 
     # ── Claude API calls ───────────────────────────────────────────────────
 
     async def _stream_call(
-        self, call_fn: Any, agent_id: str
+        self,
+        call_fn: Any,
+        agent_id: str,
+        cache_key: Optional[str] = None,
+        use_semaphore: bool = True,
+        usage: Optional[_Usage] = None,
+    ) -> tuple[str, int]:
+        """Run call_fn through result cache + semaphore + rate-limit handler.
+        A replayed response costs no tokens; a new one is stored by _settle_cache
+        once the run's outcome check has passed (immediately without `usage`)."""
+        if cache_key:
+            cached = await self._offload(self.cache.get, cache_key)
+            if cached is not None:
+                if self.verbose:
+                    print(f"  ↺ [{agent_id}] cache hit ({cached[1]} tokens replayed)")
+                if usage is not None:
+                    usage.replayed.append(cache_key)
+                return cached[0], 0
+
+        # Gaps between retried attempts inside the rate-limit handler are backoff
+        last_end: Optional[int] = None
+
+        async def _attempt() -> tuple[str, int]:
+            nonlocal last_end
+            if last_end is not None:
+                self.tracer.record("api.backoff", last_end)
+            try:
+                return await call_fn()
+            finally:
+                last_end = self.tracer.now()
+
+        with self.tracer.span("api.call", call=agent_id):
+            if self._semaphore and use_semaphore:
+                queued = self.tracer.now()
+                async with self._semaphore:
+                    self.tracer.record("queue.semaphore", queued)
+                    result = await self.rate_limit_handler.run(_attempt, agent_id=agent_id)
+            else:
+                result = await self.rate_limit_handler.run(_attempt, agent_id=agent_id)
+
+        if cache_key:
+            if usage is not None:
+                usage.pending_cache.append((cache_key, *result))
+            else:
+                await self._offload(self.cache.put, cache_key, *result)
+        return result
+
+    def _cache_key(self, call_kwargs: dict[str, Any], agent_cfg: dict[str, Any]) -> Optional[str]:
+        """Cache key for this request, or None if caching is off for the agent."""
+        if self.cache is None or agent_cfg.get("cache", True) is False:
+            return None
+        return self.cache.key_for(call_kwargs)
+
+    def _file_parser(self, agent_cfg: dict[str, Any], product_id: str) -> Optional[FileBlockParser]:
+        if not agent_cfg.get("output_files"):
+            return None
+        callback = None
+        if self.on_file_complete:
+            agent_id = agent_cfg["id"]
+            callback = lambda rel: self.on_file_complete(product_id, agent_id, rel)  # noqa: E731
+        return FileBlockParser(
+            self.config, product_id,
+            on_file_complete=callback,
+            guard=StreamGuard.for_agent(self.config, agent_cfg),
+        )
+
+    async def _stream_text(
+        self,
+        call_kwargs: dict[str, Any],
+        priority: float = 0.0,
+        usage: Optional[_Usage] = None,
+        parser: Optional[FileBlockParser] = None,
     ) -> tuple[str, int]:
-        """Run call_fn through semaphore + rate-limit handler."""
-        if self._semaphore:
-            async with self._semaphore:
-                return await self.rate_limit_handler.run(call_fn, agent_id=agent_id)
-        return await self.rate_limit_handler.run(call_fn, agent_id=agent_id)
+        """Stream one messages request through the rate limiter; return (text, output_tokens).
+
+        If max_tokens cuts a FILE block, the response is continued with the
+        partial output as assistant prefill (up to guard.max_continuations)
+        instead of failing the whole attempt.
+        """
+        # Chunks are joined once at the end instead of growing a str per chunk
+        chunks: list[str] = []
+        tokens = 0
+        if parser:
+            parser.reset()
+        request = call_kwargs
+        lead = ""
+        continuation = 0
+        try:
+            while True:
+                final = await self._stream_once(request, priority, usage, parser, chunks, lead)
+                tokens += final.usage.output_tokens
+                if not (final.stop_reason == "max_tokens" and parser and parser.in_block):
+                    break
+                if continuation >= parser.guard.max_continuations:
+                    break
+                continuation += 1
+                if self.verbose:
+                    print(f"  ↻ output cut off in {parser.current_path} — "
+                          f"continuing ({continuation}/{parser.guard.max_continuations})")
+                partial = "".join(chunks)
+                # The API rejects prefill ending in whitespace; the stripped tail
+                # was already fed, so it is skipped if the continuation repeats it
+                prefill = partial.rstrip()
+                lead = partial[len(prefill):]
+                request = self._continuation_request(call_kwargs, prefill)
+        except StreamAborted as exc:
+            exc.partial = "".join(chunks)
+            exc.output_tokens += tokens
+            raise
+        return "".join(chunks), tokens
+
+    def _trace_stream(
+        self,
+        call_kwargs: dict[str, Any],
+        final: Any,
+        text: str,
+        started: int,
+        first_token: Optional[int],
+    ) -> None:
+        if not self.tracer.enabled:
+            return
+        end = self.tracer.now()
+        output_tokens = final.usage.output_tokens
+        # The API reports thinking as part of output_tokens; estimate the split
+        thinking = max(0, output_tokens - estimate_tokens(text)) if "thinking" in call_kwargs else 0
+        generating = (end - (first_token or started)) / 1e9
+        self.tracer.record(
+            "api.stream", started, end,
+            model=call_kwargs["model"],
+            input_tokens=final.usage.input_tokens,
+            output_tokens=output_tokens,
+            thinking_tokens=thinking,
+            cache_read_tokens=getattr(final.usage, "cache_read_input_tokens", 0) or 0,
+            ttft_s=round(((first_token or end) - started) / 1e9, 4),
+            tokens_per_s=round(output_tokens / generating, 1) if generating > 0 else 0.0,
+            stop_reason=final.stop_reason or "",
+            continuation=call_kwargs["messages"][-1]["role"] == "assistant",
+        )
+
+    @staticmethod
+    def _continuation_request(call_kwargs: dict[str, Any], prefill: str) -> dict[str, Any]:
+        request = dict(call_kwargs)
+        # Assistant prefill cannot be combined with extended thinking
+        thinking = request.pop("thinking", None)
+        if thinking:
+            request["max_tokens"] -= thinking.get("budget_tokens", 0)
+        request["messages"] = [
+            *call_kwargs["messages"],
+            {"role": "assistant", "content": prefill},
+        ]
+        return request
+
+    async def _stream_once(
+        self,
+        call_kwargs: dict[str, Any],
+        priority: float,
+        usage: Optional[_Usage],
+        parser: Optional[FileBlockParser],
+        chunks: list[str],
+        lead: str = "",
+    ) -> Any:
+        """One streamed request; appends text to chunks and returns the final message."""
+        reservation = None
+        if self.limiter:
+            with self.tracer.span("queue.rate_limiter"):
+                reservation = await self.limiter.acquire(
+                    call_kwargs["model"],
+                    estimate_request_tokens(call_kwargs),
+                    call_kwargs["max_tokens"],
+                    priority=priority,
+                )
+
+        received = len(chunks)
+        started = self.tracer.now()
+        first_token: Optional[int] = None
+        batch, tail, marker = "", "", False
+        try:
+            async with self.client.messages.stream(**call_kwargs) as stream:
+                async for text in stream.text_stream:
+                    if first_token is None:
+                        first_token = self.tracer.now()
+                    if lead:
+                        n = 0
+                        while n < min(len(text), len(lead)) and text[n] == lead[n]:
+                            n += 1
+                        text, lead = text[n:], (lead[n:] if n == len(text) else "")
+                        if not text:
+                            continue
+                    chunks.append(text)
+                    if parser:
+                        batch += text
+                        # A marker may be split across chunks; the parser acts on
+                        # it once its line is complete (tail: the open line's end)
+                        recent = tail + text
+                        tail = recent[recent.rfind("\n") + 1:][-64:]
+                        marker = marker or _STREAM_MARKER.search(recent) is not None
+                        if len(batch) >= _FEED_BATCH_CHARS or (marker and "\n" in text):
+                            # Sequential awaits: the parser is only ever used by one thread at a time
+                            await self._offload(parser.feed, batch)
+                            batch, marker = "", _STREAM_MARKER.search(tail) is not None
+                if batch:
+                    await self._offload(parser.feed, batch)
+                final = await stream.get_final_message()
+        except StreamAborted as exc:
+            # Leaving the stream context closes the connection: generation stops here
+            exc.output_tokens = estimate_tokens("".join(chunks[received:]))
+            if reservation:
+                # The request was processed: its input is spent, unlike a failed call's
+                await self.limiter.release(reservation, input_tokens=reservation.input_tokens,
+                                           output_tokens=exc.output_tokens)
+            raise
+        except _anthropic().RateLimitError as exc:
+            if parser:
+                parser.reset()   # drop the half-written block's temp file
+            if reservation:
+                await self.limiter.on_rate_limited(reservation, exc.response.headers)
+            raise
+        except BaseException:
+            if parser:
+                parser.reset()
+            if reservation:
+                await self.limiter.release(reservation)
+            raise
+
+        if usage is not None:
+            usage.add(final.usage)
+        self._trace_stream(call_kwargs, final, "".join(chunks[received:]), started, first_token)
+        if reservation:
+            response = getattr(stream, "response", None)
+            await self.limiter.release(
+                reservation,
+                input_tokens=final.usage.input_tokens,
+                output_tokens=final.usage.output_tokens,
+                headers=getattr(response, "headers", None),
+            )
+        return final
 
     async def _call_claude(
         self,
-        system: str,
+        system: str | list[dict[str, Any]],
         user_message: str,
         agent_cfg: dict[str, Any],
         agent_id: str = "unknown",
+        priority: float = 0.0,
+        usage: Optional[_Usage] = None,
+        parser: Optional[FileBlockParser] = None,
     ) -> tuple[str, int]:
         """
         Stream a single Claude call.
@@ -228,31 +892,57 @@ class ClaudeAgent:
             api_max_tokens = max_output_tokens
             thinking_param = None
 
-        async def _do_call() -> tuple[str, int]:
-            raw_output = ""
-            call_kwargs: dict[str, Any] = dict(
-                model=model,
-                max_tokens=api_max_tokens,
-                system=system,
-                messages=[{"role": "user", "content": user_message}],
+        call_kwargs: dict[str, Any] = dict(
+            model=model,
+            max_tokens=api_max_tokens,
+            system=system,
+            messages=[{"role": "user", "content": user_message}],
+        )
+        if thinking_param:
+            call_kwargs["thinking"] = thinking_param
+
+        cache_key = self._cache_key(call_kwargs, agent_cfg)
+        if self.batch and self.batch.accepts(agent_cfg):
+            # Queued batch requests must not hold a slot of the streaming semaphore
+            async def _batched() -> tuple[str, int]:
+                return await self._batch_text(call_kwargs, agent_id, usage)
+
+            return await self._stream_call(
+                _batched, agent_id, cache_key=cache_key, use_semaphore=False, usage=usage
             )
-            if thinking_param:
-                call_kwargs["thinking"] = thinking_param
 
-            async with self.client.messages.stream(**call_kwargs) as stream:
-                async for text in stream.text_stream:
-                    raw_output += text
-                final = await stream.get_final_message()
-                return raw_output, final.usage.output_tokens
+        async def _do_call() -> tuple[str, int]:
+            return await self._stream_text(call_kwargs, priority, usage, parser)
 
-        return await self._stream_call(_do_call, agent_id)
+        return await self._stream_call(_do_call, agent_id, cache_key=cache_key, usage=usage)
+
+    async def _batch_text(
+        self,
+        call_kwargs: dict[str, Any],
+        agent_id: str,
+        usage: Optional[_Usage] = None,
+    ) -> tuple[str, int]:
+        """Run one request through the batch executor; return (text, output_tokens)."""
+        if self.verbose:
+            print(f"  ⏳ [{agent_id}] queued for batch execution")
+        with self.tracer.span("batch.wait"):
+            message = await self.batch.submit(call_kwargs, label=agent_id)
+        if usage is not None:
+            usage.add(message.usage)
+        return message_text(message), message.usage.output_tokens
 
     async def _run_two_pass(
         self,
-        system: str,
+        system: str | list[dict[str, Any]],
         user_message: str,
         agent_cfg: dict[str, Any],
         agent_id: str,
+        priority: float = 0.0,
+        usage: Optional[_Usage] = None,
+        parser: Optional[FileBlockParser] = None,
+        product_id: str = "",
+        plan_basis: Optional[str] = None,
+        force_replan: bool = False,
     ) -> tuple[str, int]:
         """
         Two-pass strategy for cognitive agents:
@@ -261,17 +951,35 @@ class ClaudeAgent:
 
         This separates the cognitive budget from the generation budget,
         preventing thinking from consuming tokens needed for structured output.
+
+        Pass 1 is skipped when the plan cache holds a plan for the same model,
+        thinking budget, system prompt and `plan_basis` (default: user_message),
+        unless force_replan is set.
         """
         thinking_budget = int(agent_cfg.get("thinking_budget_tokens", 4000))
-        max_output_tokens = int(agent_cfg.get(
-            "max_output_tokens",
-            agent_cfg.get("max_tokens", self.config.default_max_tokens),
-        ))
         model: str = agent_cfg.get("model", self.config.default_model)
 
         # ── Pass 1: Think and plan ──────────────────────────────────────────
+        plan_key = PlanCache.key_for(
+            model, thinking_budget, system, user_message if plan_basis is None else plan_basis
+        )
+        cached_plan: Optional[tuple[str, int]] = None
+        if self.plan_cache is not None and product_id and not force_replan:
+            cached_plan = await self._offload(self.plan_cache.get, product_id, agent_id, plan_key)
+        if cached_plan is not None:
+            if self.verbose:
+                print(f"  ↺ [{agent_id}] Pass 1 skipped — reusing cached plan "
+                      f"({cached_plan[1]} tokens saved)")
+            if usage is not None:
+                usage.plan_cache_hit = True
+            # Reused plans cost nothing in this run
+            return await self._run_pass2(
+                system, user_message, cached_plan[0], 0, agent_cfg, agent_id,
+                priority=priority, usage=usage, parser=parser,
+            )
+
         if self.verbose:
-            print(f"  → [{agent_id}] Pass 1 (think + plan)…")
+            print(f"  → [{agent_id}] Pass 1 (think + plan{', forced' if force_replan else ''})…")
 
         pass1_user_msg = (
             user_message
@@ -285,21 +993,51 @@ class ClaudeAgent:
         # Pass 1 budget: thinking + small text for the plan
         pass1_api_tokens = thinking_budget + 2000
 
+        pass1_kwargs: dict[str, Any] = dict(
+            model=model,
+            max_tokens=pass1_api_tokens,
+            system=system,
+            thinking={"type": "enabled", "budget_tokens": thinking_budget},
+            messages=[{"role": "user", "content": pass1_user_msg}],
+        )
+
         async def _pass1() -> tuple[str, int]:
-            raw = ""
-            async with self.client.messages.stream(
-                model=model,
-                max_tokens=pass1_api_tokens,
-                system=system,
-                thinking={"type": "enabled", "budget_tokens": thinking_budget},
-                messages=[{"role": "user", "content": pass1_user_msg}],
-            ) as stream:
-                async for text in stream.text_stream:
-                    raw += text
-                final = await stream.get_final_message()
-                return raw, final.usage.output_tokens
+            return await self._stream_text(pass1_kwargs, priority, usage)
 
-        plan_output, pass1_tokens = await self._stream_call(_pass1, f"{agent_id}:pass1")
+        # A forced re-plan must not replay Pass 1 from the result cache either
+        plan_output, pass1_tokens = await self._stream_call(
+            _pass1, f"{agent_id}:pass1",
+            cache_key=None if force_replan else self._cache_key(pass1_kwargs, agent_cfg),
+            usage=usage,
+        )
+        if self.plan_cache is not None and product_id and plan_output.strip():
+            await self._offload(
+                self.plan_cache.put, product_id, agent_id, plan_key, plan_output, pass1_tokens
+            )
+
+        return await self._run_pass2(
+            system, user_message, plan_output, pass1_tokens, agent_cfg, agent_id,
+            priority=priority, usage=usage, parser=parser,
+        )
+
+    async def _run_pass2(
+        self,
+        system: str | list[dict[str, Any]],
+        user_message: str,
+        plan_output: str,
+        pass1_tokens: int,
+        agent_cfg: dict[str, Any],
+        agent_id: str,
+        priority: float = 0.0,
+        usage: Optional[_Usage] = None,
+        parser: Optional[FileBlockParser] = None,
+    ) -> tuple[str, int]:
+        """Pass 2 of the two-pass strategy: the plan injected, file output generated."""
+        max_output_tokens = int(agent_cfg.get(
+            "max_output_tokens",
+            agent_cfg.get("max_tokens", self.config.default_max_tokens),
+        ))
+        model: str = agent_cfg.get("model", self.config.default_model)
 
         # ── Pass 2: Generate output using plan as context ───────────────────
         if self.verbose:
@@ -309,24 +1047,24 @@ class ClaudeAgent:
             user_message
             + f"\n\n## STRUCTURED PLAN (from analysis pass)\n\n{plan_output}\n\n"
             "## PASS 2 — GENERATE FILE OUTPUT\n\n"
-            "Now produce the complete file output as specified in OUTPUT INSTRUCTIONS above. "
+            "Now produce the complete file output as specified in OUTPUT INSTRUCTIONS. "
             "Follow your plan exactly. Use the FILE block format for every output file."
         )
 
+        pass2_kwargs: dict[str, Any] = dict(
+            model=model,
+            max_tokens=max_output_tokens,
+            system=system,
+            messages=[{"role": "user", "content": pass2_user_msg}],
+        )
+
         async def _pass2() -> tuple[str, int]:
-            raw = ""
-            async with self.client.messages.stream(
-                model=model,
-                max_tokens=max_output_tokens,
-                system=system,
-                messages=[{"role": "user", "content": pass2_user_msg}],
-            ) as stream:
-                async for text in stream.text_stream:
-                    raw += text
-                final = await stream.get_final_message()
-                return raw, final.usage.output_tokens
+            return await self._stream_text(pass2_kwargs, priority, usage, parser)
 
-        full_output, pass2_tokens = await self._stream_call(_pass2, f"{agent_id}:pass2")
+        full_output, pass2_tokens = await self._stream_call(
+            _pass2, f"{agent_id}:pass2", cache_key=self._cache_key(pass2_kwargs, agent_cfg),
+            usage=usage,
+        )
 
         return full_output, pass1_tokens + pass2_tokens
 
@@ -338,12 +1076,15 @@ class ClaudeAgent:
         output_files: list[str],
         agent_cfg: dict[str, Any],
         product_id: str,
+        artifacts: Optional[list[Artifact]] = None,
     ) -> tuple[bool, str, str]:
         """
         Validate that agent produced meaningful output.
         Returns (ok, failure_reason, failure_type).
+        `artifacts`: the output files as already loaded by self.validator.
 
         failure_type values: "empty_output" | "missing_files" | "outcome_invalid" | ""
+        ("stream_aborted" is raised while streaming, see file_stream.StreamGuard)
         """
         declared: list[str] = agent_cfg.get("output_files", [])
         outcome_cfg: dict = agent_cfg.get("outcome_validation", {})
@@ -368,71 +1109,30 @@ class ClaudeAgent:
                 "missing_files",
             )
 
-        # 3. Minimum file size check
-        min_size: int = outcome_cfg.get("min_file_size_bytes", 0)
-        if min_size > 0:
-            base = self.config.base_dir
-            for rel in output_files:
-                abs_path = base / rel
-                if abs_path.exists():
-                    size = abs_path.stat().st_size
-                    if size < min_size:
-                        return (
-                            False,
-                            f"Output file {rel} too small ({size} < {min_size} bytes)",
-                            "outcome_invalid",
-                        )
-
-        # 4. Required keys in first YAML output (supports dot-notation for nested keys)
-        required_keys: list[str] = outcome_cfg.get("required_keys", [])
-        if required_keys:
-            import yaml
-            base = self.config.base_dir
-            for rel in output_files:
-                if rel.endswith((".yaml", ".yml")):
-                    abs_path = base / rel
-                    if abs_path.exists():
-                        try:
-                            data = yaml.safe_load(abs_path.read_text()) or {}
-                            missing = []
-                            for k in required_keys:
-                                parts = k.split(".")
-                                node = data
-                                for part in parts:
-                                    if not isinstance(node, dict) or part not in node:
-                                        missing.append(k)
-                                        break
-                                    node = node[part]
-                            if missing:
-                                return (
-                                    False,
-                                    f"Required keys missing in {rel}: {missing}",
-                                    "outcome_invalid",
-                                )
-                        except Exception as e:
-                            return False, f"YAML parse error in {rel}: {e}", "outcome_invalid"
-                    break  # only check first yaml file
-
-        # 5. Required content strings in HTML output files
-        required_content: list[str] = outcome_cfg.get("required_content", [])
-        if required_content:
-            base = self.config.base_dir
-            for rel in output_files:
-                if rel.endswith(".html"):
-                    abs_path = base / rel
-                    if abs_path.exists():
-                        text = abs_path.read_text()
-                        missing_content = [s for s in required_content if s not in text]
-                        if missing_content:
-                            return (
-                                False,
-                                f"Required content missing in {rel}: {missing_content}",
-                                "outcome_invalid",
-                            )
-                    break  # only check first html file
+        # 3. Registered validators over every output file (validators.py):
+        #    min size, YAML/JSON syntax, required keys/content, HTML, JS
+        if artifacts is None:
+            artifacts = self.validator.load(output_files)
+        failure = self.validator.validate(artifacts, agent_cfg)
+        if failure:
+            return False, failure, "outcome_invalid"
 
         return True, "", ""
 
+    def _load_and_check(
+        self,
+        raw_output: str,
+        output_files: list[str],
+        agent_cfg: dict[str, Any],
+        product_id: str,
+    ) -> tuple[Optional[dict], bool, str, str]:
+        """(parsed_data, ok, failure_reason, failure_type) from one read of the outputs."""
+        artifacts = self.validator.load(output_files)
+        ok, failure_reason, failure_type = self._check_outcome(
+            raw_output, output_files, agent_cfg, product_id, artifacts
+        )
+        return self._try_parse_yaml(artifacts), ok, failure_reason, failure_type
+
     # ── Output file handling ───────────────────────────────────────────────
 
     def _write_output_files(
@@ -440,51 +1140,140 @@ class ClaudeAgent:
         raw_output: str,
         agent_cfg: dict[str, Any],
         product_id: str,
+        streamed: Optional[list[str]] = None,
+        patches: Optional[list[PatchOutcome]] = None,
+        raw_fallback: bool = True,
     ) -> list[str]:
-        """Parse FILE blocks from raw_output, write them to disk, return paths."""
+        """Parse FILE blocks from raw_output, write them to disk, return paths.
+        `streamed`: paths the FileBlockParser already wrote during streaming.
+        PATCH blocks are applied after the FILE blocks; their outcomes (including
+        failures) are appended to `patches`. `raw_fallback`: write a response
+        without any block to the first declared output file."""
         written: list[str] = []
         base = self.config.base_dir
 
-        for match in _FILE_BLOCK.finditer(raw_output):
-            rel_path = match.group(1).strip()
-            content = match.group(2)
+        if streamed is not None:
+            written.extend(streamed)
+        else:
+            blocks: list[tuple[Path, str]] = []
+            for match in _FILE_BLOCK.finditer(raw_output):
+                rel_path = match.group(1).strip()
+                content = match.group(2)
+
+                # Resolve {product_id} template in the path
+                rel_path = rel_path.replace("{product_id}", product_id)
 
-            # Resolve {product_id} template in the path
-            rel_path = rel_path.replace("{product_id}", product_id)
+                blocks.append((base / rel_path, content))
+                written.append(rel_path)
+            write_files(blocks)
+            for abs_path, _ in blocks:
+                self.config.store.invalidate(abs_path)
 
-            abs_path = base / rel_path
-            abs_path.parent.mkdir(parents=True, exist_ok=True)
-            abs_path.write_text(content)
-            written.append(rel_path)
+        declared: list[str] = agent_cfg.get("output_files", [])
+        patched = has_patches(raw_output)
+        if patched:
+            guard = StreamGuard.for_agent(self.config, agent_cfg)
+            outcomes = apply_patches(self.config, raw_output, product_id, allows=guard.allows)
+            written.extend(o.path for o in outcomes if o.ok and o.path not in written)
+            if patches is not None:
+                patches.extend(outcomes)
 
         # Fallback: if no FILE blocks but there are declared output_files and
         # raw output looks like the correct format, write raw_output to first file.
-        declared: list[str] = agent_cfg.get("output_files", [])
-        if not written and declared and raw_output.strip():
+        if raw_fallback and not written and not patched and declared and raw_output.strip():
             resolved = self.config.resolve_paths(declared[:1], product_id)
             if resolved:
                 p = resolved[0]
-                p.parent.mkdir(parents=True, exist_ok=True)
-                p.write_text(raw_output)
+                atomic_write(p, raw_output)
+                self.config.store.invalidate(p)
                 written.append(str(p.relative_to(base)))
 
         return written
 
-    def _try_parse_yaml(
+    def _write_report(self, path: Path, text: str) -> str:
+        atomic_write(path, text)
+        self.config.store.invalidate(path)
+        return str(path.relative_to(self.config.base_dir))
+
+    def _static_gate_result(
         self,
-        raw_output: str,
-        output_files: list[str],
+        agent_cfg: dict[str, Any],
+        product_id: str,
+        attempt: int,
+        report: StaticReport,
+        input_digests: dict[str, Optional[str]],
+        start: float,
+    ) -> AgentResult:
+        """RED static pre-check: its report stands in for the gate's own report."""
+        agent_id: str = agent_cfg["id"]
+        declared = self.config.resolve_paths(agent_cfg.get("output_files", [])[:1], product_id)
+        path = declared[0] if declared else self.static_gates.report_path(report.gate, product_id)
+        text = report.to_yaml()
+        rel = self._write_report(path, text)
+        self.fingerprints.record(product_id, agent_id, input_digests, [rel])
+        if self.verbose:
+            print(f"  ✓ [{agent_id}] RED from static pre-check — LLM gate skipped ({rel})")
+        return AgentResult(
+            agent_id=agent_id,
+            product_id=product_id,
+            success=True,
+            output_files=[rel],
+            raw_output=text,
+            parsed_data=report.to_dict(),
+            tokens_used=0,
+            duration_seconds=time.monotonic() - start,
+            attempt=attempt,
+        )
+
+    async def _regenerate_files(
+        self,
+        agent_cfg: dict[str, Any],
         product_id: str,
-    ) -> Optional[dict]:
-        """Try to parse first .yaml output file; return dict or None."""
-        import yaml
-
-        for rel in output_files:
-            if rel.endswith((".yaml", ".yml")):
-                abs_path = self.config.base_dir / rel
-                if abs_path.exists():
-                    try:
-                        return yaml.safe_load(abs_path.read_text())
-                    except Exception:
-                        pass
+        failed: list[PatchOutcome],
+        priority: float = 0.0,
+        usage: Optional[_Usage] = None,
+    ) -> tuple[str, int, list[str]]:
+        """Fallback for patches that did not apply: ask for the files in full.
+        The call gets full-file OUTPUT INSTRUCTIONS for just these files, not the
+        agent's PATCH instructions; the role prompt block stays prompt-cached.
+        Returns (raw_output, output_tokens, paths written)."""
+        agent_id: str = agent_cfg["id"]
+        regen_cfg = {**agent_cfg, "output_format": "mixed", "output_files": [p.path for p in failed]}
+        system_prompt = self._system_blocks(
+            *await self._offload(self._build_prefix, regen_cfg, product_id)
+        )
+        if self.verbose:
+            print(f"  ↻ [{agent_id}] {len(failed)} patch(es) failed — regenerating "
+                  f"{', '.join(p.path for p in failed)} in full")
+        listing = "\n".join(f"  - {p.path}: {p.error}" for p in failed)
+        user_message = (
+            "## ADDITIONAL CONTEXT\n\n"
+            f"These PATCH blocks could not be applied:\n{listing}\n\n"
+            "Output each of these files completely, with your fix applied, as a "
+            "FILE block (--- FILE: path --- … --- END FILE ---). No PATCH blocks."
+        )
+        for p in failed:
+            text = await self._offload(self.config.store.get, self.config.base_dir / p.path)
+            if text is not None:
+                user_message += f"\n\n=== {p.path} (current) ===\n{text}"
+        parser = self._file_parser(agent_cfg, product_id)
+        raw_output, tokens = await self._call_claude(
+            system_prompt, user_message, agent_cfg, agent_id,
+            priority=priority, usage=usage, parser=parser,
+        )
+        streamed = await self._offload(parser.close) if parser and parser.chars_seen else None
+        written = await self._offload(
+            self._write_output_files, raw_output, agent_cfg, product_id,
+            streamed=streamed, raw_fallback=False,
+        )
+        return raw_output, tokens, written
+
+    @staticmethod
+    def _try_parse_yaml(artifacts: list[Artifact]) -> Optional[dict]:
+        """First .yaml output file that parses; None if there is none."""
+        for artifact in artifacts:
+            if artifact.exists and artifact.suffix in (".yaml", ".yml"):
+                data, error = artifact.yaml()
+                if not error:
+                    return data
         return None
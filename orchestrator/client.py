@@ -0,0 +1,234 @@
+# orchestrator/client.py
+"""One pooled AsyncAnthropic client for the whole process.
+
+Every ClaudeAgent (and with it every parallel pipeline and fleet product)
+shares the client of ClientPool, so connections and TLS sessions are reused
+instead of each agent opening its own pool. pipeline.yaml `http_client`:
+
+  max_connections            upper bound on open sockets — keeps file
+                             descriptors bounded in fleet runs
+  max_keepalive_connections  idle connections kept for reuse
+  keepalive_expiry_s         how long an idle connection is kept
+  http2                      auto → HTTP/2 when the `h2` package is installed
+                             (many streams over one connection)
+  prewarm_connections        connections opened at pipeline start, so the
+                             first call of each agent skips DNS/TCP/TLS setup
+
+The pool is bound to the event loop it is first used on (httpx connections
+cannot move between loops); aclose() at the end of the run releases it and
+the next client() call builds a fresh one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Optional
+
+from .config import PipelineConfig
+
+DEFAULT_SETTINGS: dict[str, Any] = {
+    "max_connections": 32,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry_s": 60,
+    "http2": "auto",
+    "prewarm_connections": 4,
+    "connect_timeout_s": 10,
+}
+# Pre-warm requests only need the connection, not an answer
+_PREWARM_TIMEOUT = 10.0
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _httpx() -> Any:
+    """The httpx package the installed SDK is built on (httpx2 in newer SDKs)."""
+    from anthropic import _base_client
+
+    return getattr(_base_client, "httpx2", None) or _base_client.httpx
+
+
+class _PoolStats:
+    """Counters updated by the transport for every request."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0              # requests started while every connection was busy
+
+
+def _counting_transport(stats: _PoolStats, max_connections: int, **kwargs: Any) -> Any:
+    """httpx transport that counts in-flight requests and waits for a connection."""
+    httpx = _httpx()
+
+    class CountedStream(httpx.AsyncByteStream):
+        """Response body; a streamed response holds its connection until closed."""
+
+        def __init__(self, stream: Any):
+            self._stream = stream
+            self._open = True
+
+        async def __aiter__(self) -> Any:
+            async for chunk in self._stream:
+                yield chunk
+
+        async def aclose(self) -> None:
+            try:
+                await self._stream.aclose()
+            finally:
+                if self._open:
+                    self._open = False
+                    with stats.lock:
+                        stats.in_flight -= 1
+
+    class CountingTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request: Any) -> Any:
+            with stats.lock:
+                stats.requests += 1
+                if stats.in_flight >= max_connections:
+                    stats.waits += 1
+                stats.in_flight += 1
+                stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            try:
+                response = await super().handle_async_request(request)
+            except BaseException:
+                with stats.lock:
+                    stats.in_flight -= 1
+                raise
+            response.stream = CountedStream(response.stream)
+            return response
+
+    return CountingTransport(**kwargs)
+
+
+class ClientPool:
+    """Builds, pre-warms, reports on and closes the shared AsyncAnthropic client."""
+
+    def __init__(self, settings: Optional[dict[str, Any]] = None, **client_kwargs: Any):
+        """client_kwargs go to AsyncAnthropic (base_url, api_key, max_retries, …)."""
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.client_kwargs = client_kwargs
+        http2 = self.settings["http2"]
+        self.http2 = _http2_available() if http2 == "auto" else bool(http2)
+        self._client: Optional[Any] = None
+        self._http: Optional[Any] = None
+        self._transport: Optional[Any] = None
+        self._stats = _PoolStats()
+        self._prewarm_task: Optional[asyncio.Task] = None
+        self.prewarm_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> "ClientPool":
+        return cls(config.http_client())
+
+    # ── Client ─────────────────────────────────────────────────────────────
+
+    def client(self) -> Any:
+        """The shared AsyncAnthropic client (built on first use)."""
+        if self._client is None:
+            import anthropic
+
+            httpx = _httpx()
+            s = self.settings
+            limits = httpx.Limits(
+                max_connections=int(s["max_connections"]),
+                max_keepalive_connections=int(s["max_keepalive_connections"]),
+                keepalive_expiry=float(s["keepalive_expiry_s"]),
+            )
+            self._transport = _counting_transport(
+                self._stats, int(s["max_connections"]), limits=limits, http2=self.http2,
+            )
+            # The SDK's httpx defaults (timeouts, redirects) with our transport
+            http_client_cls = getattr(anthropic, "DefaultAsyncHttpxClient", httpx.AsyncClient)
+            self._http = http_client_cls(
+                transport=self._transport,
+                timeout=httpx.Timeout(600.0, connect=float(s["connect_timeout_s"])),
+            )
+            self._client = anthropic.AsyncAnthropic(http_client=self._http, **self.client_kwargs)
+        return self._client
+
+    def owns(self, client: Any) -> bool:
+        """True if `client` is this pool's client (not a test/benchmark replacement)."""
+        return client is not None and client is self._client
+
+    # ── Pre-warming ────────────────────────────────────────────────────────
+
+    async def prewarm(self, connections: Optional[int] = None) -> None:
+        """Open connections to the API host before the first call; concurrent
+        and repeated calls share one pre-warm per client."""
+        client = self.client()
+        if self._prewarm_task is None:
+            count = int(self.settings["prewarm_connections"] if connections is None else connections)
+            # One HTTP/2 connection carries every stream
+            count = min(1 if self.http2 else count, int(self.settings["max_connections"]))
+            self._prewarm_task = asyncio.ensure_future(self._prewarm(client, count))
+        await asyncio.shield(self._prewarm_task)
+
+    async def _prewarm(self, client: Any, count: int) -> None:
+        if count <= 0:
+            return
+        started = time.perf_counter()
+        http, url = self._http, str(client.base_url)
+
+        async def touch() -> None:
+            try:
+                response = await http.request("HEAD", url, timeout=_PREWARM_TIMEOUT)
+                await response.aclose()
+            except Exception:
+                pass    # best effort: the real call sets up its own connection
+
+        await asyncio.gather(*(touch() for _ in range(count)))
+        self.prewarm_seconds = time.perf_counter() - started
+
+    # ── Shutdown ───────────────────────────────────────────────────────────
+
+    async def aclose(self) -> None:
+        """Close every connection; the next client() call builds a new client."""
+        client, self._client = self._client, None
+        self._http = self._transport = None
+        if self._prewarm_task is not None and not self._prewarm_task.done():
+            self._prewarm_task.cancel()
+        self._prewarm_task = None
+        if client is not None:
+            await client.close()
+
+    # ── Stats ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict[str, Any]:
+        """Open/idle connections (from httpcore's pool) and request counters."""
+        connections = getattr(getattr(self._transport, "_pool", None), "connections", []) or []
+        idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+        with self._stats.lock:
+            return {
+                "http2": self.http2,
+                "connections_open": len(connections),
+                "connections_idle": idle,
+                "max_connections": int(self.settings["max_connections"]),
+                "requests": self._stats.requests,
+                "in_flight": self._stats.in_flight,
+                "peak_in_flight": self._stats.peak_in_flight,
+                "connection_waits": self._stats.waits,
+                "prewarm_s": round(self.prewarm_seconds, 4),
+            }
+
+
+_shared: Optional[ClientPool] = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool(config: PipelineConfig) -> ClientPool:
+    """The process-wide pool; the first config's `http_client` settings apply."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ClientPool.from_config(config)
+        return _shared
@@ -1,54 +1,248 @@
 # orchestrator/config.py
-"""Load and resolve pipeline.yaml configuration."""
+"""Load and resolve pipeline.yaml configuration.
+
+Parsing is the expensive part of loading (PyYAML is slow in pure Python), so
+PipelineConfig keeps the parsed + compiled config as a pickle under
+CONFIG_CACHE_DIR, valid while pipeline.yaml's mtime and size are unchanged. On
+a cache hit neither the YAML parser nor `yaml` itself is imported; on a miss
+the C LibYAML loader is used when PyYAML was built with it.
+"""
 
 from __future__ import annotations
 
 import glob as _glob
+import hashlib
+import os
+import pickle
 import re
+import sys
+import time
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import IO, Any, Optional, Union
+
+from .aio import atomic_write
+from .context_store import ContextStore, default_store
+
+# File types included when a context_files entry is a directory
+_CONTEXT_SUFFIXES = (".md", ".yaml", ".yml", ".txt")
+
+_TEMPLATE_VAR = re.compile(r"\{(\w+)\}")
+
+# Parsed-config cache, relative to base_dir; bump _CACHE_FORMAT when the
+# compiled representation changes
+CONFIG_CACHE_DIR = "state/cache/config"
+_CACHE_FORMAT = 1
+
+
+# ── YAML ───────────────────────────────────────────────────────────────────
+
+_yaml_loader: Any = None
+
+
+def load_yaml(stream: Union[str, bytes, IO[Any]]) -> Any:
+    """yaml.safe_load, with the C LibYAML loader when available (~7x faster)."""
+    global _yaml_loader
+    import yaml
+
+    if _yaml_loader is None:
+        _yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(stream, Loader=_yaml_loader)
+
+
+# ── Compiled templates ─────────────────────────────────────────────────────
+
+class _Template:
+    """A string pre-split into alternating literal / variable-name segments."""
+
+    __slots__ = ("segments",)
+
+    def __init__(self, segments: list[str]):
+        self.segments = segments   # [lit, var, lit, var, …, lit]
+
+    def render(self, variables: dict[str, str]) -> str:
+        out = []
+        for i, seg in enumerate(self.segments):
+            if i % 2 == 0:
+                out.append(seg)
+            else:
+                out.append(variables.get(seg, "{" + seg + "}"))
+        return "".join(out)
+
+
+@lru_cache(maxsize=4096)
+def _compile_str(s: str) -> str | _Template:
+    """Plain strings stay str; strings with {vars} become a _Template."""
+    segments = _TEMPLATE_VAR.split(s)
+    return s if len(segments) == 1 else _Template(segments)
+
+
+def _compile(node: Any) -> Any:
+    if isinstance(node, str):
+        return _compile_str(node)
+    if isinstance(node, dict):
+        return {k: _compile(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_compile(item) for item in node]
+    return node
+
+
+def _render(node: Any, variables: dict[str, str]) -> Any:
+    if isinstance(node, _Template):
+        return node.render(variables)
+    if isinstance(node, dict):
+        return {k: _render(v, variables) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_render(item, variables) for item in node]
+    return node
+
+
+class _ProductView:
+    """Lazily resolved phases/agents for one product and one run timestamp.
+
+    Only the subtree that is asked for gets rendered; results are cached and
+    shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self, compiled_phases: list[dict[str, Any]], variables: dict[str, str]):
+        self.variables = variables
+        self._compiled = compiled_phases
+        self._phase_index = {p.get("id"): i for i, p in enumerate(compiled_phases)}
+        self._agent_index = {
+            a.get("id"): (i, j)
+            for i, p in enumerate(compiled_phases)
+            for j, a in enumerate(p.get("agents", []))
+        }
+        self._phases: dict[int, dict[str, Any]] = {}
+        self._agents: dict[tuple[int, int], dict[str, Any]] = {}
+        self._all: Optional[list[dict[str, Any]]] = None
+
+    def _agent_at(self, i: int, j: int) -> dict[str, Any]:
+        if (i, j) not in self._agents:
+            self._agents[(i, j)] = _render(self._compiled[i]["agents"][j], self.variables)
+        return self._agents[(i, j)]
+
+    def _phase_at(self, i: int) -> dict[str, Any]:
+        if i not in self._phases:
+            self._phases[i] = {
+                k: [self._agent_at(i, j) for j in range(len(v))] if k == "agents"
+                else _render(v, self.variables)
+                for k, v in self._compiled[i].items()
+            }
+        return self._phases[i]
+
+    def phases(self) -> list[dict[str, Any]]:
+        if self._all is None:
+            self._all = [self._phase_at(i) for i in range(len(self._compiled))]
+        return self._all
+
+    def phase(self, phase_id: str) -> Optional[dict[str, Any]]:
+        i = self._phase_index.get(phase_id)
+        return None if i is None else self._phase_at(i)
 
-import yaml
+    def agent(self, agent_id: str) -> Optional[dict[str, Any]]:
+        pos = self._agent_index.get(agent_id)
+        return None if pos is None else self._agent_at(*pos)
 
 
 class PipelineConfig:
     """Parsed and template-resolved pipeline.yaml."""
 
-    def __init__(self, yaml_path: str = "pipeline.yaml", base_dir: str = "."):
+    def __init__(
+        self,
+        yaml_path: str = "pipeline.yaml",
+        base_dir: str = ".",
+        store: Optional[ContextStore] = None,
+        cache_dir: Optional[str] = CONFIG_CACHE_DIR,
+    ):
         self.base_dir = Path(base_dir).resolve()
         self.yaml_path = self.base_dir / yaml_path
+        # Context file reads go through a memoized store shared process-wide
+        self.store = store or default_store()
+        # Pickled parse result, keyed by pipeline.yaml's mtime/size (None → always parse)
+        self.cache_dir = self.base_dir / cache_dir if cache_dir else None
         self._raw: dict[str, Any] = {}
+        self._compiled: dict[str, Any] = {}
+        self._views: dict[str, _ProductView] = {}
+        self.loaded_from = ""        # "cache" | "yaml"
+        self.load_seconds = 0.0
         self._load()
 
     # ── Loading ────────────────────────────────────────────────────────────
 
     def _load(self) -> None:
-        with open(self.yaml_path) as f:
-            self._raw = yaml.safe_load(f)
+        started = time.perf_counter()
+        stat = os.stat(self.yaml_path)
+        key = (_CACHE_FORMAT, sys.version_info[:2], str(self.yaml_path), stat.st_mtime_ns, stat.st_size)
+        cached = self._read_cache(key)
+        if cached is not None:
+            self._raw, self._compiled = cached
+            self.loaded_from = "cache"
+        else:
+            with open(self.yaml_path, "rb") as f:
+                self._raw = load_yaml(f)
+            self._compiled = _compile(self._raw)
+            self.loaded_from = "yaml"
+            self._write_cache(key)
+        self._views.clear()
+        self.load_seconds = time.perf_counter() - started
+
+    def _cache_path(self) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        tag = hashlib.sha1(str(self.yaml_path).encode()).hexdigest()[:12]
+        return self.cache_dir / f"{self.yaml_path.stem}-{tag}.pickle"
+
+    def _read_cache(self, key: tuple) -> Optional[tuple[dict[str, Any], dict[str, Any]]]:
+        path = self._cache_path()
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            if entry["key"] == key:
+                return entry["raw"], entry["compiled"]
+        except Exception:
+            pass    # missing, stale format or unreadable: parse the YAML instead
+        return None
+
+    def _write_cache(self, key: tuple) -> None:
+        path = self._cache_path()
+        if path is None:
+            return
+        try:
+            atomic_write(path, pickle.dumps({"key": key, "raw": self._raw, "compiled": self._compiled},
+                                            protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError:
+            pass    # read-only checkout: just no cache
 
     # ── Template resolution ────────────────────────────────────────────────
 
+    @staticmethod
+    def _new_variables(product_id: str) -> dict[str, str]:
+        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        return {"product_id": product_id, "timestamp": timestamp}
+
     def resolve(self, product_id: str) -> dict[str, Any]:
         """Return a deep copy of the config with all template vars resolved."""
-        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-        variables = {"product_id": product_id, "timestamp": timestamp}
-        return self._resolve_node(self._raw, variables)
-
-    def _resolve_node(self, node: Any, variables: dict[str, str]) -> Any:
-        if isinstance(node, str):
-            return self._resolve_str(node, variables)
-        if isinstance(node, dict):
-            return {k: self._resolve_node(v, variables) for k, v in node.items()}
-        if isinstance(node, list):
-            return [self._resolve_node(item, variables) for item in node]
-        return node
+        return _render(self._compiled, self._new_variables(product_id))
+
+    def view(self, product_id: str) -> _ProductView:
+        """Cached, lazily resolved per-product view (one timestamp per run)."""
+        view = self._views.get(product_id)
+        if view is None:
+            view = _ProductView(self._compiled.get("phases", []), self._new_variables(product_id))
+            self._views[product_id] = view
+        return view
+
+    def begin_run(self, product_id: str) -> None:
+        """Drop the cached view so the next run resolves a fresh {timestamp}."""
+        self._views.pop(product_id, None)
 
     def _resolve_str(self, s: str, variables: dict[str, str]) -> str:
-        def replacer(m: re.Match) -> str:
-            key = m.group(1)
-            return variables.get(key, m.group(0))
-        return re.sub(r"\{(\w+)\}", replacer, s)
+        compiled = _compile_str(s)
+        return compiled if isinstance(compiled, str) else compiled.render(variables)
 
     # ── Accessors ──────────────────────────────────────────────────────────
 
@@ -61,8 +255,18 @@ class PipelineConfig:
         return int(self._raw.get("default_max_tokens", 8192))
 
     def phases(self, product_id: str) -> list[dict[str, Any]]:
-        resolved = self.resolve(product_id)
-        return resolved.get("phases", [])
+        """Resolved phases for the product's current run (cached; read-only)."""
+        return self.view(product_id).phases()
+
+    def phase(self, product_id: str, phase_id: str) -> Optional[dict[str, Any]]:
+        return self.view(product_id).phase(phase_id)
+
+    def agent(self, product_id: str, agent_id: str) -> Optional[dict[str, Any]]:
+        return self.view(product_id).agent(agent_id)
+
+    def phase_templates(self) -> list[dict[str, Any]]:
+        """Unresolved phases as in pipeline.yaml (ids, flags; paths keep {vars})."""
+        return self._raw.get("phases", [])
 
     def autonomy_contract(self) -> dict[str, Any]:
         return self._raw.get("autonomy_contract", {})
@@ -70,12 +274,53 @@ class PipelineConfig:
     def conflict_resolution(self) -> dict[str, Any]:
         return self._raw.get("conflict_resolution", {})
 
+    def result_cache(self) -> dict[str, Any]:
+        return self._raw.get("result_cache", {})
+
+    def plan_cache(self) -> dict[str, Any]:
+        return self._raw.get("plan_cache", {})
+
+    def http_client(self) -> dict[str, Any]:
+        return self._raw.get("http_client", {})
+
+    def rate_limits(self) -> dict[str, Any]:
+        return self._raw.get("rate_limits", {})
+
+    def stream_guard(self) -> dict[str, Any]:
+        return self._raw.get("stream_guard", {})
+
+    def batch_execution(self) -> dict[str, Any]:
+        return self._raw.get("batch_execution", {})
+
+    def tracing(self) -> dict[str, Any]:
+        return self._raw.get("tracing", {})
+
+    def context_budget(self) -> dict[str, Any]:
+        return self._raw.get("context_budget", {})
+
+    def static_gates(self) -> dict[str, Any]:
+        return self._raw.get("static_gates", {})
+
+    def async_io(self) -> dict[str, Any]:
+        return self._raw.get("async_io", {})
+
+    def model_routing(self) -> dict[str, Any]:
+        return self._raw.get("model_routing", {})
+
+    def speculation(self) -> dict[str, Any]:
+        return self._raw.get("speculation", {})
+
+    def fleet(self) -> dict[str, Any]:
+        return self._raw.get("fleet", {})
+
+    def state_files(self) -> dict[str, Any]:
+        return self._raw.get("state_files", {})
+
     # ── File helpers ───────────────────────────────────────────────────────
 
     def resolve_paths(self, paths: list[str], product_id: str) -> list[Path]:
         """Resolve template strings to absolute Paths; expand globs."""
-        variables = {"product_id": product_id,
-                     "timestamp": datetime.utcnow().strftime("%Y%m%d-%H%M%S")}
+        variables = self.view(product_id).variables
         result: list[Path] = []
         for p in paths:
             resolved = self._resolve_str(p, variables)
@@ -86,19 +331,27 @@ class PipelineConfig:
                 result.append(self.base_dir / resolved)
         return result
 
+    def context_file_paths(self, paths: list[str], product_id: str) -> list[Path]:
+        """Resolve context_files entries to the concrete files an agent reads.
+        Directories expand to their .md/.yaml/.txt files; missing paths are kept."""
+        result: list[Path] = []
+        for p in self.resolve_paths(paths, product_id):
+            if p.is_dir():
+                result.extend(self.store.list_files(p, _CONTEXT_SUFFIXES))
+            else:
+                result.append(p)
+        return result
+
     def read_context_files(self, paths: list[str], product_id: str) -> str:
         """Return concatenated content of context files that exist.
         If a path is a directory, all .md and .yaml files within it are included."""
         parts: list[str] = []
-        for p in self.resolve_paths(paths, product_id):
-            if not p.exists():
+        for p in self.context_file_paths(paths, product_id):
+            text = self.store.get(p)
+            if text is None:
                 parts.append(f"=== {p.relative_to(self.base_dir)} === [FILE NOT FOUND]")
-            elif p.is_dir():
-                for child in sorted(p.rglob("*")):
-                    if child.is_file() and child.suffix in (".md", ".yaml", ".yml", ".txt"):
-                        parts.append(f"=== {child.relative_to(self.base_dir)} ===\n{child.read_text()}")
             else:
-                parts.append(f"=== {p.relative_to(self.base_dir)} ===\n{p.read_text()}")
+                parts.append(f"=== {p.relative_to(self.base_dir)} ===\n{text}")
         return "\n\n".join(parts)
 
     def ensure_output_dirs(self, paths: list[str], product_id: str) -> None:
@@ -0,0 +1,309 @@
+# orchestrator/context_budget.py
+"""Token budget for an agent's context files, per `context_size`.
+
+Every agent declares `context_size: small|medium|large`; the assembler maps it
+to a token budget (pipeline.yaml `context_budget.budgets`) and fits the
+context files into it instead of dumping every file in full:
+
+  1. sections   `context_sections: {entry: [key, …]}` on the agent narrows a
+                file to the listed YAML keys (dotted paths) or Markdown headings
+                before anything is measured.
+  2. primary    the agent's own inputs — product files (specs, code under
+                review, gate reports) and the intake — always go in full; the
+                budget only ever trims reference material (`trimmable`
+                prefixes: governance docs, state logs, agent docs).
+  3. priority   trimmable files explicitly listed first, in listed order;
+                files from a directory or glob expansion after them.
+  4. full       in that order, each file goes in full if it still fits,
+  5. outline    else as a deterministic outline (Markdown headings, YAML key
+                tree, head of plain text), cached by content hash in memory
+                and under `summary_dir`,
+  6. omitted    else as a one-line note that keeps the file visible to the agent.
+
+Files keep their listed order and the `=== path ===` delimiters, so the prompt
+prefix stays byte-identical across runs of unchanged inputs (prompt-cached).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+from .aio import atomic_write
+from .config import PipelineConfig, load_yaml
+from .limiter import estimate_tokens
+
+DEFAULT_BUDGETS = {"small": 4000, "medium": 12000, "large": 32000}
+# Reference material the budget may outline or omit; everything else is primary
+DEFAULT_TRIMMABLE = ("governance/", "state/", "agents/")
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_YAML_KEY = re.compile(r"^(\s*)(?:- )?([^\s#:][^:#]*):(?:\s|$)")
+# Outline limits
+_OUTLINE_YAML_DEPTH = 2
+_OUTLINE_LINE_CHARS = 160
+_OUTLINE_HEAD_LINES = 40
+
+
+@dataclass
+class ContextPart:
+    """One context file as it goes into the prompt."""
+
+    rel: str
+    text: Optional[str]          # None → file not found
+    tokens: int                  # estimate of the (possibly sectioned) full text
+    explicit: bool               # listed by name, not from a directory/glob expansion
+    trimmable: bool = False      # reference material; primary inputs always go in full
+    mode: str = "full"           # full | sections | outline | omitted | missing
+    rendered: str = ""
+
+    @property
+    def rendered_tokens(self) -> int:
+        return estimate_tokens(self.rendered)
+
+
+class ContextBudget:
+    """Assembles context files within the token budget of the agent's context_size."""
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        budgets: Optional[dict[str, int]] = None,
+        default_size: str = "large",
+        summary_dir: Optional[str | Path] = None,
+        trimmable: Optional[list[str]] = None,
+    ):
+        self.config = config
+        self.budgets = dict(budgets or DEFAULT_BUDGETS)
+        self.trimmable = tuple(trimmable) if trimmable is not None else DEFAULT_TRIMMABLE
+        self.default_size = default_size
+        self.summary_dir = config.base_dir / summary_dir if summary_dir else None
+        self._outlines: dict[str, str] = {}
+        self._sections: dict[tuple[str, tuple[str, ...]], str] = {}
+        self._lock = threading.Lock()
+        self.outline_hits = 0
+        self.outline_misses = 0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["ContextBudget"]:
+        """Build from pipeline.yaml `context_budget`; None if disabled."""
+        settings = config.context_budget()
+        if not settings.get("enabled", False):
+            return None
+        budgets = {**DEFAULT_BUDGETS, **{k: int(v) for k, v in settings.get("budgets", {}).items()}}
+        return cls(
+            config,
+            budgets,
+            default_size=settings.get("default_size", "large"),
+            summary_dir=settings.get("summary_dir"),
+            trimmable=settings.get("trimmable"),
+        )
+
+    def budget_for(self, agent_cfg: dict[str, Any]) -> int:
+        size = agent_cfg.get("context_size", self.default_size)
+        return self.budgets.get(size, self.budgets[self.default_size])
+
+    # ── Assembly ───────────────────────────────────────────────────────────
+
+    def assemble(self, agent_cfg: dict[str, Any], product_id: str) -> tuple[str, list[ContextPart]]:
+        """Concatenated context files within budget, plus what happened to each."""
+        parts = self.collect(agent_cfg, product_id)
+        self.fit(parts, self.budget_for(agent_cfg))
+        return "\n\n".join(part.rendered for part in parts), parts
+
+    def collect(self, agent_cfg: dict[str, Any], product_id: str) -> list[ContextPart]:
+        config = self.config
+        sections: dict[str, list[str]] = agent_cfg.get("context_sections", {})
+        parts: list[ContextPart] = []
+        seen: set[Path] = set()
+        for entry in agent_cfg.get("context_files", []):
+            paths = config.context_file_paths([entry], product_id)
+            explicit = len(paths) == 1 and not any(c in entry for c in "*?[") and not entry.endswith("/")
+            selectors = sections.get(entry)
+            for path in paths:
+                if path in seen:
+                    continue
+                seen.add(path)
+                rel = str(path.relative_to(config.base_dir))
+                text = config.store.get(path)
+                part = ContextPart(rel, text, 0, explicit, rel.startswith(self.trimmable))
+                if text is not None and selectors:
+                    text = self.extract_sections(text, path.suffix, selectors)
+                    part.text, part.mode = text, "sections"
+                part.tokens = estimate_tokens(text) if text is not None else 0
+                parts.append(part)
+        return parts
+
+    def fit(self, parts: list[ContextPart], budget: int) -> None:
+        """Decide each part's mode in priority order: full, else outline, else omitted.
+        Primary parts go in full even past the budget; what is left trims the rest."""
+        remaining = budget
+        order = sorted(range(len(parts)), key=lambda i: (parts[i].trimmable, not parts[i].explicit, i))
+        for i in order:
+            part = parts[i]
+            if part.text is None:
+                part.mode = "missing"
+                part.rendered = f"=== {part.rel} === [FILE NOT FOUND]"
+            elif part.tokens <= remaining or not part.trimmable:
+                label = " [SECTIONS ONLY]" if part.mode == "sections" else ""
+                part.rendered = f"=== {part.rel} ==={label}\n{part.text}"
+            else:
+                outline = self.outline(part.text, Path(part.rel).suffix)
+                rendered = (f"=== {part.rel} === [OUTLINE — {part.tokens} tokens exceed the "
+                            f"context budget]\n{outline}")
+                if estimate_tokens(rendered) <= remaining:
+                    part.mode, part.rendered = "outline", rendered
+                else:
+                    part.mode = "omitted"
+                    part.rendered = (f"=== {part.rel} === [OMITTED — {part.tokens} tokens exceed "
+                                     f"the context budget]")
+            remaining -= part.rendered_tokens
+
+    # ── Sections ───────────────────────────────────────────────────────────
+
+    def extract_sections(self, text: str, suffix: str, selectors: list[str]) -> str:
+        """Only the selected YAML keys (dotted paths) or Markdown headings."""
+        key = (_digest(text), tuple(selectors))
+        with self._lock:
+            cached = self._sections.get(key)
+        if cached is not None:
+            return cached
+        if suffix in (".yaml", ".yml"):
+            result = _yaml_sections(text, selectors)
+        elif suffix == ".md":
+            result = _markdown_sections(text, selectors)
+        else:
+            result = text
+        with self._lock:
+            self._sections[key] = result
+        return result
+
+    # ── Outlines ───────────────────────────────────────────────────────────
+
+    def outline(self, text: str, suffix: str) -> str:
+        """Deterministic outline of an oversized file, cached by content hash."""
+        digest = _digest(text)
+        with self._lock:
+            cached = self._outlines.get(digest)
+            if cached is not None:
+                self.outline_hits += 1
+                return cached
+        path = self.summary_dir / digest[:2] / f"{digest}.txt" if self.summary_dir else None
+        if path is not None and path.is_file():
+            result = path.read_text(encoding="utf-8")
+        else:
+            if suffix in (".yaml", ".yml"):
+                result = _yaml_outline(text)
+            elif suffix == ".md":
+                result = _markdown_outline(text)
+            else:
+                result = _head_outline(text)
+            if path is not None:
+                # Parallel agents and products outline the same files concurrently
+                atomic_write(path, result)
+        with self._lock:
+            self._outlines[digest] = result
+            self.outline_misses += 1
+        return result
+
+
+# ── Helpers ────────────────────────────────────────────────────────────────
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= _OUTLINE_LINE_CHARS else line[: _OUTLINE_LINE_CHARS - 1] + "…"
+
+
+def _yaml_sections(text: str, selectors: list[str]) -> str:
+    try:
+        data = load_yaml(text)
+    except yaml.YAMLError:
+        return text
+    if not isinstance(data, dict):
+        return text
+    selected: dict[str, Any] = {}
+    for selector in selectors:
+        node: Any = data
+        keys = selector.split(".")
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                break
+            node = node[key]
+        else:
+            target = selected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = node
+    if not selected:
+        return text
+    return yaml.safe_dump(selected, sort_keys=False, allow_unicode=True, width=120)
+
+
+def _markdown_sections(text: str, selectors: list[str]) -> str:
+    wanted = [s.lower() for s in selectors]
+    out: list[str] = []
+    level = 0          # level of the heading being copied; 0 → not copying
+    for line in text.splitlines():
+        match = _MD_HEADING.match(line)
+        if match:
+            depth = len(match.group(1))
+            if level and depth <= level:
+                level = 0
+            if not level and any(w in match.group(2).lower() for w in wanted):
+                level = depth
+        if level:
+            out.append(line)
+    return "\n".join(out) if out else text
+
+
+def _markdown_outline(text: str) -> str:
+    out: list[str] = []
+    expect_first_line = False
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        if _MD_HEADING.match(line):
+            out.append(line)
+            expect_first_line = True
+        elif expect_first_line and line.strip():
+            out.append(_clip(line.strip()))
+            expect_first_line = False
+    return "\n".join(out) if out else _head_outline(text)
+
+
+def _yaml_outline(text: str) -> str:
+    """Keys down to _OUTLINE_YAML_DEPTH levels; scalar values clipped, blocks elided."""
+    out: list[str] = []
+    indents: list[int] = []
+    for line in text.splitlines():
+        match = _YAML_KEY.match(line)
+        if not match:
+            continue
+        indent = len(match.group(1)) + (2 if line.lstrip().startswith("- ") else 0)
+        while indents and indents[-1] >= indent:
+            indents.pop()
+        if len(indents) < _OUTLINE_YAML_DEPTH:
+            out.append(_clip(line.rstrip()))
+        indents.append(indent)
+    return "\n".join(out) if out else _head_outline(text)
+
+
+def _head_outline(text: str) -> str:
+    lines = text.splitlines()
+    head = [_clip(line) for line in lines[:_OUTLINE_HEAD_LINES]]
+    if len(lines) > _OUTLINE_HEAD_LINES:
+        head.append(f"… ({len(lines) - _OUTLINE_HEAD_LINES} more lines)")
+    return "\n".join(head)
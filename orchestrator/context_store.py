@@ -0,0 +1,154 @@
+# orchestrator/context_store.py
+"""Process-wide, memoized store for context files read by agents.
+
+The same governance policies, intake files and template directories are read
+by many agents and by several products in parallel. The store reads each file
+once and hands out the same (immutable) str on every later request, keyed by
+(path, mtime_ns, size) so edits on disk are picked up automatically. Files the
+orchestrator writes itself are invalidated explicitly via invalidate().
+
+The cache is an LRU bounded by the total size of the cached files (max_bytes),
+so a long-lived process that works through many products does not keep every
+file it has ever read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class _Entry:
+    mtime_ns: int
+    size: int
+    text: str
+    digest: str
+
+
+class ContextStore:
+    """LRU cache of file contents, bounded by their total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Path, _Entry] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.disk_reads = 0
+        self.bytes_read = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    # ── Files ──────────────────────────────────────────────────────────────
+
+    def _load(self, path: Path) -> Optional[_Entry]:
+        with self._lock:
+            self.requests += 1
+            entry = self._entries.get(path)
+
+        try:
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self._drop(path)
+            return None
+
+        if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += entry.size
+                if path in self._entries:
+                    self._entries.move_to_end(path)
+            return entry
+
+        data = path.read_bytes()
+        entry = _Entry(
+            mtime_ns=stat.st_mtime_ns,
+            size=len(data),
+            text=data.decode("utf-8"),
+            digest=hashlib.sha256(data).hexdigest(),
+        )
+        with self._lock:
+            self.disk_reads += 1
+            self.bytes_read += entry.size
+            self._drop(path)
+            if entry.size <= self.max_bytes:
+                self._entries[path] = entry
+                self._cached_bytes += entry.size
+                while self._cached_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._cached_bytes -= evicted.size
+                    self.evictions += 1
+        return entry
+
+    def _drop(self, path: Path) -> None:
+        """Remove an entry; the caller holds the lock."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._cached_bytes -= entry.size
+
+    def get(self, path: Path) -> Optional[str]:
+        """File content as str, or None if the file does not exist."""
+        entry = self._load(Path(path))
+        return entry.text if entry else None
+
+    def digest(self, path: Path) -> Optional[str]:
+        """SHA-256 of the file's bytes, or None if the file does not exist."""
+        entry = self._load(Path(path))
+        return entry.digest if entry else None
+
+    # ── Directories ────────────────────────────────────────────────────────
+
+    def list_files(self, directory: Path, suffixes: tuple[str, ...]) -> list[Path]:
+        """Sorted recursive listing of files with the given suffixes (not cached:
+        agents add files to the directories they read)."""
+        return [
+            child for child in sorted(Path(directory).rglob("*"))
+            if child.is_file() and child.suffix in suffixes
+        ]
+
+    # ── Invalidation ───────────────────────────────────────────────────────
+
+    def invalidate(self, path: Path) -> None:
+        """Forget a file after a write."""
+        with self._lock:
+            self._drop(Path(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cached_bytes = 0
+
+    # ── Stats ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "disk_reads": self.disk_reads,
+                "hits": self.hits,
+                "cached_files": len(self._entries),
+                "cached_bytes": self._cached_bytes,
+                "evictions": self.evictions,
+                "bytes_read": self.bytes_read,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+_default_store: Optional[ContextStore] = None
+
+
+def default_store() -> ContextStore:
+    """The process-wide store shared by every PipelineConfig."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ContextStore()
+    return _default_store
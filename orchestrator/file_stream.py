@@ -0,0 +1,251 @@
+# orchestrator/file_stream.py
+"""Incremental FILE-block parser fed directly from the response stream.
+
+Recognises the same multi-file protocol as claude_agent._FILE_BLOCK:
+
+    --- FILE: path/to/file.ext ---
+    <content>
+    --- END FILE ---
+
+but works chunk by chunk: block boundaries may be split across stream chunks,
+each block's content is streamed into a temp file next to its target and
+atomically renamed into place when the END marker arrives, and a per-file
+callback fires as soon as a file is complete — before the rest of the
+response (other files, the summary) has been generated.
+
+An optional StreamGuard makes the parser abort the stream (StreamAborted) as
+soon as the outcome can no longer be valid: no FILE block within the first N
+tokens, or a block targeting a path outside the agent's output_files.
+PATCH blocks (orchestrator/patcher.py) count as output for the guard but are
+skipped here; they are applied once the response is complete.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import itertools
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, TextIO
+
+from .aio import ensure_dirs
+from .config import PipelineConfig
+from .limiter import _CHARS_PER_TOKEN
+
+# Header must fill the rest of its line (the batch regex requires "---\n")
+_HEADER = re.compile(r"---\s*FILE:\s*(.+?)\s*---$", re.IGNORECASE)
+_END = re.compile(r"---\s*END FILE\s*---", re.IGNORECASE)
+_PATCH_HEADER = re.compile(r"---\s*PATCH:\s*(.+?)\s*---$", re.IGNORECASE)
+_PATCH_END = re.compile(r"---\s*END PATCH\s*---", re.IGNORECASE)
+
+# Very long lines (minified assets) are flushed early, keeping a tail long
+# enough to hold an END marker that is still arriving
+_MAX_PENDING = 8192
+_MARKER_TAIL = 64
+
+# Unresolved template variables ({feature_name}, {violation.file}, …) match anything
+_UNRESOLVED_VAR = re.compile(r"\{[\w.]+\}")
+
+FileCallback = Callable[[str], None]
+
+# Temp-file suffixes must be unique per write: parallel products in one
+# process may stream the same shared output (e.g. state/*.yaml) at once
+_tmp_ids = itertools.count()
+
+
+class StreamAborted(Exception):
+    """The stream was cut off early because its output cannot pass outcome validation."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.partial = ""          # text received before the abort
+        self.output_tokens = 0     # estimated, the API reports no usage for it
+
+
+@dataclass
+class StreamGuard:
+    """Early-abort and continuation settings for one agent's output stream."""
+
+    first_file_within_tokens: int = 0          # 0 = no limit
+    declared: list[str] = field(default_factory=list)
+    max_continuations: int = 0
+
+    @classmethod
+    def for_agent(cls, config: PipelineConfig, agent_cfg: dict[str, Any]) -> "StreamGuard":
+        """pipeline.yaml `stream_guard`, overridden per agent in outcome_validation."""
+        settings = {**config.stream_guard(), **agent_cfg.get("outcome_validation", {})}
+        if not settings.get("enabled", True):
+            return cls()
+        declared = []
+        if settings.get("enforce_declared_paths", True):
+            declared = [_UNRESOLVED_VAR.sub("*", p.strip()) for p in agent_cfg.get("output_files", [])]
+        first_file = int(settings.get("first_file_within_tokens", 0))
+        if settings.get("allow_empty", False):
+            first_file = 0
+        return cls(
+            first_file_within_tokens=first_file,
+            declared=declared,
+            max_continuations=int(settings.get("max_continuations", 0)),
+        )
+
+    def allows(self, rel_path: str) -> bool:
+        return not self.declared or any(fnmatch.fnmatch(rel_path, p) for p in self.declared)
+
+
+class FileBlockParser:
+    """State machine: outside a block ↔ inside a block (streaming to a temp file)."""
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        product_id: str,
+        on_file_complete: Optional[FileCallback] = None,
+        guard: Optional[StreamGuard] = None,
+    ):
+        self.config = config
+        self.product_id = product_id
+        self.on_file_complete = on_file_complete
+        self.guard = guard or StreamGuard()
+        self.written: list[str] = []
+        self.patched: list[str] = []            # PATCH block targets seen (not applied here)
+        self.chars_seen = 0
+        self.write_seconds = 0.0                # parsing + disk writes, for tracing
+        # Path of a block that was still open when the stream ended
+        self.truncated: Optional[str] = None
+        self._pending = ""                      # incomplete last line
+        self._rel: Optional[str] = None         # block currently open
+        self._tmp: Optional[Path] = None
+        self._fh: Optional[TextIO] = None
+        self._in_patch = False
+
+    @property
+    def in_block(self) -> bool:
+        return self._rel is not None
+
+    @property
+    def current_path(self) -> Optional[str]:
+        return self._rel
+
+    # ── Feeding ────────────────────────────────────────────────────────────
+
+    def feed(self, text: str) -> None:
+        started = time.perf_counter()
+        try:
+            self._feed(text)
+        finally:
+            self.write_seconds += time.perf_counter() - started
+
+    def _feed(self, text: str) -> None:
+        self.chars_seen += len(text)
+        pending = self._pending + text
+        start = 0
+        while True:
+            nl = pending.find("\n", start)
+            if nl < 0:
+                break
+            self._line(pending[start:nl], newline=True)
+            start = nl + 1
+        pending = pending[start:]
+        if self._rel is not None and len(pending) > _MAX_PENDING and not _END.search(pending):
+            self._fh.write(pending[:-_MARKER_TAIL])
+            pending = pending[-_MARKER_TAIL:]
+        self._pending = pending
+
+        budget = self.guard.first_file_within_tokens
+        if (budget and self._rel is None and not self.written and not self.patched
+                and self.chars_seen // _CHARS_PER_TOKEN > budget):
+            raise StreamAborted(f"No FILE block within the first ~{budget} output tokens")
+
+    def close(self) -> list[str]:
+        """Flush the last line; an unterminated block is discarded as truncated."""
+        if self._pending:
+            self._line(self._pending, newline=False)
+            self._pending = ""
+        if self._rel is not None:
+            self.truncated = self._rel
+            self._discard()
+        return self.written
+
+    def reset(self) -> None:
+        """Start over (e.g. the stream is retried after a transient error)."""
+        self._discard()
+        self._pending = ""
+        self._in_patch = False
+        self.written = []
+        self.patched = []
+        self.chars_seen = 0
+        self.write_seconds = 0.0
+        self.truncated = None
+
+    # ── State machine ──────────────────────────────────────────────────────
+
+    def _line(self, line: str, newline: bool) -> None:
+        if self._in_patch:
+            self._in_patch = _PATCH_END.search(line) is None
+            return
+        if self._rel is None:
+            if newline:
+                m = _HEADER.search(line)
+                if m:
+                    self._open(m.group(1).strip())
+                    return
+                m = _PATCH_HEADER.search(line)
+                if m:
+                    self._open_patch(m.group(1).strip())
+            return
+
+        m = _END.search(line)
+        if m is None:
+            self._fh.write(line + "\n" if newline else line)
+            return
+        self._fh.write(line[:m.start()])
+        self._commit()
+        rest = line[m.end():]
+        if rest:
+            self._line(rest, newline)
+
+    def _open(self, rel_path: str) -> None:
+        rel_path = rel_path.replace("{product_id}", self.product_id)
+        if not self.guard.allows(rel_path):
+            raise StreamAborted(f"FILE block targets {rel_path}, which is not in output_files")
+        abs_path = self.config.base_dir / rel_path
+        # Runs on the I/O pool: directories created before cost no syscall
+        ensure_dirs([abs_path])
+        self._rel = rel_path
+        self._tmp = abs_path.with_name(f".{abs_path.name}.{os.getpid()}-{next(_tmp_ids)}.part")
+        try:
+            self._fh = open(self._tmp, "w")
+        except FileNotFoundError:
+            # Directory removed since it was created (e.g. a discarded shadow workspace)
+            abs_path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self._tmp, "w")
+
+    def _open_patch(self, rel_path: str) -> None:
+        rel_path = rel_path.replace("{product_id}", self.product_id)
+        if not self.guard.allows(rel_path):
+            raise StreamAborted(f"PATCH block targets {rel_path}, which is not in output_files")
+        self.patched.append(rel_path)
+        self._in_patch = True
+
+    def _commit(self) -> None:
+        rel, tmp = self._rel, self._tmp
+        self._fh.close()
+        abs_path = self.config.base_dir / rel
+        os.replace(tmp, abs_path)
+        self.config.store.invalidate(abs_path)
+        self._rel = self._tmp = self._fh = None
+        self.written.append(rel)
+        if self.on_file_complete:
+            self.on_file_complete(rel)
+
+    def _discard(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            try:
+                self._tmp.unlink()
+            except FileNotFoundError:
+                pass
+        self._rel = self._tmp = self._fh = None
@@ -0,0 +1,149 @@
+# orchestrator/fingerprints.py
+"""Per-agent input/output fingerprints for incremental pipeline re-execution.
+
+After each successful agent call the orchestrator records a SHA-256 digest of
+every file the agent read (prompt + context files) and wrote. On the next run,
+only agents whose inputs changed — plus their transitive dependents in the
+pipeline DAG — are re-executed; everything else is skipped like an up-to-date
+build target.
+
+Stored per product in products/{product_id}/state/fingerprints.json.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from .aio import atomic_write
+from .config import PipelineConfig
+
+FINGERPRINT_FILE = "products/{product_id}/state/fingerprints.json"
+
+
+def agent_input_paths(
+    config: PipelineConfig, agent_cfg: dict[str, Any], product_id: str
+) -> list[Path]:
+    """Every file whose content feeds the agent's prompt."""
+    paths: list[Path] = []
+    if agent_cfg.get("prompt"):
+        paths.extend(config.resolve_paths([agent_cfg["prompt"]], product_id))
+    paths.extend(config.context_file_paths(agent_cfg.get("context_files", []), product_id))
+    return list(dict.fromkeys(paths))
+
+
+def digest_paths(config: PipelineConfig, paths: list[Path]) -> dict[str, Optional[str]]:
+    """SHA-256 per file relative to base_dir (None if missing), via the context store."""
+    return {str(p.relative_to(config.base_dir)): config.store.digest(p) for p in paths}
+
+
+class FingerprintStore:
+    """Loads, updates and persists fingerprints for each product on demand.
+    Thread-safe: concurrent agents record from the I/O pool."""
+
+    def __init__(self, config: PipelineConfig):
+        self.config = config
+        self._records: dict[str, dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def _path(self, product_id: str) -> Path:
+        return self.config.base_dir / FINGERPRINT_FILE.format(product_id=product_id)
+
+    def records(self, product_id: str) -> dict[str, Any]:
+        with self._lock:
+            if product_id not in self._records:
+                path = self._path(product_id)
+                try:
+                    self._records[product_id] = json.loads(path.read_text())
+                except (FileNotFoundError, ValueError):
+                    self._records[product_id] = {}
+            return self._records[product_id]
+
+    def snapshot_inputs(
+        self, agent_cfg: dict[str, Any], product_id: str
+    ) -> dict[str, Optional[str]]:
+        """Digest the agent's inputs as they are right before the call."""
+        return digest_paths(self.config, agent_input_paths(self.config, agent_cfg, product_id))
+
+    def record(
+        self,
+        product_id: str,
+        agent_id: str,
+        inputs: dict[str, Optional[str]],
+        output_files: list[str],
+    ) -> None:
+        """Store fingerprints for a successful run and persist them."""
+        outputs = digest_paths(self.config, [self.config.base_dir / rel for rel in output_files])
+        # Files the agent both reads and writes (e.g. yaml_append state files)
+        # are recorded post-write, otherwise the agent would never be up to date.
+        inputs = {rel: outputs.get(rel, digest) for rel, digest in inputs.items()}
+        with self._lock:
+            self.records(product_id)[agent_id] = {
+                "inputs": inputs,
+                "outputs": outputs,
+                "recorded_at": datetime.now().isoformat(),
+            }
+            self._save(product_id)
+
+    def forget(self, product_id: str, agent_id: str) -> None:
+        with self._lock:
+            if self.records(product_id).pop(agent_id, None) is not None:
+                self._save(product_id)
+
+    def _save(self, product_id: str) -> None:
+        # Caller holds the lock; the temp name is unique per write
+        atomic_write(self._path(product_id),
+                     json.dumps(self._records[product_id], indent=2, sort_keys=True))
+
+    # ── Staleness ──────────────────────────────────────────────────────────
+
+    def changed_inputs(
+        self, agent_cfg: dict[str, Any], product_id: str
+    ) -> Optional[list[str]]:
+        """Inputs that differ from the last recorded run; None if never recorded."""
+        record = self.records(product_id).get(agent_cfg["id"])
+        if record is None:
+            return None
+        current = self.snapshot_inputs(agent_cfg, product_id)
+        previous: dict[str, Optional[str]] = record.get("inputs", {})
+        changed = [rel for rel in current.keys() | previous.keys()
+                   if current.get(rel) != previous.get(rel)]
+        # A deleted output must be regenerated even if the inputs are unchanged
+        changed.extend(rel for rel in record.get("outputs", {})
+                       if not (self.config.base_dir / rel).exists())
+        return sorted(changed)
+
+    def is_stale(self, agent_cfg: dict[str, Any], product_id: str) -> bool:
+        changed = self.changed_inputs(agent_cfg, product_id)
+        return changed is None or bool(changed)
+
+
+def plan_incremental(
+    store: FingerprintStore,
+    nodes: dict[str, Any],
+    product_id: str,
+) -> set[str]:
+    """Return node ids that must re-run: stale agents plus all their dependents.
+
+    `nodes` is the graph from scheduler.build_graph(); a checkpoint is passed
+    again whenever anything upstream or downstream of it re-runs.
+    """
+    stale = {
+        nid for nid, node in nodes.items()
+        if node.kind == "agent" and store.is_stale(node.cfg, product_id)
+    }
+    pending = list(stale)
+    while pending:
+        for dep in nodes[pending.pop()].dependents:
+            if dep not in stale:
+                stale.add(dep)
+                pending.append(dep)
+    # A checkpoint in front of anything that re-runs has to be passed again
+    stale.update(
+        nid for nid, node in nodes.items()
+        if node.kind == "checkpoint" and node.dependents & stale
+    )
+    return stale
@@ -0,0 +1,358 @@
+# orchestrator/fleet.py
+"""Fleet runner: many products' pipelines concurrently in one event loop.
+
+All products share one ClaudeAgent (client, rate limiter, result cache,
+tracer) and one DagScheduler. API calls go through a FairQueue instead of a
+plain semaphore:
+
+  - global cap      at most `max_concurrency` calls in flight across the fleet
+  - fair queuing    a free slot goes to the product with the smallest virtual
+                    start tag (start-time fair queuing). Each call advances its
+                    product's tag by 1/weight, so a product gets its weighted
+                    share of slots however many agents it has ready — an
+                    enterprise DAG with twenty ready agents cannot starve a
+                    simple product with two
+  - token budgets   once a product has used its output-token budget, its
+                    remaining agents fail fast with failure_type
+                    "budget_exceeded" instead of eating into the others' share
+
+Weights, budgets and the default tier come from pipeline.yaml `fleet`, keyed
+by complexity tier. Human checkpoints stay pending unless --auto-approve is
+given; those runs remain in_progress and can be continued with --resume.
+
+Usage:
+  python3 -m orchestrator.fleet intake/ki-radar.yaml intake/ai-navigation-product-dna.yaml
+  python3 -m orchestrator.fleet intake/*.yaml --max-concurrency 16 --json fleet.json
+  python3 -m orchestrator.fleet intake/*.yaml --resume --weight ki-radar=2
+  python3 -m orchestrator.fleet --profile-startup      # import/config-load breakdown
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from . import startup
+from .claude_agent import ClaudeAgent
+from .config import PipelineConfig, load_yaml
+from .models import AgentResult
+from .rate_limit import PipelinePausedError
+from .scheduler import DagScheduler
+
+# Product whose pipeline the current task belongs to; set once per product
+# task and inherited by every agent task the scheduler spawns from it.
+current_product: ContextVar[str] = ContextVar("fleet_product", default="")
+
+# complexity.score → tier (score=7 → complex, enterprise is 9-10)
+_SCORE_TIERS = ((2, "simple"), (4, "standard"), (6, "moderate"), (8, "complex"), (10, "enterprise"))
+
+
+# ── Fair queue ─────────────────────────────────────────────────────────────
+
+class FairQueue:
+    """Drop-in for the shared asyncio.Semaphore with weighted fairness per product."""
+
+    def __init__(self, capacity: int, weights: Optional[dict[str, float]] = None):
+        self.capacity = capacity
+        self.weights = dict(weights or {})
+        self._in_flight = 0
+        self._virtual = 0.0                       # start tag of the last granted call
+        self._finish: dict[str, float] = {}       # per product: tag of its next call
+        self._waiting: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.granted: dict[str, int] = {}
+        self.wait_seconds: dict[str, float] = {}
+
+    def _tag(self, product_id: str) -> float:
+        start = max(self._virtual, self._finish.get(product_id, 0.0))
+        self._finish[product_id] = start + 1.0 / self.weights.get(product_id, 1.0)
+        return start
+
+    def _grant(self, product_id: str, tag: float, queued: float) -> None:
+        self._in_flight += 1
+        self._virtual = max(self._virtual, tag)
+        self.granted[product_id] = self.granted.get(product_id, 0) + 1
+        self.wait_seconds[product_id] = (
+            self.wait_seconds.get(product_id, 0.0) + time.monotonic() - queued
+        )
+
+    def _dispatch(self) -> None:
+        while self._waiting and self._in_flight < self.capacity:
+            tag, _, future = heapq.heappop(self._waiting)
+            if future.done():                     # waiter was cancelled
+                continue
+            product_id, queued = future.product_id, future.queued  # type: ignore[attr-defined]
+            self._grant(product_id, tag, queued)
+            future.set_result(None)
+
+    async def __aenter__(self) -> None:
+        product_id = current_product.get()
+        tag = self._tag(product_id)
+        queued = time.monotonic()
+        if self._in_flight < self.capacity and not self._waiting:
+            self._grant(product_id, tag, queued)
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.product_id, future.queued = product_id, queued  # type: ignore[attr-defined]
+        heapq.heappush(self._waiting, (tag, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()                   # slot granted, caller gone
+            raise
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+
+# ── Products ───────────────────────────────────────────────────────────────
+
+@dataclass
+class FleetProduct:
+    product_id: str
+    intake: str
+    tier: Optional[str]
+    weight: float
+    token_budget: Optional[int]
+    tokens_used: int = 0
+    status: str = "queued"                    # queued | running | completed | failed | pending | paused
+    agents: int = 0
+    failed: list[str] = field(default_factory=list)
+    blocked: int = 0
+    pending_checkpoints: list[str] = field(default_factory=list)
+    budget_exceeded: bool = False
+    wall_s: float = 0.0
+    queue_wait_s: float = 0.0
+    run_id: Optional[str] = None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.token_budget is not None and self.tokens_used >= self.token_budget
+
+
+def intake_tier(intake: dict[str, Any]) -> Optional[str]:
+    """derived.complexity_tier, else the tier for complexity.score, else None."""
+    tier = (intake.get("derived") or {}).get("complexity_tier")
+    if tier:
+        return str(tier)
+    score = (intake.get("complexity") or {}).get("score")
+    if isinstance(score, (int, float)):
+        return next((name for limit, name in _SCORE_TIERS if score <= limit), "enterprise")
+    return None
+
+
+def load_product(config: PipelineConfig, intake_path: Path) -> FleetProduct:
+    """FleetProduct for one intake file, with the tier's weight and token budget.
+
+    Agents read intake/{product_id}.yaml; the product id is the intake's
+    product.id when that file exists, otherwise the file name (for derived
+    files such as intake/ai-navigation-product-dna.yaml)."""
+    intake = load_yaml(intake_path.read_text()) or {}
+    path = intake_path.resolve()
+    intake_dir = config.base_dir / "intake"
+    if path.parent != intake_dir:
+        raise ValueError(f"{intake_path}: intake files must live in {intake_dir}")
+    declared = str((intake.get("product") or {}).get("id") or "")
+    product_id = declared if declared and (intake_dir / f"{declared}.yaml").exists() else path.stem
+
+    settings = config.fleet()
+    tier = intake_tier(intake) or settings.get("default_tier")
+    budget = (settings.get("token_budgets") or {}).get(tier)
+    return FleetProduct(
+        product_id=product_id,
+        intake=str(path.relative_to(config.base_dir)),
+        tier=tier,
+        weight=float((settings.get("weights") or {}).get(tier, 1.0)),
+        token_budget=int(budget) if budget is not None else None,
+    )
+
+
+# ── Runner ─────────────────────────────────────────────────────────────────
+
+class FleetAgent(ClaudeAgent):
+    """ClaudeAgent that charges each product's output tokens against its budget."""
+
+    def __init__(self, config: PipelineConfig, products: dict[str, FleetProduct], **kwargs: Any):
+        super().__init__(config, **kwargs)
+        self.products = products
+
+    async def run(self, agent_cfg: dict[str, Any], product_id: str, **kwargs: Any) -> AgentResult:
+        product = self.products.get(product_id)
+        if product is not None and product.exhausted:
+            product.budget_exceeded = True
+            return AgentResult(
+                agent_id=agent_cfg["id"],
+                product_id=product_id,
+                success=False,
+                error=f"Token budget exhausted ({product.tokens_used}/{product.token_budget})",
+                failure_type="budget_exceeded",
+                duration_seconds=0.0,
+                attempt=kwargs.get("attempt", 1),
+            )
+        result = await super().run(agent_cfg, product_id, **kwargs)
+        if product is not None:
+            product.tokens_used += result.tokens_used or 0
+        return result
+
+
+class Fleet:
+    """Runs every product's DAG concurrently behind one FairQueue."""
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        products: list[FleetProduct],
+        max_concurrency: int,
+        auto_approve: bool = False,
+        resume: bool = False,
+        verbose: bool = False,
+    ):
+        self.config = config
+        self.products = {p.product_id: p for p in products}
+        if len(self.products) != len(products):
+            raise ValueError("Duplicate product ids in fleet")
+        self.queue = FairQueue(max_concurrency, {p.product_id: p.weight for p in products})
+        self.resume = resume
+        self.verbose = verbose
+        self.agent = FleetAgent(config, self.products, semaphore=self.queue, verbose=verbose)
+
+        async def approve(checkpoint: dict[str, Any], results: dict[str, AgentResult]) -> bool:
+            return True
+
+        self.scheduler = DagScheduler(
+            self.agent, on_checkpoint=approve if auto_approve else None, verbose=verbose
+        )
+
+    async def run(self) -> list[FleetProduct]:
+        try:
+            await asyncio.gather(*(self._run_product(p) for p in self.products.values()))
+        finally:
+            if self.agent.batch:
+                await self.agent.batch.aclose()
+            await self.agent.aclose()
+        for product in self.products.values():
+            product.queue_wait_s = round(self.queue.wait_seconds.get(product.product_id, 0.0), 3)
+        return list(self.products.values())
+
+    async def _run_product(self, product: FleetProduct) -> None:
+        current_product.set(product.product_id)
+        product.status = "running"
+        start = time.monotonic()
+        if self.verbose:
+            print(f"→ [{product.product_id}] tier={product.tier} weight={product.weight:g} "
+                  f"budget={product.token_budget or '∞'}")
+        try:
+            outcome = await self.scheduler.run(product.product_id, tier=product.tier, resume=self.resume)
+        except PipelinePausedError as exc:
+            # Stays in_progress in the state store; continue with --resume
+            product.status = "paused"
+            if self.verbose:
+                print(f"  ⏳ [{product.product_id}] paused: {exc}")
+            return
+        finally:
+            product.wall_s = round(time.monotonic() - start, 3)
+
+        product.run_id = outcome.run_id
+        product.agents = len(outcome.results)
+        product.failed = outcome.failed
+        product.blocked = len(outcome.blocked)
+        product.pending_checkpoints = outcome.pending_checkpoints
+        if outcome.success:
+            product.status = "completed"
+        elif outcome.failed or outcome.blocked:
+            product.status = "failed"
+        else:
+            product.status = "pending"
+        if self.verbose:
+            glyph = "✓" if outcome.success else "✗"
+            print(f"  {glyph} [{product.product_id}] {product.status} in {product.wall_s:.1f}s "
+                  f"({product.tokens_used} tokens)")
+
+
+def _print_table(products: list[FleetProduct]) -> None:
+    header = (f"{'product':<28} {'tier':<10} {'weight':>6} {'status':<10} {'agents':>6} "
+              f"{'failed':>6} {'tokens':>9} {'budget':>9} {'wall s':>8} {'queue s':>8}")
+    print(header)
+    print("─" * len(header))
+    for p in products:
+        budget = str(p.token_budget) if p.token_budget is not None else "∞"
+        flag = " budget" if p.budget_exceeded else ""
+        print(f"{p.product_id:<28} {p.tier or '-':<10} {p.weight:>6g} {p.status:<10} {p.agents:>6} "
+              f"{len(p.failed):>6} {p.tokens_used:>9} {budget:>9} {p.wall_s:>8.1f} "
+              f"{p.queue_wait_s:>8.1f}{flag}")
+
+
+def _print_routing(stats: dict[str, Any]) -> None:
+    """Model cascade hit rates: how often each model's result was accepted."""
+    print(f"\nModel routing: {stats['decisions']} decision(s), {stats['escalations']} escalation(s)")
+    for agent_id, models in stats["agents"].items():
+        rates = ", ".join(f"{model} {s['accepted']}/{s['tried']} ({s['hit_rate']:.0%})"
+                          for model, s in models.items())
+        print(f"  {agent_id:<26} {rates}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run many products' pipelines concurrently with fair scheduling",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("intake", nargs="*", help="Intake files (intake/<product>.yaml)")
+    parser.add_argument("--base-dir", default=".", help="Repository root")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="Global cap on in-flight API calls (default: fleet.max_concurrency)")
+    parser.add_argument("--budget", type=int, help="Output-token budget for every product")
+    parser.add_argument("--weight", action="append", default=[], metavar="PRODUCT=W",
+                        help="Override a product's fair-queuing weight")
+    parser.add_argument("--auto-approve", action="store_true", help="Approve human checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue unfinished runs")
+    parser.add_argument("--json", metavar="PATH", help="Write the fleet report as JSON")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    startup.add_argument(parser)
+    args = parser.parse_args()
+    if args.profile_startup:
+        startup.print_profile("orchestrator.fleet", args.base_dir)
+        return
+    if not args.intake:
+        parser.error("the following arguments are required: intake")
+
+    config = PipelineConfig(base_dir=args.base_dir)
+    products = [load_product(config, Path(path)) for path in args.intake]
+    overrides = dict(item.split("=", 1) for item in args.weight)
+    for product in products:
+        if product.product_id in overrides:
+            product.weight = float(overrides[product.product_id])
+        if args.budget is not None:
+            product.token_budget = args.budget
+
+    max_concurrency = args.max_concurrency or int(config.fleet().get("max_concurrency", 8))
+    fleet = Fleet(config, products, max_concurrency,
+                  auto_approve=args.auto_approve, resume=args.resume, verbose=args.verbose)
+    results = asyncio.run(fleet.run())
+
+    print()
+    _print_table(results)
+    if fleet.agent.router is not None and fleet.agent.router.decisions:
+        _print_routing(fleet.agent.router.stats())
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(p) for p in results], indent=2))
+    if any(p.status in ("failed", "paused") for p in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# orchestrator/limiter.py
+"""Adaptive token-bucket limiter for Claude calls, shared across parallel pipelines.
+
+The concurrency semaphore only caps in-flight requests; the API throttles on
+requests, input tokens and output tokens per minute. The limiter keeps one
+bucket per dimension and model, reserves an estimate before each request,
+settles against the reported `usage` afterwards, and waits callers out —
+highest priority first — instead of letting them run into 429s.
+
+Output is reserved at the model's running average of actual output per call
+(capped at max_tokens), not at max_tokens itself: a single 16k-max request
+would otherwise drain a tier-1 8k output bucket and serialise every agent.
+A call that writes more than its reservation leaves the bucket in debt,
+which the next callers wait out.
+
+Budgets come from pipeline.yaml `rate_limits` and are corrected at runtime from
+`anthropic-ratelimit-*` response headers and from 429 responses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Mapping, Optional
+
+from .config import PipelineConfig
+
+# Rough chars-per-token ratio for estimating request size before the call
+_CHARS_PER_TOKEN = 4
+
+# Multiplicative decrease on 429; multiplicative recovery (×(1 + step), up to
+# the ceiling) per successful call
+_BACKOFF_FACTOR = 0.8
+_RECOVERY_STEP = 0.02
+_MIN_FRACTION = 0.1
+# Output reservation: seed (pipeline.yaml expected_output_tokens) and EMA weight
+DEFAULT_OUTPUT_ESTIMATE = 2000
+_ESTIMATE_WEIGHT = 0.2
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return ""
+
+
+def estimate_request_tokens(call_kwargs: dict[str, Any]) -> int:
+    """Input-token estimate for a messages request (system + all message content)."""
+    text = _content_text(call_kwargs.get("system", ""))
+    for message in call_kwargs.get("messages", []):
+        text += _content_text(message.get("content", ""))
+    return estimate_tokens(text)
+
+
+class _Bucket:
+    """Continuous-refill token bucket sized for one minute of budget."""
+
+    def __init__(self, per_minute: float):
+        self.ceiling = float(per_minute)     # configured / header-reported limit
+        self.capacity = float(per_minute)    # current effective limit (AIMD)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        rate = self.capacity / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the whole bucket may go once it is full
+        need = min(amount, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / (self.capacity / 60.0)
+
+    def adjust(self, delta: float) -> None:
+        self.level = min(self.capacity, self.level + delta)
+
+    def set_ceiling(self, limit: float) -> None:
+        if limit > self.ceiling:
+            self.capacity += limit - self.ceiling
+        self.ceiling = limit
+        self.capacity = min(self.capacity, limit)
+
+    def scale(self, factor: float) -> None:
+        self.capacity = max(self.ceiling * _MIN_FRACTION, min(self.ceiling, self.capacity * factor))
+        self.level = min(self.level, self.capacity)
+
+
+@dataclass
+class Reservation:
+    model: str
+    input_tokens: int
+    output_tokens: int
+    max_output_tokens: int
+    waited_seconds: float = 0.0
+
+
+@dataclass
+class _ModelBudget:
+    requests: _Bucket
+    input_tokens: _Bucket
+    output_tokens: _Bucket
+    blocked_until: float = 0.0
+    # EMA of actual output tokens per call, used to size output reservations
+    output_estimate: float = DEFAULT_OUTPUT_ESTIMATE
+    waiters: list[tuple[float, int]] = field(default_factory=list)
+    _cond: Optional[asyncio.Condition] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def cond(self) -> asyncio.Condition:
+        # Conditions are bound to one event loop; the limiter may outlive it
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond, self._loop = asyncio.Condition(), loop
+            self.waiters.clear()
+        return self._cond
+
+    def buckets(self) -> tuple[_Bucket, _Bucket, _Bucket]:
+        return self.requests, self.input_tokens, self.output_tokens
+
+    def delay(self, now: float, input_tokens: int, output_tokens: int) -> float:
+        for bucket in self.buckets():
+            bucket.refill(now)
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1),
+            self.input_tokens.wait_time(input_tokens),
+            self.output_tokens.wait_time(output_tokens),
+        )
+
+
+class TokenRateLimiter:
+    """Per-model RPM / input-TPM / output-TPM budgets with priority queuing."""
+
+    def __init__(self, limits: Mapping[str, Mapping[str, Any]], verbose: bool = False):
+        # limits: {model | "default": {requests_per_minute, input_tokens_per_minute,
+        #                               output_tokens_per_minute,
+        #                               expected_output_tokens}}
+        self.limits = dict(limits)
+        self.verbose = verbose
+        self._budgets: dict[str, _ModelBudget] = {}
+        self._seq = itertools.count()
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig, verbose: bool = False) -> Optional["TokenRateLimiter"]:
+        limits = config.rate_limits()
+        return cls(limits, verbose=verbose) if limits else None
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            cfg = self.limits.get(model) or self.limits.get("default", {})
+            budget = _ModelBudget(
+                requests=_Bucket(cfg.get("requests_per_minute", 50)),
+                input_tokens=_Bucket(cfg.get("input_tokens_per_minute", 30000)),
+                output_tokens=_Bucket(cfg.get("output_tokens_per_minute", 8000)),
+                output_estimate=float(cfg.get("expected_output_tokens", DEFAULT_OUTPUT_ESTIMATE)),
+            )
+            self._budgets[model] = budget
+        return budget
+
+    # ── Acquire / settle ───────────────────────────────────────────────────
+
+    async def acquire(
+        self,
+        model: str,
+        input_tokens: int,
+        max_output_tokens: int,
+        priority: float = 0.0,
+    ) -> Reservation:
+        """Wait until the model's budget covers this request, then reserve it.
+        Waiters are served strictly by priority (higher first), then FIFO."""
+        budget = self._budget(model)
+        output_tokens = max(1, min(max_output_tokens, int(budget.output_estimate)))
+        entry = (-priority, next(self._seq))
+        start = time.monotonic()
+
+        async with budget.cond:
+            heapq.heappush(budget.waiters, entry)
+            try:
+                while True:
+                    delay: Optional[float] = None
+                    if budget.waiters[0] == entry:
+                        delay = budget.delay(time.monotonic(), input_tokens, output_tokens)
+                        if delay <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(budget.cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                budget.requests.adjust(-1)
+                budget.input_tokens.adjust(-input_tokens)
+                budget.output_tokens.adjust(-output_tokens)
+            finally:
+                budget.waiters.remove(entry)
+                heapq.heapify(budget.waiters)
+                budget.cond.notify_all()
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        if waited > 0.01:
+            self.waits += 1
+            self.wait_seconds += waited
+            if self.verbose:
+                print(f"  ⏳ [{model}] rate budget wait {waited:.1f}s")
+        return Reservation(model, input_tokens, output_tokens, max_output_tokens, waited)
+
+    async def release(
+        self,
+        reservation: Reservation,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Settle a reservation against reported usage. Without usage (the call
+        failed or was cancelled) the whole reservation is refunded: the request
+        slot and the input and output estimates."""
+        budget = self._budget(reservation.model)
+        async with budget.cond:
+            if input_tokens is None and output_tokens is None:
+                budget.requests.adjust(1)
+            budget.input_tokens.adjust(reservation.input_tokens - (input_tokens or 0))
+            # Output beyond the reservation goes into debt (level below zero)
+            budget.output_tokens.adjust(reservation.output_tokens - (output_tokens or 0))
+            if output_tokens is not None:
+                budget.output_estimate = ((1 - _ESTIMATE_WEIGHT) * budget.output_estimate
+                                          + _ESTIMATE_WEIGHT * max(1, output_tokens))
+                for bucket in budget.buckets():
+                    bucket.scale(1.0 + _RECOVERY_STEP)
+            if headers:
+                self._observe_headers(budget, headers)
+            budget.cond.notify_all()
+
+    async def on_rate_limited(
+        self, reservation: Reservation, headers: Optional[Mapping[str, str]] = None
+    ) -> None:
+        """A 429 came back: pause the model until retry-after and shrink its budgets."""
+        budget = self._budget(reservation.model)
+        self.rate_limited += 1
+        retry_after = _parse_retry_after(headers) if headers else None
+        async with budget.cond:
+            budget.output_tokens.adjust(reservation.output_tokens)
+            budget.blocked_until = max(budget.blocked_until, time.monotonic() + (retry_after or 5.0))
+            for bucket in budget.buckets():
+                bucket.scale(_BACKOFF_FACTOR)
+            if headers:
+                self._observe_headers(budget, headers)
+            budget.cond.notify_all()
+
+    # ── Header adaptation ──────────────────────────────────────────────────
+
+    @staticmethod
+    def _observe_headers(budget: _ModelBudget, headers: Mapping[str, str]) -> None:
+        pairs = (
+            ("requests", budget.requests),
+            ("input-tokens", budget.input_tokens),
+            ("output-tokens", budget.output_tokens),
+        )
+        for name, bucket in pairs:
+            limit = headers.get(f"anthropic-ratelimit-{name}-limit")
+            remaining = headers.get(f"anthropic-ratelimit-{name}-remaining")
+            try:
+                if limit is not None:
+                    bucket.set_ceiling(float(limit))
+                if remaining is not None:
+                    bucket.level = min(bucket.level, float(remaining))
+            except ValueError:
+                continue
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "models": {
+                model: {
+                    "rpm": round(b.requests.capacity),
+                    "itpm": round(b.input_tokens.capacity),
+                    "otpm": round(b.output_tokens.capacity),
+                    "output_estimate": round(b.output_estimate),
+                }
+                for model, b in self._budgets.items()
+            },
+        }
+
+
+def _parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get("retry-after")
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    # Fall back to the earliest reset timestamp (RFC 3339)
+    resets = []
+    for name in ("requests", "input-tokens", "output-tokens"):
+        reset = headers.get(f"anthropic-ratelimit-{name}-reset")
+        if reset:
+            try:
+                when = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            resets.append((when - datetime.now(timezone.utc)).total_seconds())
+    positive = [r for r in resets if r > 0]
+    return min(positive) if positive else None
@@ -0,0 +1,454 @@
+# orchestrator/mock_server.py
+"""Deterministic local stand-in for the Anthropic Messages and Batches APIs.
+
+The API is not reachable from the build environment, so batch mode
+(orchestrator/batch.py) and the benchmark suite (orchestrator/benchmark.py)
+run against this stdlib HTTP server instead:
+
+    python3 -m orchestrator.mock_server --port 8765 --latency-ms 200 --tokens-per-sec 80
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=mock python3 …
+
+Implemented endpoints (same JSON / SSE shapes as the real API):
+    POST /v1/messages                         streaming (SSE) and non-streaming
+    POST /v1/messages/batches                 create
+    GET  /v1/messages/batches                 list
+    GET  /v1/messages/batches/{id}            retrieve
+    POST /v1/messages/batches/{id}/cancel     cancel
+    GET  /v1/messages/batches/{id}/results    JSONL results
+
+Each request is answered by a responder (params → text). The default one
+returns a FILE block with placeholder content for every path listed under
+"Files to produce" in the request's OUTPUT INSTRUCTIONS. Streams are paced by
+latency (time to first token) and tokens/sec; a seeded fraction of message
+requests is answered with 429 rate_limit_error to exercise backoff.
+Connections are kept alive (SSE bodies are chunked); --connect-ms delays each
+new connection to stand in for TCP/TLS setup.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+Responder = Callable[[dict[str, Any]], str]
+
+_FILE_LIST = re.compile(r"Files to produce[^\n]*:\n((?:  - .+\n?)+)")
+_UNRESOLVED = re.compile(r"\{[\w.]+\}|\*")
+
+
+def _request_text(params: dict[str, Any]) -> str:
+    system = params.get("system", "")
+    if isinstance(system, list):
+        system = "".join(block.get("text", "") for block in system)
+    messages = "".join(
+        m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+        for m in params.get("messages", [])
+    )
+    return system + messages
+
+
+def canned_response(params: dict[str, Any], file_bytes: int = 600) -> str:
+    """FILE blocks with deterministic filler for each requested output file."""
+    match = _FILE_LIST.search(_request_text(params))
+    paths = [line.strip()[2:] for line in match.group(1).splitlines()] if match else []
+    blocks = []
+    for path in paths:
+        path = _UNRESOLVED.sub("mock", path)
+        if path.endswith((".yaml", ".yml")):
+            line = "mock_{i}: placeholder value generated by mock_server\n"
+        elif path.endswith((".js", ".mjs")):
+            line = "// mock line {i}: placeholder generated by mock_server\n"
+        elif path.endswith(".css"):
+            line = "/* mock line {i}: placeholder generated by mock_server */\n"
+        elif path.endswith(".json"):
+            line = '  "mock_{i}": "placeholder generated by mock_server",\n'
+        else:
+            line = "<!-- mock line {i}: placeholder generated by mock_server -->\n"
+        body = "".join(line.format(i=i) for i in range(file_bytes // len(line) + 1))
+        if path.endswith(".json"):
+            body = "{\n" + body + '  "mock": true\n}\n'
+        elif path.endswith(".html"):
+            body = f"<!DOCTYPE html>\n<html>\n<body>\n{body}<script src=\"js/app.js\"></script>\n</body>\n</html>\n"
+        blocks.append(f"--- FILE: {path} ---\n{body}--- END FILE ---\n")
+    return "".join(blocks) + "\nMock run: produced " + str(len(paths)) + " file(s)."
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(ts: Optional[datetime]) -> Optional[str]:
+    return ts.isoformat().replace("+00:00", "Z") if ts else None
+
+
+class _Batch:
+    def __init__(self, batch_id: str, requests: list[dict[str, Any]], ready_at: float):
+        self.id = batch_id
+        self.requests = requests
+        self.created_at = _now()
+        self.ready_at = ready_at
+        self.cancel_initiated_at: Optional[datetime] = None
+        self.ended_at: Optional[datetime] = None
+        self.results: list[dict[str, Any]] = []
+
+
+class MockAnthropicServer:
+    """Threaded HTTP server; batches are held in memory."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        processing_seconds: float = 2.0,
+        responder: Optional[Responder] = None,
+        latency_ms: float = 0.0,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        chunk_tokens: int = 8,
+        connect_ms: float = 0.0,
+    ):
+        self.processing_seconds = processing_seconds
+        self.responder = responder or canned_response
+        self.latency = latency_ms / 1000.0
+        self.tokens_per_second = tokens_per_second     # 0 = unpaced
+        self.error_rate = error_rate
+        self.chunk_tokens = chunk_tokens
+        self.connect_delay = connect_ms / 1000.0
+        self._random = random.Random(seed)
+        self._batches: dict[str, _Batch] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self.messages_served = 0
+        self.rate_limited = 0
+        self.connections = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────
+
+    def start(self) -> "MockAnthropicServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # ── Batch state ────────────────────────────────────────────────────────
+
+    def _create(self, body: dict[str, Any]) -> _Batch:
+        batch_id = f"msgbatch_mock_{next(self._ids):06d}"
+        batch = _Batch(batch_id, body.get("requests", []), time.time() + self.processing_seconds)
+        with self._lock:
+            self._batches[batch_id] = batch
+        return batch
+
+    def _advance(self, batch: _Batch) -> None:
+        """End the batch once its processing time is over (or it was canceled)."""
+        with self._lock:
+            if batch.ended_at or (time.time() < batch.ready_at and not batch.cancel_initiated_at):
+                return
+            for request in batch.requests:
+                batch.results.append(self._result(request, canceled=bool(batch.cancel_initiated_at)))
+            batch.ended_at = _now()
+
+    def _message(self, params: dict[str, Any], message_id: str) -> dict[str, Any]:
+        """Complete assistant message; output beyond max_tokens is cut off."""
+        text = self.responder(params)
+        max_chars = int(params.get("max_tokens", 4096)) * 4
+        stop_reason = "end_turn"
+        if len(text) > max_chars:
+            text, stop_reason = text[:max_chars], "max_tokens"
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "mock"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": len(_request_text(params)) // 4 + 1,
+                "output_tokens": len(text) // 4 + 1,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+    def _result(self, request: dict[str, Any], canceled: bool) -> dict[str, Any]:
+        custom_id = request.get("custom_id")
+        if canceled:
+            return {"custom_id": custom_id, "result": {"type": "canceled"}}
+        try:
+            message = self._message(request.get("params", {}), f"msg_mock_{custom_id}")
+        except Exception as exc:
+            return {"custom_id": custom_id, "result": {
+                "type": "errored",
+                "error": {"type": "error", "error": {"type": "api_error", "message": str(exc)}},
+            }}
+        return {"custom_id": custom_id, "result": {"type": "succeeded", "message": message}}
+
+    def _inject_429(self) -> bool:
+        with self._lock:
+            self.messages_served += 1
+            hit = self.error_rate > 0 and self._random.random() < self.error_rate
+            if hit:
+                self.rate_limited += 1
+            return hit
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "messages_served": self.messages_served,
+            "rate_limited": self.rate_limited,
+            "batches": len(self._batches),
+        }
+
+    def _describe(self, batch: _Batch) -> dict[str, Any]:
+        self._advance(batch)
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if batch.ended_at:
+            for result in batch.results:
+                counts[result["result"]["type"]] += 1
+            status = "ended"
+        else:
+            counts["processing"] = len(batch.requests)
+            status = "canceling" if batch.cancel_initiated_at else "in_progress"
+        return {
+            "id": batch.id,
+            "type": "message_batch",
+            "processing_status": status,
+            "request_counts": counts,
+            "created_at": _iso(batch.created_at),
+            "expires_at": _iso(batch.created_at + timedelta(hours=24)),
+            "ended_at": _iso(batch.ended_at),
+            "cancel_initiated_at": _iso(batch.cancel_initiated_at),
+            "archived_at": None,
+            "results_url": (
+                f"{self.base_url}/v1/messages/batches/{batch.id}/results"
+                if batch.ended_at else None
+            ),
+        }
+
+    # ── HTTP ───────────────────────────────────────────────────────────────
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt: str, *args: Any) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                if server.connect_delay:
+                    time.sleep(server.connect_delay)
+
+            def _send(self, status: int, payload: Any, content_type: str = "application/json") -> None:
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("request-id", f"req_mock_{time.time_ns()}")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _error(self, status: int, kind: str, message: str) -> None:
+                self._send(status, {"type": "error", "error": {"type": kind, "message": message}})
+
+            def _body(self) -> dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _event(self, kind: str, data: dict[str, Any]) -> None:
+                chunk = f"event: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            def _messages(self) -> None:
+                try:
+                    params = self._body()
+                except ValueError:
+                    return self._error(400, "invalid_request_error", "Invalid JSON body")
+                if server._inject_429():
+                    data = json.dumps({"type": "error", "error": {
+                        "type": "rate_limit_error", "message": "Injected by mock_server"}}).encode()
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.send_header("retry-after", "1")
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                message = server._message(params, f"msg_mock_{time.time_ns()}")
+                if server.latency:
+                    time.sleep(server.latency)
+                if not params.get("stream"):
+                    return self._send(200, message)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                text = message["content"][0]["text"]
+                usage = message["usage"]
+                start = dict(message, content=[], stop_reason=None,
+                             usage=dict(usage, output_tokens=1))
+                self._event("message_start", {"type": "message_start", "message": start})
+                self._event("content_block_start", {"type": "content_block_start", "index": 0,
+                                                    "content_block": {"type": "text", "text": ""}})
+                step = server.chunk_tokens * 4
+                pause = server.chunk_tokens / server.tokens_per_second if server.tokens_per_second else 0
+                for i in range(0, len(text), step):
+                    self._event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                        "delta": {"type": "text_delta",
+                                                                  "text": text[i:i + step]}})
+                    if pause:
+                        time.sleep(pause)
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                    "usage": {"output_tokens": usage["output_tokens"]},
+                })
+                self._event("message_stop", {"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _batch(self, batch_id: str) -> Optional[_Batch]:
+                with server._lock:
+                    batch = server._batches.get(batch_id)
+                if batch is None:
+                    self._error(404, "not_found_error", f"Batch {batch_id} not found")
+                return batch
+
+            def do_POST(self) -> None:
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts == ["v1", "messages"]:
+                    try:
+                        return self._messages()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return   # client closed the stream (e.g. early abort)
+                if parts == ["v1", "messages", "batches"]:
+                    try:
+                        body = self._body()
+                    except ValueError:
+                        return self._error(400, "invalid_request_error", "Invalid JSON body")
+                    if not body.get("requests"):
+                        return self._error(400, "invalid_request_error", "requests: empty")
+                    return self._send(200, server._describe(server._create(body)))
+                if len(parts) == 5 and parts[:3] == ["v1", "messages", "batches"] and parts[4] == "cancel":
+                    self._body()
+                    batch = self._batch(parts[3])
+                    if batch is None:
+                        return
+                    with server._lock:
+                        if not batch.ended_at and not batch.cancel_initiated_at:
+                            batch.cancel_initiated_at = _now()
+                    return self._send(200, server._describe(batch))
+                self._error(404, "not_found_error", f"Unknown endpoint POST {self.path}")
+
+            def do_HEAD(self) -> None:
+                # Connection pre-warming (orchestrator/client.py)
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self) -> None:
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:3] != ["v1", "messages", "batches"]:
+                    return self._error(404, "not_found_error", f"Unknown endpoint GET {self.path}")
+                if len(parts) == 3:
+                    with server._lock:
+                        batches = list(server._batches.values())
+                    data = [server._describe(b) for b in reversed(batches)]
+                    return self._send(200, {
+                        "data": data,
+                        "has_more": False,
+                        "first_id": data[0]["id"] if data else None,
+                        "last_id": data[-1]["id"] if data else None,
+                    })
+                batch = self._batch(parts[3])
+                if batch is None:
+                    return
+                if len(parts) == 4:
+                    return self._send(200, server._describe(batch))
+                if len(parts) == 5 and parts[4] == "results":
+                    server._advance(batch)
+                    if not batch.ended_at:
+                        return self._error(400, "invalid_request_error",
+                                           f"Batch {batch.id} has not ended yet")
+                    lines = "".join(json.dumps(r) + "\n" for r in batch.results)
+                    return self._send(200, lines.encode(), "application/binary")
+                self._error(404, "not_found_error", f"Unknown endpoint GET {self.path}")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local mock of the Messages and Batches APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--processing-seconds", type=float, default=2.0,
+                        help="Time until a submitted batch ends")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Stream pacing (0 = unpaced)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of /v1/messages requests answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--file-bytes", type=int, default=600, help="Size of each canned output file")
+    parser.add_argument("--connect-ms", type=float, default=0.0,
+                        help="Delay per new connection (stands in for TCP/TLS setup)")
+    args = parser.parse_args()
+
+    server = MockAnthropicServer(
+        args.host, args.port,
+        processing_seconds=args.processing_seconds,
+        responder=functools.partial(canned_response, file_bytes=args.file_bytes),
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        connect_ms=args.connect_ms,
+    )
+    print(f"Mock Anthropic API on {server.base_url}  (ANTHROPIC_BASE_URL={server.base_url})", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
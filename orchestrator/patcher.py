@@ -0,0 +1,277 @@
+# orchestrator/patcher.py
+"""Patch output protocol: edit existing files instead of regenerating them.
+
+Agents with `output_format: patch` (code-fixer) answer with PATCH blocks next
+to — or instead of — the usual FILE blocks:
+
+    --- PATCH: products/x/app/index.html ---
+    <<<<<<< SEARCH
+    <button class="close">
+    =======
+    <button class="close" aria-label="Schließen">
+    >>>>>>> REPLACE
+    --- END PATCH ---
+
+A PATCH block holds one or more SEARCH/REPLACE pairs, or the hunks of a
+unified diff (`@@ … @@` with ' ', '-', '+' lines). Each hunk is located in
+the current file with increasing tolerance:
+
+  exact   the SEARCH text occurs exactly once
+  loose   line by line, ignoring indentation and trailing whitespace; the
+          replacement is re-indented to the matched lines
+  fuzzy   the single best window of the same line count with a similarity
+          ratio ≥ fuzzy_threshold
+
+All hunks of a file apply or none do (the file is replaced atomically). Failed
+files are reported back so the agent can fall back to regenerating them as
+FILE blocks.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .aio import atomic_write
+from .config import PipelineConfig
+
+_PATCH_BLOCK = re.compile(
+    r"---\s*PATCH:\s*(.+?)\s*---\n(.*?)---\s*END PATCH\s*---",
+    re.DOTALL | re.IGNORECASE,
+)
+_PATCH_HEADER = re.compile(r"---\s*PATCH:\s*(.+?)\s*---\n", re.IGNORECASE)
+_SEARCH_REPLACE = re.compile(
+    r"^<{5,}\s*SEARCH[ \t]*\n(.*?)^={5,}[ \t]*\n(.*?)^>{5,}\s*REPLACE[ \t]*$",
+    re.DOTALL | re.MULTILINE,
+)
+_HUNK_HEADER = re.compile(r"^@@.*@@")
+
+DEFAULT_FUZZY_THRESHOLD = 0.9
+# A fuzzy match must beat the runner-up by this much to count as unique
+_FUZZY_MARGIN = 0.02
+
+
+class PatchError(Exception):
+    """A hunk could not be located (or not unambiguously) in the target file."""
+
+
+@dataclass
+class Hunk:
+    search: str
+    replace: str
+
+
+@dataclass
+class FilePatch:
+    path: str
+    hunks: list[Hunk] = field(default_factory=list)
+    error: str = ""              # set when the block itself is malformed
+
+
+@dataclass
+class PatchOutcome:
+    path: str
+    ok: bool
+    methods: list[str] = field(default_factory=list)   # exact | loose | fuzzy | create | append, per hunk
+    error: str = ""
+
+
+def has_patches(raw_output: str) -> bool:
+    return _PATCH_HEADER.search(raw_output) is not None
+
+
+# ── Parsing ────────────────────────────────────────────────────────────────
+
+def parse_patches(raw_output: str, product_id: str) -> list[FilePatch]:
+    """All PATCH blocks in order; unterminated or empty blocks carry an error."""
+    patches: list[FilePatch] = []
+    closed_at: set[int] = set()
+    for match in _PATCH_BLOCK.finditer(raw_output):
+        closed_at.add(match.start())
+        path = match.group(1).strip().replace("{product_id}", product_id)
+        hunks = _parse_hunks(match.group(2))
+        patches.append(FilePatch(path, hunks, "" if hunks else "no SEARCH/REPLACE pair or diff hunk"))
+    for match in _PATCH_HEADER.finditer(raw_output):
+        if match.start() not in closed_at:
+            path = match.group(1).strip().replace("{product_id}", product_id)
+            patches.append(FilePatch(path, error="PATCH block not terminated"))
+    return patches
+
+
+def _parse_hunks(body: str) -> list[Hunk]:
+    pairs = _SEARCH_REPLACE.findall(body)
+    if pairs:
+        return [Hunk(search, replace) for search, replace in pairs]
+    return _parse_unified_diff(body)
+
+
+def _parse_unified_diff(body: str) -> list[Hunk]:
+    """Hunks of a unified diff. `---`/`+++` lines are file headers only before the
+    first `@@` of a file section; inside a hunk they remove `-- …` or add `++ …`
+    (SQL and Lua comments). A `--- ` line directly followed by `+++ `, or a
+    `diff ` line, starts the next file section."""
+    hunks: list[Hunk] = []
+    search: Optional[list[str]] = None      # None: in a file header, not a hunk
+    replace: list[str] = []
+    lines = body.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        next_line = lines[i + 1] if i + 1 < len(lines) else ""
+        if _HUNK_HEADER.match(line):
+            if search is not None:
+                hunks.append(Hunk("".join(search), "".join(replace)))
+            search, replace = [], []
+        elif line.startswith("diff ") or (line.startswith("--- ") and next_line.startswith("+++ ")):
+            if search is not None:
+                hunks.append(Hunk("".join(search), "".join(replace)))
+            search, replace = None, []
+        elif search is None or line.startswith("\\"):
+            continue
+        elif line.startswith("-"):
+            search.append(line[1:])
+        elif line.startswith("+"):
+            replace.append(line[1:])
+        else:
+            # Context line; editors strip the leading space of empty lines
+            text = line[1:] if line.startswith(" ") else line
+            search.append(text)
+            replace.append(text)
+    if search is not None:
+        hunks.append(Hunk("".join(search), "".join(replace)))
+    return [h for h in hunks if h.search or h.replace]
+
+
+# ── Applying ───────────────────────────────────────────────────────────────
+
+def apply_hunks(
+    text: Optional[str], hunks: list[Hunk], fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD
+) -> tuple[str, list[str]]:
+    """Apply every hunk in order; returns (new text, match method per hunk).
+    An empty SEARCH creates the file (text None) or appends to it."""
+    methods: list[str] = []
+    for i, hunk in enumerate(hunks, 1):
+        if not hunk.search.strip():
+            if text is None:
+                text, method = hunk.replace, "create"
+            else:
+                separator = "" if not text or text.endswith("\n") else "\n"
+                text, method = text + separator + hunk.replace, "append"
+        elif text is None:
+            raise PatchError("file does not exist")
+        else:
+            try:
+                text, method = _apply_one(text, hunk, fuzzy_threshold)
+            except PatchError as exc:
+                raise PatchError(f"hunk {i}: {exc}") from None
+        methods.append(method)
+    return text or "", methods
+
+
+def _apply_one(text: str, hunk: Hunk, fuzzy_threshold: float) -> tuple[str, str]:
+    count = text.count(hunk.search)
+    if count == 1:
+        return text.replace(hunk.search, hunk.replace, 1), "exact"
+    if count > 1:
+        raise PatchError(f"SEARCH text occurs {count} times")
+
+    lines = text.splitlines(keepends=True)
+    search = _trim_blank(hunk.search.splitlines())
+    if not search:
+        raise PatchError("SEARCH text is blank")
+    n = len(search)
+
+    wanted = [s.strip() for s in search]
+    loose = [i for i in range(len(lines) - n + 1)
+             if all(lines[i + k].strip() == wanted[k] for k in range(n))]
+    if len(loose) > 1:
+        raise PatchError(f"SEARCH text matches {len(loose)} places (ignoring whitespace)")
+    if loose:
+        return _splice(lines, loose[0], n, search, hunk.replace), "loose"
+
+    target = "\n".join(wanted)
+    scored: list[tuple[float, int]] = []
+    for i in range(len(lines) - n + 1):
+        window = "\n".join(line.strip() for line in lines[i:i + n])
+        matcher = difflib.SequenceMatcher(None, target, window, autojunk=False)
+        if matcher.real_quick_ratio() < fuzzy_threshold or matcher.quick_ratio() < fuzzy_threshold:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= fuzzy_threshold:
+            scored.append((ratio, i))
+    if not scored:
+        raise PatchError("SEARCH text not found")
+    scored.sort(reverse=True)
+    best_ratio, best = scored[0]
+    # Windows overlapping the best one are the same place, shifted
+    rivals = [ratio for ratio, i in scored[1:] if abs(i - best) >= n]
+    if rivals and best_ratio - rivals[0] < _FUZZY_MARGIN:
+        raise PatchError("SEARCH text matches several places equally well")
+    return _splice(lines, best, n, search, hunk.replace), "fuzzy"
+
+
+def _trim_blank(lines: list[str]) -> list[str]:
+    start, end = 0, len(lines)
+    while start < end and not lines[start].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    return lines[start:end]
+
+
+def _indent(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+def _splice(lines: list[str], start: int, n: int, search: list[str], replace: str) -> str:
+    """Replace lines[start:start+n], shifting the replacement's indentation by
+    the difference between the matched lines and the SEARCH text."""
+    matched = lines[start:start + n]
+    have, want = _indent(matched[0]), _indent(search[0])
+    out: list[str] = []
+    for line in replace.splitlines():
+        if line.strip() and line.startswith(want):
+            line = have + line[len(want):]
+        out.append(line)
+    newline = "\r\n" if matched[-1].endswith("\r\n") else "\n"
+    body = newline.join(out)
+    if out and matched[-1].endswith(("\n", "\r")):
+        body += newline
+    return "".join(lines[:start]) + body + "".join(lines[start + n:])
+
+
+def apply_patches(
+    config: PipelineConfig,
+    raw_output: str,
+    product_id: str,
+    allows: Optional[Callable[[str], bool]] = None,
+    fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD,
+) -> list[PatchOutcome]:
+    """Apply every PATCH block in raw_output to the workspace, one atomic write per file.
+    Several blocks for the same file are applied in order."""
+    base = config.base_dir
+    grouped: dict[str, list[FilePatch]] = {}
+    for patch in parse_patches(raw_output, product_id):
+        grouped.setdefault(patch.path, []).append(patch)
+
+    outcomes: list[PatchOutcome] = []
+    for rel, patches in grouped.items():
+        errors = [p.error for p in patches if p.error]
+        if allows is not None and not allows(rel):
+            errors.append("not in output_files")
+        if errors:
+            outcomes.append(PatchOutcome(rel, False, error="; ".join(errors)))
+            continue
+        abs_path = base / rel
+        try:
+            text = abs_path.read_text() if abs_path.is_file() else None
+            new_text, methods = apply_hunks(
+                text, [h for p in patches for h in p.hunks], fuzzy_threshold
+            )
+        except PatchError as exc:
+            outcomes.append(PatchOutcome(rel, False, error=str(exc)))
+            continue
+        atomic_write(abs_path, new_text)
+        config.store.invalidate(abs_path)
+        outcomes.append(PatchOutcome(rel, True, methods))
+    return outcomes
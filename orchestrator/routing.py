@@ -0,0 +1,192 @@
+# orchestrator/routing.py
+"""Model cascade routing: a fast model first, the agent's own model on failure.
+
+pipeline.yaml `model_routing.policies` defines named cascades; an agent opts
+in with `routing: <policy>`. On its first attempt the agent runs on each
+cascade model in turn, and the first acceptable result wins. The agent's own
+model (`model`, else default_model) is always the last step. A result is
+acceptable when
+
+  - the outcome check passed (files written, validators green — the same
+    ClaudeAgent._check_outcome that decides retries), and
+  - its gate_decision, if the output has one, is not in the policy's
+    `escalate_verdicts` (e.g. a RED from the fast model is confirmed by the
+    larger model before it sends the product into the autofix loop)
+
+Blocking gates are never routed through a verdict policy (one with
+`escalate_verdicts`): a GREEN from the fast model would let the product
+through without the agent's own model ever looking at it. Gate policies are
+for non-blocking (advisory) gates only.
+
+Retries (attempt > 1) skip the cascade: the first attempt has escalated
+already. Hit rates are tracked per (agent, cascade model); once a model has
+been tried `min_samples` times for an agent with a hit rate below
+`min_hit_rate`, that agent goes straight to the next step for the rest of
+the process. Every step is appended to `log_file` as one JSON line.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from .config import PipelineConfig
+
+DEFAULT_LOG_FILE = "state/logs/model-routing.jsonl"
+# Gate reports nest the verdict (gate_report.gate_decision); don't search deeper
+_VERDICT_DEPTH = 3
+
+
+@dataclass
+class RoutePolicy:
+    name: str
+    cascade: list[str]                      # tried in order before the agent's own model
+    escalate_verdicts: frozenset[str] = frozenset()
+
+
+@dataclass
+class RouteDecision:
+    """One step of a routed agent run."""
+
+    product_id: str
+    agent_id: str
+    policy: str
+    model: str
+    step: int                               # 0 = first model tried
+    outcome: str                            # accepted | escalated | failed
+    reason: str = ""                        # failure_type or "gate_decision RED"
+    duration_s: float = 0.0
+    output_tokens: int = 0
+    ts: float = field(default_factory=time.time)
+
+
+def gate_verdict(parsed: Any, depth: int = _VERDICT_DEPTH) -> str:
+    """gate_decision of a parsed gate report ("" if there is none)."""
+    if not isinstance(parsed, dict) or depth <= 0:
+        return ""
+    value = parsed.get("gate_decision")
+    if isinstance(value, str):
+        return value.strip().upper()
+    for child in parsed.values():
+        verdict = gate_verdict(child, depth - 1)
+        if verdict:
+            return verdict
+    return ""
+
+
+class ModelRouter:
+    """Chooses the models of a routed agent run, judges results, logs decisions."""
+
+    def __init__(
+        self,
+        policies: dict[str, RoutePolicy],
+        log_path: Optional[Path] = None,
+        min_samples: int = 5,
+        min_hit_rate: float = 0.5,
+    ):
+        self.policies = policies
+        self.log_path = log_path
+        self.min_samples = min_samples
+        self.min_hit_rate = min_hit_rate
+        self._lock = threading.Lock()
+        # (agent_id, model) → [tried, accepted]
+        self._counts: dict[tuple[str, str], list[int]] = {}
+        self.decisions = 0
+        self.escalations = 0
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["ModelRouter"]:
+        """Build from pipeline.yaml `model_routing`; None if disabled."""
+        settings = config.model_routing()
+        if not settings.get("enabled", False):
+            return None
+        policies = {
+            name: RoutePolicy(
+                name=name,
+                cascade=list(spec.get("cascade", [])),
+                escalate_verdicts=frozenset(str(v).upper() for v in spec.get("escalate_verdicts", [])),
+            )
+            for name, spec in (settings.get("policies") or {}).items()
+        }
+        log_file = settings.get("log_file", DEFAULT_LOG_FILE)
+        return cls(
+            policies,
+            log_path=config.base_dir / log_file if log_file else None,
+            min_samples=int(settings.get("min_samples", 5)),
+            min_hit_rate=float(settings.get("min_hit_rate", 0.5)),
+        )
+
+    # ── Routing ────────────────────────────────────────────────────────────
+
+    def policy_for(self, agent_cfg: dict[str, Any]) -> Optional[RoutePolicy]:
+        """The agent's policy; None if unrouted or a blocking gate under a verdict policy."""
+        name = agent_cfg.get("routing")
+        policy = self.policies.get(name) if name else None
+        if policy is not None and policy.escalate_verdicts and agent_cfg.get("blocking", True):
+            return None
+        return policy
+
+    def models_for(self, agent_cfg: dict[str, Any], final_model: str, attempt: int) -> list[str]:
+        """Models to try in order; [final_model] for unrouted agents and retries."""
+        policy = self.policy_for(agent_cfg)
+        if policy is None or attempt > 1:
+            return [final_model]
+        agent_id = agent_cfg["id"]
+        models = [m for m in policy.cascade if m != final_model and not self._demoted(agent_id, m)]
+        return list(dict.fromkeys(models)) + [final_model]
+
+    def _demoted(self, agent_id: str, model: str) -> bool:
+        with self._lock:
+            tried, accepted = self._counts.get((agent_id, model), (0, 0))
+        return tried >= self.min_samples and accepted / tried < self.min_hit_rate
+
+    def judge(self, policy: RoutePolicy, result: Any, final: bool = False) -> tuple[bool, str]:
+        """(acceptable, reason for escalating) for one step's AgentResult;
+        the final model's verdict stands."""
+        if not result.success:
+            return False, result.failure_type or "failed"
+        verdict = gate_verdict(result.parsed_data)
+        if not final and verdict in policy.escalate_verdicts:
+            return False, f"gate_decision {verdict}"
+        return True, ""
+
+    # ── Bookkeeping ────────────────────────────────────────────────────────
+
+    def record(self, decision: RouteDecision) -> None:
+        """Count the step and append it to the decision log (runs on the I/O pool)."""
+        with self._lock:
+            counts = self._counts.setdefault((decision.agent_id, decision.model), [0, 0])
+            counts[0] += 1
+            counts[1] += decision.outcome == "accepted"
+            self.decisions += 1
+            self.escalations += decision.outcome == "escalated"
+            if self.log_path is not None:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(asdict(decision)) + "\n")
+
+    def stats(self) -> dict[str, Any]:
+        """Hit rate per model and per (agent, model): accepted / tried."""
+        with self._lock:
+            by_model: dict[str, list[int]] = {}
+            agents: dict[str, dict[str, Any]] = {}
+            for (agent_id, model), (tried, accepted) in sorted(self._counts.items()):
+                total = by_model.setdefault(model, [0, 0])
+                total[0] += tried
+                total[1] += accepted
+                agents.setdefault(agent_id, {})[model] = {
+                    "tried": tried, "accepted": accepted, "hit_rate": accepted / tried,
+                }
+            return {
+                "decisions": self.decisions,
+                "escalations": self.escalations,
+                "models": {
+                    model: {"tried": tried, "accepted": accepted, "hit_rate": accepted / tried}
+                    for model, (tried, accepted) in by_model.items()
+                },
+                "agents": agents,
+            }
@@ -0,0 +1,554 @@
+# orchestrator/scheduler.py
+"""Subtask-level DAG scheduler — dispatches each agent as soon as its inputs are ready.
+
+pipeline.yaml describes dependencies at three levels:
+  - phase-level `depends_on`
+  - phase/agent-level `parallel: true|false`
+  - agent-level `depends_on_subtask`
+
+Instead of running phase by phase, the scheduler flattens all active phases into
+one agent graph. Cross-phase edges are narrowed to the agents that actually
+produce a file the consumer reads (context_files ∩ output_files), so e.g.
+`a11y-gate` starts as soon as gen-html-finalize and gen-css are done, while the
+JS chain is still generating. Ready agents are dispatched critical-path-first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import heapq
+import itertools
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from .claude_agent import ClaudeAgent
+from .config import PipelineConfig
+from .fingerprints import digest_paths, plan_incremental
+from .models import AgentResult
+from .speculation import Speculation, SpeculativeExecutor
+from .state_store import PipelineStateStore, changed_outputs
+
+# Checkpoint types that hold back downstream phases until approved
+_GATING_CHECKPOINTS = ("human_approval", "human_required")
+
+# Unresolved template variables ({feature_name}, {violation.file}, …) match anything
+_UNRESOLVED_VAR = re.compile(r"\{[\w.]+\}")
+
+CheckpointHook = Callable[[dict[str, Any], dict[str, AgentResult]], Awaitable[bool]]
+
+
+@dataclass
+class AgentNode:
+    """One schedulable unit: an agent call or a phase checkpoint."""
+
+    node_id: str
+    phase_id: str
+    cfg: dict[str, Any] = field(default_factory=dict)
+    kind: str = "agent"                       # "agent" | "checkpoint"
+    deps: set[str] = field(default_factory=set)
+    dependents: set[str] = field(default_factory=set)
+    cost: float = 0.0                         # estimated tokens generated
+    priority: float = 0.0                     # longest cost path from here to a sink
+
+    @property
+    def blocking(self) -> bool:
+        return bool(self.cfg.get("blocking", True))
+
+
+@dataclass
+class ScheduleOutcome:
+    """Aggregate result of one scheduler run."""
+
+    results: dict[str, AgentResult] = field(default_factory=dict)
+    failed: list[str] = field(default_factory=list)
+    blocked: list[str] = field(default_factory=list)
+    pending_checkpoints: list[str] = field(default_factory=list)
+    duration_seconds: float = 0.0
+    run_id: Optional[str] = None              # row in the pipeline state store
+    speculated: list[str] = field(default_factory=list)   # promoted from a shadow run
+
+    @property
+    def success(self) -> bool:
+        return not self.failed and not self.blocked and not self.pending_checkpoints
+
+
+# ── Graph construction ─────────────────────────────────────────────────────
+
+def _is_active(phase: dict[str, Any], tier: Optional[str]) -> bool:
+    tiers = phase.get("active_for_tiers")
+    return tier is None or not tiers or tier in tiers
+
+
+def _pattern(path: str) -> str:
+    return _UNRESOLVED_VAR.sub("*", path.strip())
+
+
+def paths_overlap(consumer: str, producer: str) -> bool:
+    """True if a context_files entry may read a file written by an output_files entry."""
+    c, p = _pattern(consumer), _pattern(producer)
+    if c == p:
+        return True
+    if c.endswith("/"):
+        return p.startswith(c) or fnmatch.fnmatch(p, c + "*")
+    return fnmatch.fnmatch(p, c) or fnmatch.fnmatch(c, p)
+
+
+def _reads_from(consumer: dict[str, Any], producer: dict[str, Any]) -> bool:
+    return any(
+        paths_overlap(c, p)
+        for c in consumer.get("context_files", [])
+        for p in producer.get("output_files", [])
+    )
+
+
+def estimate_cost(agent_cfg: dict[str, Any], default_max_tokens: int) -> float:
+    """Generated-token estimate used to weight the critical path."""
+    max_output = int(agent_cfg.get(
+        "max_output_tokens", agent_cfg.get("max_tokens", default_max_tokens)
+    ))
+    strategy = agent_cfg.get("thinking_strategy", "disabled")
+    if strategy == "two_pass":
+        return int(agent_cfg.get("thinking_budget_tokens", 4000)) + 2000 + max_output
+    if strategy == "fixed_budget":
+        return int(agent_cfg.get("thinking_budget_tokens", 0)) + max_output
+    return max_output
+
+
+def build_graph(
+    phases: list[dict[str, Any]],
+    tier: Optional[str] = None,
+    default_max_tokens: int = 8192,
+) -> dict[str, AgentNode]:
+    """Flatten active phases into an agent-level DAG keyed by node id."""
+    active = [p for p in phases if _is_active(p, tier)]
+    by_phase = {p["id"]: p for p in phases}
+    active_ids = {p["id"] for p in active}
+
+    def upstream_phases(phase: dict[str, Any]) -> list[str]:
+        # Inactive phases are transparent: inherit their own dependencies
+        result: list[str] = []
+        for dep in phase.get("depends_on", []):
+            if dep in active_ids:
+                result.append(dep)
+            elif dep in by_phase:
+                result.extend(upstream_phases(by_phase[dep]))
+        return list(dict.fromkeys(result))
+
+    nodes: dict[str, AgentNode] = {}
+    phase_agents: dict[str, list[str]] = {}
+
+    for phase in active:
+        ids: list[str] = []
+        for agent_cfg in phase.get("agents", []):
+            node = AgentNode(
+                node_id=agent_cfg["id"],
+                phase_id=phase["id"],
+                cfg=agent_cfg,
+                cost=estimate_cost(agent_cfg, default_max_tokens),
+            )
+            nodes[node.node_id] = node
+            ids.append(node.node_id)
+        phase_agents[phase["id"]] = ids
+
+        checkpoint = phase.get("checkpoint")
+        if isinstance(checkpoint, dict) and checkpoint.get("type") in _GATING_CHECKPOINTS:
+            cp = AgentNode(node_id=f"checkpoint:{phase['id']}", phase_id=phase["id"],
+                           cfg=phase, kind="checkpoint", deps=set(ids))
+            nodes[cp.node_id] = cp
+
+    for phase in active:
+        ids = phase_agents[phase["id"]]
+        sequential = not phase.get("parallel", True)
+
+        for idx, agent_id in enumerate(ids):
+            node = nodes[agent_id]
+            earlier = ids[:idx]
+
+            # Within the phase: explicit subtask deps, sequential phases,
+            # and earlier siblings that produce something this agent reads.
+            explicit = node.cfg.get("depends_on_subtask")
+            if explicit:
+                node.deps.update(d for d in explicit if d in nodes)
+            elif sequential and earlier:
+                node.deps.add(earlier[-1])
+            node.deps.update(e for e in earlier if _reads_from(node.cfg, nodes[e].cfg))
+
+            # Across phases: only the producers of this agent's inputs; if none
+            # of the upstream phase's outputs are read, fall back to a barrier.
+            for dep_phase in upstream_phases(phase):
+                producers = [
+                    p for p in phase_agents[dep_phase] if _reads_from(node.cfg, nodes[p].cfg)
+                ]
+                node.deps.update(producers or phase_agents[dep_phase])
+                cp_id = f"checkpoint:{dep_phase}"
+                if cp_id in nodes:
+                    node.deps.add(cp_id)
+
+    for node in nodes.values():
+        for dep in node.deps:
+            nodes[dep].dependents.add(node.node_id)
+
+    _assign_priorities(nodes)
+    return nodes
+
+
+def _topological_order(nodes: dict[str, AgentNode]) -> list[str]:
+    indegree = {nid: len(n.deps) for nid, n in nodes.items()}
+    queue = [nid for nid, d in indegree.items() if d == 0]
+    order: list[str] = []
+    while queue:
+        nid = queue.pop()
+        order.append(nid)
+        for dep in nodes[nid].dependents:
+            indegree[dep] -= 1
+            if indegree[dep] == 0:
+                queue.append(dep)
+    if len(order) != len(nodes):
+        cyclic = sorted(nid for nid, d in indegree.items() if d > 0)
+        raise ValueError(f"Dependency cycle in pipeline DAG: {cyclic}")
+    return order
+
+
+def _assign_priorities(nodes: dict[str, AgentNode]) -> None:
+    for nid in reversed(_topological_order(nodes)):
+        node = nodes[nid]
+        downstream = max((nodes[d].priority for d in node.dependents), default=0.0)
+        node.priority = node.cost + downstream
+
+
+def critical_path(nodes: dict[str, AgentNode]) -> list[str]:
+    """Return the chain of node ids with the highest cumulative cost."""
+    if not nodes:
+        return []
+    current = max((n for n in nodes.values() if not n.deps), key=lambda n: n.priority)
+    path = [current.node_id]
+    while current.dependents:
+        current = max((nodes[d] for d in current.dependents), key=lambda n: n.priority)
+        path.append(current.node_id)
+    return path
+
+
+# ── Execution ──────────────────────────────────────────────────────────────
+
+class DagScheduler:
+    """Runs a product's pipeline DAG through a (shared) ClaudeAgent."""
+
+    def __init__(
+        self,
+        agent: ClaudeAgent,
+        config: Optional[PipelineConfig] = None,
+        max_concurrency: Optional[int] = None,
+        on_checkpoint: Optional[CheckpointHook] = None,
+        state: Optional[PipelineStateStore] = None,
+        speculation: Optional[SpeculativeExecutor] = None,
+        verbose: bool = False,
+    ):
+        self.agent = agent
+        self.config = config or agent.config
+        # One stage per DAG node; shared with scripts/resume-pipeline.py
+        self.state = state or PipelineStateStore.from_config(self.config)
+        # Runs agents behind a pending human checkpoint in a shadow workspace.
+        # Default: pipeline.yaml speculation (None → wait idle for approval).
+        self.speculation = speculation or SpeculativeExecutor.from_config(self.config, verbose=verbose)
+        # None → every ready agent is dispatched immediately; the agent's
+        # semaphore still caps concurrent API calls.
+        self.max_concurrency = max_concurrency
+        # None → checkpoints stay pending and downstream agents are not run.
+        self.on_checkpoint = on_checkpoint
+        self.verbose = verbose
+
+    def graph(self, product_id: str, tier: Optional[str] = None) -> dict[str, AgentNode]:
+        return build_graph(
+            self.config.phases(product_id),
+            tier=tier,
+            default_max_tokens=self.config.default_max_tokens,
+        )
+
+    async def run(
+        self,
+        product_id: str,
+        tier: Optional[str] = None,
+        skip: Iterable[str] = (),
+        incremental: bool = False,
+        resume: bool = False,
+    ) -> ScheduleOutcome:
+        """Execute the DAG. Agents in `skip` are treated as already completed.
+
+        incremental=True re-runs only agents whose recorded input fingerprints
+        changed (see fingerprints.py) and their transitive dependents.
+        resume=True continues the product's unfinished run (after a
+        PipelinePausedError or crash): checkpointed agents whose outputs are
+        unchanged on disk are skipped, everything else runs again.
+        Stage transitions are recorded in the pipeline state store; the run's
+        spans are exported via the agent's tracer afterwards.
+        """
+        tracer = self.agent.tracer
+        outcome = ScheduleOutcome()
+        try:
+            with tracer.span("pipeline.run", product_id=product_id, tier=tier or "") as span:
+                # Connection setup off the first agent's time-to-first-token;
+                # shared by concurrent runs, a no-op once warm
+                await self.agent.prewarm()
+                await self._run(product_id, tier, skip, incremental, resume, outcome)
+                span.set(
+                    success=outcome.success,
+                    failed=len(outcome.failed),
+                    blocked=len(outcome.blocked),
+                )
+            # Waiting for a checkpoint (or interrupted above) → stays resumable,
+            # also when other agents failed: resume re-runs them after approval
+            if outcome.success:
+                await self._store(self.state.finish_run, outcome.run_id, "completed")
+            elif (outcome.failed or outcome.blocked) and not outcome.pending_checkpoints:
+                await self._store(self.state.finish_run, outcome.run_id, "failed")
+        finally:
+            path = await self.agent._offload(tracer.export_run, product_id)
+            if path and self.verbose:
+                print(f"  ⏱ trace written to {path}")
+        return outcome
+
+    async def _run(
+        self,
+        product_id: str,
+        tier: Optional[str],
+        skip: Iterable[str],
+        incremental: bool,
+        resume: bool,
+        outcome: ScheduleOutcome,
+    ) -> None:
+        self.config.begin_run(product_id)
+        nodes = self.graph(product_id, tier)
+        start = time.monotonic()
+
+        done: set[str] = {nid for nid in skip if nid in nodes}
+        if incremental:
+            stale = plan_incremental(self.agent.fingerprints, nodes, product_id)
+            done.update(nid for nid in nodes if nid not in stale)
+            if self.verbose:
+                print(f"  ↻ incremental: {len(stale)} of {len(nodes)} nodes to run")
+
+        resumed: set[str] = set()
+        run_id = await self._store(self.state.resumable_run, product_id) if resume else None
+        if run_id:
+            resumed = await self._store(self.completed_nodes, run_id, nodes, done)
+            await self._store(self.state.reopen_run, run_id, nodes, resumed)
+            if self.verbose:
+                print(f"  ↻ resuming {run_id}: {len(nodes) - len(resumed)} of {len(nodes)} nodes to run")
+        else:
+            run_id = await self._store(self.state.init_run, product_id, nodes)
+        outcome.run_id = run_id
+        for nid in done - resumed:
+            await self._store(self.state.update_stage, run_id, nid, "skipped", "already completed")
+        done |= resumed
+        remaining = {nid: len(n.deps - done) for nid, n in nodes.items() if nid not in done}
+        ready: list[tuple[float, int, str]] = []
+        seq = itertools.count()
+
+        def push_ready(nid: str) -> None:
+            heapq.heappush(ready, (-nodes[nid].priority, next(seq), nid))
+
+        async def block(nid: str) -> None:
+            for dep in nodes[nid].dependents:
+                if dep in remaining:
+                    del remaining[dep]
+                    outcome.blocked.append(dep)
+                    await self._store(self.state.update_stage, outcome.run_id, dep, "skipped",
+                                      f"blocked by {nid}")
+                    await block(dep)
+
+        for nid, count in remaining.items():
+            if count == 0:
+                push_ready(nid)
+
+        # Speculative results promoted on approval complete without a call
+        promoted: set[str] = set()
+
+        def complete(nid: str) -> None:
+            done.add(nid)
+            for dep in nodes[nid].dependents:
+                if dep in remaining:
+                    remaining[dep] -= 1
+                    if remaining[dep] == 0:
+                        if dep in promoted:
+                            del remaining[dep]
+                            complete(dep)
+                        else:
+                            push_ready(dep)
+
+        running: dict[asyncio.Task, str] = {}
+        try:
+            while ready or running:
+                while ready and (self.max_concurrency is None or len(running) < self.max_concurrency):
+                    _, _, nid = heapq.heappop(ready)
+                    if nid not in remaining:
+                        continue
+                    del remaining[nid]
+                    speculation = None
+                    if nodes[nid].kind == "checkpoint" and self.on_checkpoint and self.speculation:
+                        speculation = self.speculation.start(
+                            self.agent, nid, nodes, done, product_id, self._run_agent
+                        )
+                    task = asyncio.create_task(
+                        self._run_node(nodes[nid], product_id, outcome, speculation)
+                    )
+                    running[task] = nid
+
+                if not running:
+                    break
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    nid = running.pop(task)
+                    ok = task.result()
+                    node = nodes[nid]
+                    if not ok and node.kind == "checkpoint" and node.phase_id in outcome.pending_checkpoints:
+                        # Awaiting a human: dependents stay pending for --resume
+                        continue
+                    if not ok and (node.kind == "checkpoint" or node.blocking):
+                        await block(nid)
+                        continue
+                    promoted.update(outcome.speculated)
+                    complete(nid)
+        except BaseException:
+            # PipelinePausedError or cancellation: stop in-flight agents cleanly
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+
+        outcome.duration_seconds = time.monotonic() - start
+
+    def completed_nodes(
+        self, run_id: str, nodes: dict[str, AgentNode], done: Iterable[str] = ()
+    ) -> set[str]:
+        """Checkpointed nodes of `run_id` that are still valid: outputs unchanged
+        on disk and nothing upstream invalid (which would feed them new inputs).
+        Nodes in `done` (skip / incremental) count as valid without a checkpoint."""
+        checkpoints = self.state.checkpoints(run_id)
+        done = set(done)
+        invalid: set[str] = set()
+        for nid in nodes:
+            checkpoint = checkpoints.get(nid)
+            if checkpoint is None:
+                if nid not in done:
+                    invalid.add(nid)
+                continue
+            changed = changed_outputs(self.config.base_dir, checkpoint["outputs"])
+            if changed:
+                invalid.add(nid)
+                if self.verbose:
+                    print(f"  ↻ [{nid}] outputs changed since checkpoint: {', '.join(changed)}")
+        pending = list(invalid)
+        while pending:
+            for dep in nodes[pending.pop()].dependents:
+                if dep not in invalid:
+                    invalid.add(dep)
+                    pending.append(dep)
+        return {nid for nid in checkpoints if nid in nodes and nid not in invalid}
+
+    async def _run_node(
+        self,
+        node: AgentNode,
+        product_id: str,
+        outcome: ScheduleOutcome,
+        speculation: Optional[Speculation] = None,
+    ) -> bool:
+        await self._store(self.state.update_stage, outcome.run_id, node.node_id, "running")
+        if node.kind == "checkpoint":
+            approved = await self._run_checkpoint(node, outcome, speculation)
+            if approved:
+                await self._store(self.state.checkpoint, outcome.run_id, node.node_id,
+                                  attempt=1, outputs={})
+            elif node.phase_id not in outcome.pending_checkpoints:
+                await self._store(self.state.update_stage, outcome.run_id, node.node_id,
+                                  "failed", "rejected")
+            else:
+                # Awaiting a human: back to pending, the resume point of this run
+                await self._store(self.state.update_stage, outcome.run_id, node.node_id, "pending")
+            return approved
+
+        result = await self._run_agent(self.agent, node, product_id, node.priority)
+        outcome.results[node.node_id] = result
+        if result.success:
+            await self._record_success(outcome, node.node_id, result)
+        else:
+            await self._store(self.state.update_stage, outcome.run_id, node.node_id, "failed",
+                              f"{result.failure_type}: {result.error}")
+            outcome.failed.append(node.node_id)
+            if self.verbose:
+                print(f"  ✗ [{node.node_id}] failed after {result.attempt} attempt(s)")
+        return result.success
+
+    async def _run_agent(
+        self, agent: ClaudeAgent, node: AgentNode, product_id: str, priority: float
+    ) -> AgentResult:
+        """One agent node with its retry policy; failures are fed back as context."""
+        max_attempts = 1 + int(node.cfg.get("max_retries", 0))
+        extra_context = ""
+        result: Optional[AgentResult] = None
+        for attempt in range(1, max_attempts + 1):
+            result = await agent.run(node.cfg, product_id, attempt=attempt,
+                                     extra_context=extra_context,
+                                     priority=priority)
+            if result.success:
+                break
+            extra_context = (
+                f"Previous attempt {attempt} failed ({result.failure_type}): {result.error}\n"
+                "Fix this issue in your output."
+            )
+        assert result is not None
+        return result
+
+    async def _store(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """State-store call on the agent's I/O pool: each one is a SQLite write
+        transaction that may wait out the busy timeout under WAL contention."""
+        return await self.agent._offload(fn, *args, **kwargs)
+
+    async def _record_success(self, outcome: ScheduleOutcome, node_id: str, result: AgentResult) -> None:
+        outcome.results[node_id] = result
+        await self._store(self._checkpoint, outcome, node_id, result)
+
+    def _checkpoint(self, outcome: ScheduleOutcome, node_id: str, result: AgentResult) -> None:
+        self.state.checkpoint(
+            outcome.run_id, node_id,
+            attempt=result.attempt,
+            outputs=digest_paths(
+                self.config, [self.config.base_dir / rel for rel in result.output_files]
+            ),
+            tokens_used=result.tokens_used,
+            cache_read_tokens=getattr(result, "cache_read_tokens", 0),
+            duration_seconds=result.duration_seconds,
+        )
+
+    async def _run_checkpoint(
+        self, node: AgentNode, outcome: ScheduleOutcome, speculation: Optional[Speculation] = None
+    ) -> bool:
+        if self.on_checkpoint is None:
+            outcome.pending_checkpoints.append(node.phase_id)
+            return False
+        phase_results = {
+            nid: r for nid, r in outcome.results.items()
+            if nid in node.deps
+        }
+        try:
+            with self.agent.tracer.span("checkpoint.wait", phase_id=node.phase_id) as span:
+                approved = await self.on_checkpoint(node.cfg, phase_results)
+                span.set(approved=approved)
+        except BaseException:
+            if speculation:
+                await speculation.discard()
+            raise
+        if speculation:
+            if approved:
+                for nid, result in (await speculation.promote()).items():
+                    await self._record_success(outcome, nid, result)
+                    outcome.speculated.append(nid)
+            else:
+                await speculation.discard()
+        if not approved:
+            outcome.failed.append(node.node_id)
+        return approved
+
@@ -0,0 +1,254 @@
+# orchestrator/speculation.py
+"""Speculative execution of downstream agents while a human checkpoint is pending.
+
+Phases like environment_setup and specs end in `human_approval` checkpoints
+that can sit for hours. With `speculation.enabled`, the scheduler starts the
+agents behind a pending checkpoint right away — against the pending outputs,
+in a shadow workspace — while the approval hook is still waiting:
+
+  approved   speculative results are promoted: output files are copied into
+             the real workspace and the nodes complete without another call.
+             Each agent's recorded inputs are compared with the real workspace
+             first; files edited during review invalidate exactly the agents
+             that read them (and their speculative dependents), which then
+             run normally.
+  rejected   the shadow workspace is discarded.
+
+The shadow workspace lives under `speculation.dir`. It contains the product
+directory and state/*.yaml as copies; every other top-level entry is a
+symlink. Only agents whose outputs all stay inside products/{product_id}/
+(and are not yaml_append) are speculated, so promoting can never overwrite
+shared state that other products append to.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import secrets
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from .aio import atomic_write
+from .cache import PlanCache
+from .config import PipelineConfig
+from .fingerprints import FingerprintStore, digest_paths
+from .models import AgentResult
+
+if TYPE_CHECKING:
+    from .claude_agent import ClaudeAgent
+    from .scheduler import AgentNode
+
+# (agent, node, product_id, priority) → result, with the scheduler's retry policy
+RunAgent = Callable[["ClaudeAgent", "AgentNode", str, float], Awaitable[AgentResult]]
+
+# Never copied into (or symlinked from) a shadow workspace
+_SHADOW_SKIP = ("products", "state", ".git")
+_COPY_IGNORE = shutil.ignore_patterns("node_modules", ".git", "*.part")
+
+
+class SpeculativeExecutor:
+    """Starts one Speculation per pending checkpoint (see module docstring)."""
+
+    def __init__(self, config: PipelineConfig, shadow_dir: str | Path, max_agents: int = 12,
+                 verbose: bool = False):
+        self.config = config
+        self.shadow_dir = config.base_dir / shadow_dir
+        self.max_agents = max_agents
+        self.verbose = verbose
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig, verbose: bool = False) -> Optional["SpeculativeExecutor"]:
+        """Build from pipeline.yaml `speculation`; None if disabled."""
+        settings = config.speculation()
+        if not settings.get("enabled", False):
+            return None
+        return cls(
+            config,
+            settings.get("dir", "state/speculative"),
+            max_agents=int(settings.get("max_agents", 12)),
+            verbose=verbose,
+        )
+
+    def speculable(self, node: "AgentNode", product_id: str) -> bool:
+        """Agents whose every output stays inside the product directory."""
+        cfg = node.cfg
+        if node.kind != "agent" or cfg.get("output_format") == "yaml_append":
+            return False
+        outputs = cfg.get("output_files", [])
+        prefix = f"products/{product_id}/"
+        return bool(outputs) and all(str(p).startswith(prefix) for p in outputs)
+
+    def targets(
+        self, checkpoint_id: str, nodes: dict[str, "AgentNode"], done: set[str], product_id: str
+    ) -> list[str]:
+        """Downstream agents of the checkpoint whose other inputs are all done, in
+        topological order; stops at other checkpoints and non-speculable agents."""
+        chosen: list[str] = []
+        members = {checkpoint_id}
+        frontier = [checkpoint_id]
+        while frontier and len(chosen) < self.max_agents:
+            for nid in sorted(nodes[frontier.pop(0)].dependents):
+                node = nodes[nid]
+                if nid in members or nid in done or not self.speculable(node, product_id):
+                    continue
+                if all(dep in done or dep in members for dep in node.deps):
+                    members.add(nid)
+                    chosen.append(nid)
+                    frontier.append(nid)
+                    if len(chosen) >= self.max_agents:
+                        break
+        return chosen
+
+    def start(
+        self,
+        agent: "ClaudeAgent",
+        checkpoint_id: str,
+        nodes: dict[str, "AgentNode"],
+        done: set[str],
+        product_id: str,
+        run_agent: RunAgent,
+    ) -> Optional["Speculation"]:
+        targets = self.targets(checkpoint_id, nodes, done, product_id)
+        if not targets:
+            return None
+        speculation = Speculation(self, agent, checkpoint_id, {nid: nodes[nid] for nid in targets},
+                                  product_id, run_agent)
+        speculation.start()
+        return speculation
+
+    def make_shadow(self, product_id: str, checkpoint_id: str) -> Path:
+        base = self.config.base_dir
+        phase = checkpoint_id.split(":", 1)[-1]
+        root = self.shadow_dir / f"{product_id}-{phase}-{secrets.token_hex(4)}"
+        root.mkdir(parents=True)
+        for entry in base.iterdir():
+            if entry.name not in _SHADOW_SKIP:
+                (root / entry.name).symlink_to(entry)
+        product_dir = base / "products" / product_id
+        if product_dir.is_dir():
+            shutil.copytree(product_dir, root / "products" / product_id, ignore=_COPY_IGNORE)
+        else:
+            (root / "products" / product_id).mkdir(parents=True)
+        (root / "state").mkdir()
+        for state_file in (base / "state").glob("*.yaml"):
+            shutil.copy2(state_file, root / "state" / state_file.name)
+        return root
+
+
+class Speculation:
+    """Shadow run of the agents behind one pending checkpoint."""
+
+    def __init__(
+        self,
+        executor: SpeculativeExecutor,
+        agent: "ClaudeAgent",
+        checkpoint_id: str,
+        nodes: dict[str, "AgentNode"],
+        product_id: str,
+        run_agent: RunAgent,
+    ):
+        self.executor = executor
+        self.real = agent
+        self.checkpoint_id = checkpoint_id
+        self.nodes = nodes
+        self.product_id = product_id
+        self.run_agent = run_agent
+        self.results: dict[str, AgentResult] = {}
+        self.promoted: dict[str, AgentResult] = {}
+        self.root: Optional[Path] = None
+        self._stopping = False
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def verbose(self) -> bool:
+        return self.executor.verbose
+
+    # ── Shadow run ─────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        self.root = self.executor.make_shadow(self.product_id, self.checkpoint_id)
+        config = PipelineConfig(base_dir=str(self.root), store=self.real.config.store)
+        config.begin_run(self.product_id)
+        # Same client, limiter, cache, semaphore and tracer; own workspace, and
+        # the stores that write into it (a speculative plan stays in the shadow)
+        self.shadow = copy.copy(self.real)
+        self.shadow.config = config
+        self.shadow.fingerprints = FingerprintStore(config)
+        if self.real.plan_cache is not None:
+            self.shadow.plan_cache = PlanCache(config, self.real.plan_cache.max_age_seconds)
+        if self.verbose:
+            print(f"  ⇢ [{self.checkpoint_id}] speculating {len(self.nodes)} agent(s) while awaiting approval")
+        for nid in self.nodes:
+            self._tasks[nid] = asyncio.ensure_future(self._run(nid))
+
+    async def _run(self, nid: str) -> bool:
+        for dep in self.nodes[nid].deps:
+            if dep in self._tasks and not await self._tasks[dep]:
+                return False
+        if self._stopping:
+            return False
+        # Speculative work yields to the real pipeline in the rate limiter
+        result = await self.run_agent(self.shadow, self.nodes[nid], self.product_id, 0.0)
+        self.results[nid] = result
+        return result.success
+
+    async def _finish(self) -> None:
+        """Start nothing new; let calls already in flight complete."""
+        self._stopping = True
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    # ── Resolution ─────────────────────────────────────────────────────────
+
+    async def promote(self) -> dict[str, AgentResult]:
+        """Copy every still-valid speculative result into the real workspace."""
+        await self._finish()
+        config = self.real.config
+        base = config.base_dir
+        produced = {rel for result in self.results.values() for rel in result.output_files}
+        records = self.shadow.fingerprints.records(self.product_id)
+        try:
+            for nid, node in self.nodes.items():
+                result = self.results.get(nid)
+                if result is None or not result.success or nid not in records:
+                    continue
+                if any(dep in self.nodes and dep not in self.promoted for dep in node.deps):
+                    continue
+                inputs: dict[str, Optional[str]] = records[nid]["inputs"]
+                outside = [rel for rel in inputs if rel not in produced]
+                current = digest_paths(config, [base / rel for rel in outside])
+                changed = [rel for rel in outside if current[rel] != inputs[rel]]
+                if changed:
+                    if self.verbose:
+                        print(f"  ↻ [{nid}] speculative result discarded, inputs changed: "
+                              f"{', '.join(changed)}")
+                    continue
+                for rel in result.output_files:
+                    _copy_atomic(self.root / rel, base / rel)
+                    config.store.invalidate(base / rel)
+                self.real.fingerprints.record(self.product_id, nid, inputs, result.output_files)
+                self.promoted[nid] = result
+        finally:
+            self._remove()
+        if self.verbose:
+            print(f"  ⇢ [{self.checkpoint_id}] promoted {len(self.promoted)} of "
+                  f"{len(self.nodes)} speculative agent(s)")
+        return self.promoted
+
+    async def discard(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._remove()
+        if self.verbose:
+            print(f"  ⇢ [{self.checkpoint_id}] speculative results discarded")
+
+    def _remove(self) -> None:
+        if self.root is not None:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.root = None
+
+
+def _copy_atomic(src: Path, dst: Path) -> None:
+    atomic_write(dst, src.read_bytes())
@@ -0,0 +1,129 @@
+# orchestrator/startup.py
+"""Where a CLI's start-up time goes: `--profile-startup`.
+
+Imports the CLI (module name or script path, without running main()) in a
+fresh interpreter under `python -X importtime`, loads pipeline.yaml twice and
+prints:
+
+  process     interpreter start → imports done → config loaded
+  packages    import time per top-level package (anthropic, yaml, …): the sum
+              of its modules' own times, wherever in the import tree they load
+  modules     the slowest modules by their own import time
+  config      PipelineConfig() load time and source (cache | yaml)
+
+A fresh interpreter is needed because by the time the flag is parsed the
+calling process has already paid for its imports. Commands that only read
+state or config should not import `anthropic` at all; the report flags it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+FLAG = "--profile-startup"
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints one JSON line on stdout
+_PROBE = """
+import json, runpy, sys, time
+t0 = time.perf_counter()
+target, base_dir = sys.argv[1], sys.argv[2]
+if target.endswith(".py"):
+    runpy.run_path(target, run_name="__profile_startup__")
+else:
+    __import__(target)
+t1 = time.perf_counter()
+from orchestrator.config import PipelineConfig
+first = PipelineConfig(base_dir=base_dir)
+second = PipelineConfig(base_dir=base_dir)
+print(json.dumps({
+    "imports_s": t1 - t0,
+    "config_s": first.load_seconds, "config_from": first.loaded_from,
+    "config_warm_s": second.load_seconds, "config_warm_from": second.loaded_from,
+    "anthropic": "anthropic" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+@dataclass
+class StartupProfile:
+    target: str
+    process_s: float                    # wall time of the whole child process
+    imports_s: float
+    config_s: float
+    config_from: str
+    config_warm_s: float
+    config_warm_from: str
+    anthropic: bool                     # SDK imported although no model call was made
+    modules: int
+    packages: list[tuple[str, float]] = field(default_factory=list)   # (package, seconds)
+    slowest: list[tuple[str, float]] = field(default_factory=list)    # (module, self seconds)
+
+
+def add_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(FLAG, action="store_true",
+                        help="Report the command's import and config-load times, then exit")
+
+
+def _parse_importtime(stderr: str) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+    """(seconds per top-level package, self seconds per module) from -X importtime."""
+    packages: dict[str, float] = {}
+    modules: list[tuple[str, float]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue    # header line
+        self_us, name = int(parts[0]), parts[2]
+        module = name.strip()
+        modules.append((module, self_us / 1e6))
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_us / 1e6
+    return (sorted(packages.items(), key=lambda kv: -kv[1]),
+            sorted(modules, key=lambda kv: -kv[1]))
+
+
+def profile(target: str, base_dir: str | Path = ".", top: int = 10) -> StartupProfile:
+    """Profile importing `target` (e.g. "orchestrator.fleet" or a script path)."""
+    import json
+    import subprocess
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT)] + [p for p in sys.path if p])
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, str(target), str(base_dir)],
+        capture_output=True, text=True, env=env,
+    )
+    process_s = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup probe failed:\n{proc.stderr[-2000:]}")
+    data: dict[str, Any] = json.loads(proc.stdout.strip().splitlines()[-1])
+    packages, slowest = _parse_importtime(proc.stderr)
+    return StartupProfile(target=str(target), process_s=process_s, packages=packages[:top],
+                          slowest=slowest[:top], **data)
+
+
+def print_profile(target: str, base_dir: str | Path = ".", top: int = 10) -> None:
+    p = profile(target, base_dir, top)
+    print(f"Startup profile: {p.target}")
+    print(f"  process total      {p.process_s * 1000:8.1f} ms   (interpreter start, imports, config)")
+    print(f"  imports            {p.imports_s * 1000:8.1f} ms   ({p.modules} modules)")
+    print(f"  config load        {p.config_s * 1000:8.1f} ms   from {p.config_from}")
+    print(f"  config load again  {p.config_warm_s * 1000:8.1f} ms   from {p.config_warm_from}")
+    if p.anthropic:
+        print("  ✗ `anthropic` imported at start-up (it should load on the first model call)")
+    print("\n  Packages")
+    for name, seconds in p.packages:
+        print(f"    {name:<32} {seconds * 1000:8.1f} ms")
+    print("\n  Modules (self)")
+    for name, seconds in p.slowest:
+        print(f"    {name:<32} {seconds * 1000:8.1f} ms")
@@ -0,0 +1,411 @@
+# orchestrator/state_store.py
+"""Transactional pipeline state: products, runs and stage transitions in SQLite.
+
+Replaces the whole-file rewrite of state/pipeline-state.json (load everything,
+change one stage, json.dump everything) with one indexed row update per stage
+transition. The database runs in WAL mode, so parallel pipelines — threads or
+separate processes — can update their stages concurrently while readers such
+as `resume-pipeline.py --list` never block.
+
+Shared by orchestrator/scheduler.py (one stage per DAG node) and
+scripts/resume-pipeline.py (the classic validate → build stages). The
+scheduler also checkpoints every completed agent — attempt, tokens and a
+SHA-256 per output file — so a resumed run re-executes only the agents whose
+checkpoint is missing or whose outputs changed on disk. An existing
+pipeline-state.json is imported once on first open and renamed to
+pipeline-state.json.migrated.
+
+Stdlib only: resume-pipeline.py imports this without the orchestrator's
+dependencies.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .config import PipelineConfig
+
+DEFAULT_DB = "state/pipeline-state.db"
+LEGACY_JSON = "state/pipeline-state.json"
+
+# Stage statuses after which a stage is no longer resumable
+FINISHED = ("passed", "failed", "skipped")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS products (
+    product_id   TEXT PRIMARY KEY,
+    created_at   TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    current_run  TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       TEXT PRIMARY KEY,
+    product_id   TEXT NOT NULL REFERENCES products(product_id) ON DELETE CASCADE,
+    seq          INTEGER NOT NULL,
+    started_at   TEXT NOT NULL,
+    completed_at TEXT,
+    status       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_product ON runs(product_id, seq);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id       TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    stage        TEXT NOT NULL,
+    position     INTEGER NOT NULL,
+    status       TEXT NOT NULL,
+    started_at   TEXT,
+    completed_at TEXT,
+    result       TEXT,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    run_id            TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    node_id           TEXT NOT NULL,
+    attempt           INTEGER NOT NULL,
+    tokens_used       INTEGER NOT NULL DEFAULT 0,
+    cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+    duration_seconds  REAL NOT NULL DEFAULT 0,
+    outputs           TEXT NOT NULL,
+    recorded_at       TEXT NOT NULL,
+    PRIMARY KEY (run_id, node_id)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """SHA-256 of the file's bytes (as in context_store), None if missing."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def changed_outputs(base_dir: Path, outputs: dict[str, Optional[str]]) -> list[str]:
+    """Checkpointed output files whose content on disk no longer matches."""
+    return sorted(rel for rel, digest in outputs.items() if file_digest(base_dir / rel) != digest)
+
+
+class PipelineStateStore:
+    """One SQLite database per workspace; safe to share across threads."""
+
+    def __init__(self, path: str | Path, legacy_json: Optional[str | Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+        if legacy_json is not None:
+            self.migrate_json(Path(legacy_json))
+
+    @classmethod
+    def from_config(cls, config: "PipelineConfig") -> "PipelineStateStore":
+        """Store at pipeline.yaml state_files.pipeline_db (default state/pipeline-state.db)."""
+        base = config.base_dir
+        db = config.state_files().get("pipeline_db", DEFAULT_DB)
+        return cls(base / db, legacy_json=base / LEGACY_JSON)
+
+    # ── Connections ────────────────────────────────────────────────────────
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads: one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE … COMMIT: takes the write lock up front, no lost updates."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ── Products & runs ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _touch(db: sqlite3.Connection, product_id: str, now: str) -> None:
+        db.execute(
+            "INSERT INTO products(product_id, created_at, last_updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(product_id) DO UPDATE SET last_updated = excluded.last_updated",
+            (product_id, now, now),
+        )
+
+    def ensure_product(self, product_id: str) -> None:
+        with self.transaction() as db:
+            self._touch(db, product_id, _now())
+
+    def init_run(self, product_id: str, stages: Iterable[str]) -> str:
+        """Start a new run with all stages pending, make it the current run, return its id."""
+        now = _now()
+        with self.transaction() as db:
+            self._touch(db, product_id, now)
+            run_id = f"run_{int(datetime.now().timestamp())}"
+            # Parallel products start within the same second
+            while db.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone():
+                run_id = f"run_{int(datetime.now().timestamp())}_{secrets.token_hex(3)}"
+            seq = db.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM runs WHERE product_id = ?", (product_id,)
+            ).fetchone()[0]
+            db.execute(
+                "INSERT INTO runs(run_id, product_id, seq, started_at, status) "
+                "VALUES (?, ?, ?, ?, 'in_progress')",
+                (run_id, product_id, seq, now),
+            )
+            db.executemany(
+                "INSERT INTO stages(run_id, stage, position, status) VALUES (?, ?, ?, 'pending')",
+                [(run_id, stage, i) for i, stage in enumerate(stages)],
+            )
+            db.execute("UPDATE products SET current_run = ? WHERE product_id = ?", (run_id, product_id))
+        return run_id
+
+    def update_stage(
+        self,
+        run_id: str,
+        stage: str,
+        status: str,
+        result: Optional[str] = None,
+        expected: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """Atomic stage transition. With `expected`, only applies if the stage is
+        currently in one of those statuses (compare-and-set). Returns whether it applied."""
+        now = _now()
+        finished = status in FINISHED
+        sql = (
+            "UPDATE stages SET status = ?, started_at = COALESCE(?, started_at),"
+            " completed_at = COALESCE(?, completed_at),"
+            " result = CASE WHEN ? THEN ? ELSE result END"
+            " WHERE run_id = ? AND stage = ?"
+        )
+        params: list[Any] = [
+            status,
+            now if status == "running" else None,
+            now if finished else None,
+            finished, result, run_id, stage,
+        ]
+        if expected is not None:
+            expected = list(expected)
+            sql += f" AND status IN ({', '.join('?' * len(expected))})"
+            params.extend(expected)
+        with self.transaction() as db:
+            applied = db.execute(sql, params).rowcount == 1
+            if applied:
+                db.execute(
+                    "UPDATE products SET last_updated = ? WHERE product_id = "
+                    "(SELECT product_id FROM runs WHERE run_id = ?)",
+                    (now, run_id),
+                )
+        return applied
+
+    def checkpoint(
+        self,
+        run_id: str,
+        node_id: str,
+        attempt: int,
+        outputs: dict[str, Optional[str]],
+        tokens_used: int = 0,
+        cache_read_tokens: int = 0,
+        duration_seconds: float = 0.0,
+    ) -> None:
+        """Record a completed node and mark its stage passed, in one transaction."""
+        now = _now()
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints(run_id, node_id, attempt, tokens_used,"
+                " cache_read_tokens, duration_seconds, outputs, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, node_id, attempt, tokens_used, cache_read_tokens,
+                 round(duration_seconds, 3), json.dumps(outputs, sort_keys=True), now),
+            )
+            db.execute(
+                "UPDATE stages SET status = 'passed', completed_at = ?, result = ?"
+                " WHERE run_id = ? AND stage = ?",
+                (now, f"attempt {attempt}", run_id, node_id),
+            )
+
+    def reopen_run(self, run_id: str, stages: Iterable[str], done: set[str]) -> None:
+        """Continue `run_id`: stages outside `done` go back to pending (their
+        checkpoints are dropped), stages new to the graph are added."""
+        with self.transaction() as db:
+            offset = db.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM stages WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            for i, stage in enumerate(stages):
+                db.execute(
+                    "INSERT OR IGNORE INTO stages(run_id, stage, position, status)"
+                    " VALUES (?, ?, ?, 'pending')",
+                    (run_id, stage, offset + i),
+                )
+                if stage not in done:
+                    db.execute(
+                        "UPDATE stages SET status = 'pending', started_at = NULL,"
+                        " completed_at = NULL, result = NULL WHERE run_id = ? AND stage = ?",
+                        (run_id, stage),
+                    )
+                    db.execute(
+                        "DELETE FROM checkpoints WHERE run_id = ? AND node_id = ?", (run_id, stage)
+                    )
+            db.execute(
+                "UPDATE runs SET status = 'in_progress', completed_at = NULL WHERE run_id = ?",
+                (run_id,),
+            )
+
+    def finish_run(self, run_id: str, status: str) -> None:
+        """Close a run ("completed" / "failed"); "in_progress" keeps it resumable."""
+        with self.transaction() as db:
+            db.execute(
+                "UPDATE runs SET status = ?, completed_at = CASE WHEN ? = 'in_progress' "
+                "THEN NULL ELSE ? END WHERE run_id = ?",
+                (status, status, _now(), run_id),
+            )
+
+    def reset_product(self, product_id: str) -> bool:
+        with self.transaction() as db:
+            return db.execute("DELETE FROM products WHERE product_id = ?", (product_id,)).rowcount > 0
+
+    # ── Queries ────────────────────────────────────────────────────────────
+
+    def product(self, product_id: str) -> Optional[dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT * FROM products WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_run(self, run_id: str) -> Optional[dict[str, Any]]:
+        """Run with its stages, in the same shape as the old JSON entries."""
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = {k: row[k] for k in ("run_id", "started_at", "completed_at", "status")}
+        run["stages"] = {
+            s["stage"]: {
+                "status": s["status"],
+                "started_at": s["started_at"],
+                "completed_at": s["completed_at"],
+                "result": s["result"],
+            }
+            for s in conn.execute(
+                "SELECT * FROM stages WHERE run_id = ? ORDER BY position", (run_id,)
+            )
+        }
+        return run
+
+    def current_run(self, product_id: str) -> Optional[dict[str, Any]]:
+        product = self.product(product_id)
+        if not product or not product["current_run"]:
+            return None
+        return self.get_run(product["current_run"])
+
+    def resumable_run(self, product_id: str) -> Optional[str]:
+        """The product's current run if it has not finished (interrupted or paused)."""
+        row = self._conn().execute(
+            "SELECT r.run_id FROM products p JOIN runs r ON r.run_id = p.current_run"
+            " WHERE p.product_id = ? AND r.status = 'in_progress'",
+            (product_id,),
+        ).fetchone()
+        return row["run_id"] if row else None
+
+    def checkpoints(self, run_id: str) -> dict[str, dict[str, Any]]:
+        """node_id → checkpoint (attempt, tokens, output digests) of a run."""
+        out: dict[str, dict[str, Any]] = {}
+        for row in self._conn().execute("SELECT * FROM checkpoints WHERE run_id = ?", (run_id,)):
+            entry = dict(row)
+            entry["outputs"] = json.loads(entry["outputs"])
+            out[entry.pop("node_id")] = entry
+        return out
+
+    def resume_point(self, product_id: str) -> tuple[Optional[str], Optional[str]]:
+        """(run_id, first unfinished stage) of the current in-progress run."""
+        row = self._conn().execute(
+            "SELECT r.run_id, s.stage FROM products p"
+            " JOIN runs r ON r.run_id = p.current_run AND r.status = 'in_progress'"
+            " JOIN stages s ON s.run_id = r.run_id AND s.status IN ('pending', 'running')"
+            " WHERE p.product_id = ? ORDER BY s.position LIMIT 1",
+            (product_id,),
+        ).fetchone()
+        return (row["run_id"], row["stage"]) if row else (None, None)
+
+    def list_products(self) -> list[dict[str, Any]]:
+        """Every product with its latest run — one indexed lookup per product."""
+        rows = self._conn().execute(
+            "SELECT p.product_id, p.last_updated, r.run_id, r.status, r.started_at,"
+            " (SELECT COUNT(*) FROM runs WHERE product_id = p.product_id) AS run_count"
+            " FROM products p LEFT JOIN runs r ON r.run_id = ("
+            "   SELECT run_id FROM runs WHERE product_id = p.product_id"
+            "   ORDER BY seq DESC LIMIT 1)"
+            " ORDER BY p.product_id"
+        )
+        return [dict(row) for row in rows]
+
+    # ── Migration ──────────────────────────────────────────────────────────
+
+    def migrate_json(self, json_path: Path) -> int:
+        """One-time import of the legacy pipeline-state.json; returns runs imported."""
+        if not json_path.exists():
+            return 0
+        with self.transaction() as db:
+            if db.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                return 0
+            state = json.loads(json_path.read_text() or "{}")
+            imported = 0
+            for product_id, product in state.items():
+                db.execute(
+                    "INSERT OR IGNORE INTO products(product_id, created_at, last_updated, current_run)"
+                    " VALUES (?, ?, ?, ?)",
+                    (product_id, product.get("created_at") or _now(),
+                     product.get("last_updated") or _now(), product.get("current_run")),
+                )
+                for seq, run in enumerate(product.get("runs", []), start=1):
+                    db.execute(
+                        "INSERT OR IGNORE INTO runs(run_id, product_id, seq, started_at,"
+                        " completed_at, status) VALUES (?, ?, ?, ?, ?, ?)",
+                        (run["run_id"], product_id, seq, run.get("started_at") or _now(),
+                         run.get("completed_at"), run.get("status", "in_progress")),
+                    )
+                    db.executemany(
+                        "INSERT OR IGNORE INTO stages(run_id, stage, position, status,"
+                        " started_at, completed_at, result) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (run["run_id"], stage, i, s.get("status", "pending"),
+                             s.get("started_at"), s.get("completed_at"), s.get("result"))
+                            for i, (stage, s) in enumerate(run.get("stages", {}).items())
+                        ],
+                    )
+                    imported += 1
+            db.execute(
+                "INSERT INTO meta(key, value) VALUES ('migrated_json', ?)",
+                (json.dumps({"source": str(json_path), "at": _now(), "runs": imported}),),
+            )
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+        return imported
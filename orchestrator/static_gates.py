@@ -0,0 +1,472 @@
+# orchestrator/static_gates.py
+"""Deterministic pre-checks for the LLM quality gates.
+
+Gate agents with `static_precheck: <gate>` first get an offline scan of
+products/{product_id}/app/ for findings that need no model:
+
+  security     inline event handlers, javascript: URLs, innerHTML/outerHTML/
+               insertAdjacentHTML/document.write with non-literal data,
+               eval/new Function, no Content-Security-Policy in vercel.json, a
+               <meta> tag, next.config.* headers() or middleware
+  a11y         <html> without lang, <img> without alt, form fields without a
+               label, buttons without an accessible name
+  quality      console.log / debugger left in the code
+  performance  JS/CSS totals, HTML files and images over the size budgets
+
+Scripts are .js/.mjs/.cjs and the .jsx/.ts/.tsx sources of Next.js apps
+(dangerouslySetInnerHTML counts as an HTML sink there). Dependencies and
+build output (node_modules, .next, dist, build, out, …) are not scanned and
+do not count toward the budgets: the agents did not write them, and the
+budgets apply to the app's own code.
+
+Findings are written in the gate-report format (violations with id, severity,
+file, line, auto_fixable, suggested_fix — what the autofix loop consumes).
+By default (`static_gates.on_red: narrow`) the LLM gate runs with the static
+findings in its context and is told not to re-derive them. With `skip`, a
+scan that is already RED from definitive findings becomes the gate's report
+and the LLM call is skipped; the autofix loop fixes it and the gate re-runs.
+Heuristic rules (HEURISTIC_RULES: the sink and CSP checks see one file at a
+time and miss escaping helpers and framework config) never skip the LLM —
+it is told to confirm or drop them.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+from .config import PipelineConfig
+
+GATES = ("security", "a11y", "quality", "performance")
+BLOCKING_SEVERITIES = ("CRITICAL", "HIGH")
+# Rules with known false positives: the LLM gate confirms them, even with on_red: skip
+HEURISTIC_RULES = frozenset({"unsafe_html_sink", "csp_missing"})
+
+# KB; above `good` → LOW, above `warning` → MEDIUM, above `blocking` → HIGH
+# (governance/quality-gates.md, agents/specialized/performance-advisor.md)
+DEFAULT_BUDGETS_KB: dict[str, dict[str, int]] = {
+    "js_total": {"good": 100, "warning": 250, "blocking": 500},
+    "css_total": {"good": 50, "warning": 100, "blocking": 200},
+    "html": {"good": 50, "warning": 100},
+    "image": {"warning": 500},
+}
+
+_ID_PREFIX = {"security": "SEC", "a11y": "A11Y", "quality": "QG", "performance": "PERF"}
+# Dependencies, build output and tool caches — generated, not written by the agents
+_SKIP_DIRS = ("node_modules", ".git", ".next", ".vercel", ".turbo", "dist", "build", "out", "coverage")
+_SCRIPT_SUFFIXES = (".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx")
+_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".avif")
+# Framework files that set response headers in code (Next.js headers(), middleware)
+_HEADER_SOURCES = ("next.config.js", "next.config.mjs", "next.config.cjs", "next.config.ts",
+                   "middleware.js", "middleware.ts", "src/middleware.js", "src/middleware.ts")
+_CSP_HEADER = re.compile(r"""['"`]Content-Security-Policy['"`]""", re.IGNORECASE)
+
+# JS patterns (matched per line, outside // comments)
+_HTML_SINK = re.compile(r"\.(innerHTML|outerHTML)\s*\+?=\s*(.+)")
+_JSX_HTML_SINK = re.compile(r"dangerouslySetInnerHTML\s*=\s*\{\{\s*__html\s*:\s*([^}]+)")
+# Type declarations and test files are not shipped to the browser
+_UNSHIPPED_SCRIPT = re.compile(r"\.d\.ts$|\.(?:test|spec)\.[cm]?[jt]sx?$")
+_ADJACENT_HTML = re.compile(r"\.insertAdjacentHTML\s*\(\s*[^,]+,\s*(.+)")
+_DOCUMENT_WRITE = re.compile(r"\bdocument\.write(?:ln)?\s*\(")
+_EVAL = re.compile(r"(?<![\w.])eval\s*\(|\bnew\s+Function\s*\(")
+_CONSOLE = re.compile(r"\bconsole\.(log|debug)\s*\(")
+_DEBUGGER = re.compile(r"(?<![\w.])debugger\s*;?\s*$")
+# A plain string literal (no ${…} interpolation) is not untrusted data
+_STRING_LITERAL = re.compile(r"""^\s*(?:'[^'\\]*'|"[^"\\]*"|`[^`$\\]*`)\s*[;)]*\s*$""")
+
+_LABELLED_BY = ("aria-label", "aria-labelledby", "title")
+_UNLABELLED_INPUT_TYPES = ("hidden", "submit", "button", "reset", "image")
+
+
+@dataclass
+class Finding:
+    rule: str
+    gate: str
+    severity: str                # CRITICAL | HIGH | MEDIUM | LOW
+    file: str
+    line: int
+    title: str
+    description: str
+    auto_fixable: bool = False
+    suggested_fix: str = ""
+    id: str = ""
+
+    @property
+    def blocking(self) -> bool:
+        return self.severity in BLOCKING_SEVERITIES
+
+    @property
+    def heuristic(self) -> bool:
+        return self.rule in HEURISTIC_RULES
+
+
+@dataclass
+class StaticReport:
+    gate: str
+    product_id: str
+    findings: list[Finding] = field(default_factory=list)
+    files_scanned: int = 0
+
+    @property
+    def blocking(self) -> bool:
+        return any(f.blocking for f in self.findings)
+
+    @property
+    def conclusive(self) -> bool:
+        """RED from definitive findings only: may stand in for the LLM gate's report."""
+        return self.blocking and not any(f.blocking and f.heuristic for f in self.findings)
+
+    @property
+    def decision(self) -> str:
+        if self.blocking:
+            return "RED"
+        return "YELLOW" if any(f.severity == "MEDIUM" for f in self.findings) else "GREEN"
+
+    def to_dict(self) -> dict[str, Any]:
+        severities = [f.severity for f in self.findings]
+        status = {"RED": "FAIL", "YELLOW": "WARNING", "GREEN": "PASS"}[self.decision]
+        violations = []
+        for f in self.findings:
+            entry = asdict(f)
+            entry = {"id": entry.pop("id"), **entry, "location": f"{f.file}:{f.line}",
+                     "category": f.gate, "source": "static_precheck"}
+            violations.append(entry)
+        return {"gate_report": {
+            "scan_id": f"static-{self.gate}",
+            "gate": self.gate,
+            "product": self.product_id,
+            "scanned_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "source": "static_precheck",
+            "files_scanned": self.files_scanned,
+            "overall_status": status,
+            "summary": {
+                "blocking_violations": sum(s == "CRITICAL" for s in severities),
+                "high_violations": sum(s == "HIGH" for s in severities),
+                "medium_warnings": sum(s == "MEDIUM" for s in severities),
+                "low_notices": sum(s == "LOW" for s in severities),
+            },
+            "violations": violations,
+            "gate_decision": self.decision,
+            "deployment_allowed": not self.blocking,
+        }}
+
+    def to_yaml(self) -> str:
+        return yaml.safe_dump(self.to_dict(), sort_keys=False, allow_unicode=True, width=120)
+
+    def as_context(self) -> str:
+        """Extra context for the LLM gate that still runs after the pre-check."""
+        if not self.findings:
+            return (f"## STATIC PRE-CHECK ({self.gate})\n\n"
+                    f"Deterministic checks found no issues in {self.files_scanned} file(s). "
+                    "Focus on what static analysis cannot detect.\n\n")
+        definitive = [f for f in self.findings if not f.heuristic]
+        heuristic = [f for f in self.findings if f.heuristic]
+        text = f"## STATIC PRE-CHECK ({self.gate}: {self.decision})\n\n"
+        if definitive:
+            text += ("These findings were detected deterministically. Copy them into your "
+                     "report's violations unchanged (same id, severity, file, line) and do not "
+                     "re-derive them; spend your review on what static analysis cannot detect:\n\n"
+                     f"{_listing(definitive)}\n\n")
+        if heuristic:
+            text += ("These findings come from pattern heuristics and may be false positives "
+                     "(escaped data, headers set in framework config). Check each against the "
+                     "code and report it, with the same id, only if it is real:\n\n"
+                     f"{_listing(heuristic)}\n\n")
+        return text
+
+
+def _listing(findings: list[Finding]) -> str:
+    return "\n".join(f"- {f.id} [{f.severity}] {f.file}:{f.line} — {f.title}" for f in findings)
+
+
+# ── HTML scan ──────────────────────────────────────────────────────────────
+
+class _HtmlScan(HTMLParser):
+    """Collects security and a11y findings of one HTML file."""
+
+    def __init__(self, rel: str):
+        super().__init__(convert_charrefs=True)
+        self.rel = rel
+        self.findings: list[Finding] = []
+        self.label_for: set[str] = set()
+        self.fields: list[tuple[str, str, int]] = []      # (tag, id, line) needing a label
+        self._label_depth = 0
+        self._button: Optional[dict[str, Any]] = None
+        self.has_csp_meta = False
+
+    def _add(self, *args: Any, **kwargs: Any) -> None:
+        self.findings.append(Finding(*args, file=self.rel, **kwargs))
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        line = self.getpos()[0]
+        a = {k.lower(): (v or "") for k, v in attrs}
+        for name, value in a.items():
+            if name.startswith("on"):
+                self._add("inline_event_handler", "security", "HIGH", line=line,
+                          title=f"Inline event handler {name}= on <{tag}>",
+                          description="Blocked by the mandatory CSP (script-src 'self'); "
+                                      "governance/security-policy.md",
+                          suggested_fix="Move the handler into JS with addEventListener")
+            elif name in ("href", "src", "action") and value.strip().lower().startswith("javascript:"):
+                self._add("javascript_url", "security", "MEDIUM", line=line,
+                          title=f"javascript: URL in {name}= on <{tag}>",
+                          description="Executes inline script; blocked by the CSP",
+                          suggested_fix="Use a button with an event listener")
+
+        if tag == "html" and not a.get("lang"):
+            self._add("html_lang_missing", "a11y", "HIGH", line=line,
+                      title="<html> without lang attribute", description="WCAG 3.1.1 Language of Page",
+                      auto_fixable=True, suggested_fix='Add lang="de" to <html>')
+        elif tag == "img" and "alt" not in a:
+            self._add("img_alt_missing", "a11y", "HIGH", line=line,
+                      title=f"<img src=\"{a.get('src', '')}\"> without alt",
+                      description="WCAG 1.1.1 Non-text Content",
+                      auto_fixable=True,
+                      suggested_fix='Add a descriptive alt, or alt="" role="presentation" if decorative')
+            if self._button is not None:
+                self._button["named"] = True
+        elif tag == "img" and self._button is not None and a.get("alt", "").strip():
+            self._button["named"] = True
+        elif tag == "meta" and a.get("http-equiv", "").lower() == "content-security-policy":
+            self.has_csp_meta = True
+        elif tag == "label":
+            self._label_depth += 1
+            if a.get("for"):
+                self.label_for.add(a["for"])
+        elif tag in ("input", "select", "textarea"):
+            field_type = a.get("type", "text").lower()
+            if tag == "input" and field_type in _UNLABELLED_INPUT_TYPES:
+                return
+            if self._label_depth or any(a.get(k, "").strip() for k in _LABELLED_BY):
+                return
+            self.fields.append((tag, a.get("id", ""), line))
+        elif tag == "button":
+            named = any(a.get(k, "").strip() for k in _LABELLED_BY)
+            self._button = {"line": line, "named": named}
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "label" and self._label_depth:
+            self._label_depth -= 1
+        elif tag == "button" and self._button is not None:
+            if not self._button["named"]:
+                self._add("button_name_missing", "a11y", "HIGH", line=self._button["line"],
+                          title="<button> without accessible name",
+                          description="WCAG 4.1.2 Name, Role, Value",
+                          suggested_fix="Add visible text or aria-label")
+            self._button = None
+
+    def handle_data(self, data: str) -> None:
+        if self._button is not None and data.strip():
+            self._button["named"] = True
+
+    def finish(self) -> list[Finding]:
+        self.close()
+        for tag, field_id, line in self.fields:
+            if not field_id or field_id not in self.label_for:
+                self._add("form_label_missing", "a11y", "HIGH", line=line,
+                          title=f"<{tag}{' id=' + field_id if field_id else ''}> without label",
+                          description="WCAG 1.3.1 / 3.3.2 Labels or Instructions",
+                          suggested_fix="Add <label for=…> or aria-label")
+        return self.findings
+
+
+# ── JS scan ────────────────────────────────────────────────────────────────
+
+def _scan_js(rel: str, text: str) -> list[Finding]:
+    findings: list[Finding] = []
+    in_block_comment = False
+    for line_no, line in enumerate(text.splitlines(), 1):
+        code = line
+        if in_block_comment:
+            end = code.find("*/")
+            if end < 0:
+                continue
+            code, in_block_comment = code[end + 2:], False
+        start = code.find("/*")
+        if start >= 0 and code.find("*/", start) < 0:
+            code, in_block_comment = code[:start], True
+        stripped = code.strip()
+        if stripped.startswith("//"):
+            continue
+
+        def add(*args: Any, **kwargs: Any) -> None:
+            findings.append(Finding(*args, file=rel, line=line_no, **kwargs))
+
+        sink = _HTML_SINK.search(code)
+        if sink and not _STRING_LITERAL.match(sink.group(2)):
+            add("unsafe_html_sink", "security", "HIGH",
+                title=f"{sink.group(1)} assigned from non-literal data",
+                description="XSS sink (OWASP A03); governance/security-policy.md requires DOM APIs",
+                suggested_fix="Use textContent / createElement instead of " + sink.group(1))
+        jsx_sink = _JSX_HTML_SINK.search(code)
+        if jsx_sink and not _STRING_LITERAL.match(jsx_sink.group(1)):
+            add("unsafe_html_sink", "security", "HIGH",
+                title="dangerouslySetInnerHTML with non-literal data",
+                description="XSS sink (OWASP A03); governance/security-policy.md requires DOM APIs",
+                suggested_fix="Render the data as JSX children, or sanitise it first")
+        adjacent = _ADJACENT_HTML.search(code)
+        if adjacent and not _STRING_LITERAL.match(adjacent.group(1)):
+            add("unsafe_html_sink", "security", "HIGH",
+                title="insertAdjacentHTML with non-literal data",
+                description="XSS sink (OWASP A03)",
+                suggested_fix="Build the nodes with createElement and insertAdjacentElement")
+        if _DOCUMENT_WRITE.search(code):
+            add("document_write", "security", "MEDIUM", title="document.write",
+                description="XSS sink and parser-blocking", suggested_fix="Use DOM APIs")
+        if _EVAL.search(code):
+            add("eval_usage", "security", "HIGH", title="eval / new Function",
+                description="Arbitrary code execution; forbidden by governance/code-standards.md",
+                suggested_fix="Parse data with JSON.parse or use a lookup table")
+        if _CONSOLE.search(code):
+            add("console_log", "quality", "LOW", title="console.log left in code",
+                description="governance/code-standards.md", auto_fixable=True,
+                suggested_fix="Remove the statement")
+        if _DEBUGGER.search(stripped):
+            add("debugger_statement", "quality", "MEDIUM", title="debugger statement",
+                description="Halts execution when devtools are open", auto_fixable=True,
+                suggested_fix="Remove the statement")
+    return findings
+
+
+# ── Runner ─────────────────────────────────────────────────────────────────
+
+class StaticGates:
+    """Scans a product's app directory for the findings of one gate."""
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        on_red: str = "narrow",
+        budgets_kb: Optional[dict[str, dict[str, int]]] = None,
+    ):
+        self.config = config
+        self.on_red = on_red
+        self.budgets_kb = {**DEFAULT_BUDGETS_KB, **(budgets_kb or {})}
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> Optional["StaticGates"]:
+        """Build from pipeline.yaml `static_gates`; None if disabled."""
+        settings = config.static_gates()
+        if not settings.get("enabled", False):
+            return None
+        return cls(config, on_red=settings.get("on_red", "narrow"),
+                   budgets_kb=settings.get("budgets_kb"))
+
+    def app_dir(self, product_id: str) -> Path:
+        return self.config.base_dir / "products" / product_id / "app"
+
+    def report_path(self, gate: str, product_id: str) -> Path:
+        timestamp = self.config.view(product_id).variables["timestamp"]
+        return (self.config.base_dir / "products" / product_id / "state" / "gate-reports"
+                / f"static-{gate}-{timestamp}.yaml")
+
+    def run(self, gate: str, product_id: str) -> StaticReport:
+        if gate not in GATES:
+            raise ValueError(f"Unknown static_precheck gate {gate!r} (expected one of {GATES})")
+        report = StaticReport(gate, product_id)
+        app = self.app_dir(product_id)
+        base = self.config.base_dir
+        files = sorted(
+            p for p in app.rglob("*")
+            if p.is_file() and not any(part in _SKIP_DIRS for part in p.relative_to(app).parts)
+        ) if app.is_dir() else []
+        report.files_scanned = len(files)
+
+        findings: list[Finding] = []
+        has_csp_meta = False
+        for path in files:
+            rel = str(path.relative_to(base))
+            suffix = path.suffix.lower()
+            if (suffix == ".html" or suffix in _SCRIPT_SUFFIXES) and gate in ("security", "a11y", "quality"):
+                text = self.config.store.get(path) or ""
+                if suffix == ".html":
+                    scan = _HtmlScan(rel)
+                    scan.feed(text)
+                    findings.extend(scan.finish())
+                    has_csp_meta = has_csp_meta or scan.has_csp_meta
+                else:
+                    findings.extend(_scan_js(rel, text))
+        if gate == "security":
+            findings.extend(self._check_csp(app, has_csp_meta))
+        elif gate == "performance":
+            findings.extend(self._check_budgets(app, files))
+
+        report.findings = [f for f in findings if f.gate == gate]
+        for i, finding in enumerate(report.findings, 1):
+            finding.id = f"{_ID_PREFIX[gate]}-S{i:03d}"
+        return report
+
+    def _check_csp(self, app: Path, has_csp_meta: bool) -> list[Finding]:
+        vercel = app / "vercel.json"
+        text = self.config.store.get(vercel)
+        if text is None:
+            return []          # written later by deploy-prep; the meta tag is checked there
+        if has_csp_meta or self._csp_in_code(app):
+            return []
+        rel = str(vercel.relative_to(self.config.base_dir))
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as exc:
+            return [Finding("vercel_json_invalid", "security", "HIGH", rel, exc.lineno,
+                            "vercel.json is not valid JSON", str(exc))]
+        headers = [
+            h.get("key", "").lower()
+            for rule in data.get("headers", []) if isinstance(rule, dict)
+            for h in rule.get("headers", []) if isinstance(h, dict)
+        ]
+        if "content-security-policy" in headers:
+            return []
+        return [Finding("csp_missing", "security", "HIGH", rel, 1,
+                        "No Content-Security-Policy in vercel.json, a <meta> tag, "
+                        "next.config.* or middleware",
+                        "Mandatory header (governance/security-policy.md, OWASP A05)",
+                        auto_fixable=True,
+                        suggested_fix="Add the CSP from governance/security-policy.md to headers")]
+
+    def _csp_in_code(self, app: Path) -> bool:
+        """A framework file sets the CSP header (Next.js headers() or middleware)."""
+        for name in _HEADER_SOURCES:
+            text = self.config.store.get(app / name)
+            if text and _CSP_HEADER.search(text):
+                return True
+        return False
+
+    def _check_budgets(self, app: Path, files: list[Path]) -> list[Finding]:
+        base = self.config.base_dir
+        findings: list[Finding] = []
+        totals = {"js_total": 0, "css_total": 0}
+        for path in files:
+            size = path.stat().st_size
+            suffix = path.suffix.lower()
+            rel = str(path.relative_to(base))
+            if (suffix in _SCRIPT_SUFFIXES and "/tests/" not in f"/{rel}"
+                    and path.name != "service-worker.js" and not _UNSHIPPED_SCRIPT.search(path.name)):
+                totals["js_total"] += size
+            elif suffix == ".css":
+                totals["css_total"] += size
+            elif suffix == ".html":
+                findings.extend(self._over_budget("html", size, rel))
+            elif suffix in _IMAGE_SUFFIXES:
+                findings.extend(self._over_budget("image", size, rel))
+        for key, size in totals.items():
+            findings.extend(self._over_budget(key, size, str(app.relative_to(base))))
+        return findings
+
+    def _over_budget(self, key: str, size: int, rel: str) -> list[Finding]:
+        limits = self.budgets_kb.get(key, {})
+        kb = size / 1024
+        for level, severity in (("blocking", "HIGH"), ("warning", "MEDIUM"), ("good", "LOW")):
+            if level in limits and kb > limits[level]:
+                label = key.replace("_", " ")
+                return [Finding(f"budget_{key}", "performance", severity, rel, 0,
+                                f"{label} {kb:.0f}KB over the {level} budget ({limits[level]}KB)",
+                                "governance/quality-gates.md performance budgets",
+                                suggested_fix="Split, minify or lazy-load")]
+        return []
@@ -0,0 +1,273 @@
+# orchestrator/tracing.py
+"""Structured per-call instrumentation: spans for queueing, context assembly,
+generation and file writes, exported per pipeline run.
+
+Spans nest through a context variable, so asyncio tasks started by the
+scheduler inherit their parent automatically. `product_id` and `agent_id` are
+inherited from the parent span too, which lets one Tracer be shared by
+parallel pipelines and still export one trace file per product run.
+
+Export formats:
+  chrome — Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev)
+  otlp   — OpenTelemetry OTLP/JSON (resourceSpans), for any OTel collector
+"""
+
+from __future__ import annotations
+
+import json
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from .aio import atomic_write
+from .config import PipelineConfig
+
+_INHERITED = ("product_id", "agent_id")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("orchestrator_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    attrs: dict[str, Any] = field(default_factory=dict)
+    span_id: str = ""
+    parent_id: Optional[str] = None
+    trace_id: str = ""
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """Returned by a disabled tracer; accepts and drops attributes."""
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects spans in memory until a run is exported."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        export_dir: Optional[str | Path] = None,
+        fmt: str = "chrome",
+    ):
+        self.enabled = enabled
+        self.export_dir = Path(export_dir) if export_dir else None
+        self.fmt = fmt
+        self._spans: list[Span] = []
+        # perf_counter for durations, anchored to wall-clock time for export
+        self._epoch_ns = time.time_ns() - time.perf_counter_ns()
+
+    @classmethod
+    def from_config(cls, config: PipelineConfig) -> "Tracer":
+        """Build from pipeline.yaml `tracing` (disabled tracer if absent)."""
+        settings = config.tracing()
+        export_dir = settings.get("dir")
+        return cls(
+            enabled=bool(settings.get("enabled", False)),
+            export_dir=config.base_dir / export_dir if export_dir else None,
+            fmt=settings.get("format", "chrome"),
+        )
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns()
+
+    # ── Recording ──────────────────────────────────────────────────────────
+
+    def _new(self, name: str, start_ns: int, attrs: dict[str, Any]) -> Span:
+        parent = _current.get()
+        if parent is not None:
+            for key in _INHERITED:
+                if key in parent.attrs:
+                    attrs.setdefault(key, parent.attrs[key])
+        span = Span(
+            name=name,
+            start_ns=start_ns,
+            attrs=attrs,
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        )
+        self._spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span | _NullSpan]:
+        """Time the enclosed block; nested spans become children."""
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = self._new(name, self.now(), attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.set(error=type(exc).__name__)
+            raise
+        finally:
+            span.end_ns = self.now()
+            _current.reset(token)
+
+    def record(self, name: str, start_ns: int, end_ns: Optional[int] = None, **attrs: Any) -> None:
+        """Add an already finished span (e.g. time-to-first-token) under the current span."""
+        if not self.enabled:
+            return
+        span = self._new(name, start_ns, attrs)
+        span.end_ns = end_ns if end_ns is not None else self.now()
+
+    # ── Per-run access ─────────────────────────────────────────────────────
+
+    def spans(self, product_id: Optional[str] = None) -> list[Span]:
+        return [
+            s for s in self._spans
+            if s.end_ns and (product_id is None or s.attrs.get("product_id") == product_id)
+        ]
+
+    def drain(self, product_id: str) -> list[Span]:
+        """Remove and return the finished spans of one product."""
+        taken = self.spans(product_id)
+        ids = {id(s) for s in taken}
+        self._spans = [s for s in self._spans if id(s) not in ids]
+        return taken
+
+    def export_run(self, product_id: str) -> Optional[Path]:
+        """Write the product's spans to export_dir and forget them."""
+        spans = self.drain(product_id)
+        if not self.enabled or self.export_dir is None or not spans:
+            return None
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        path = self.export_dir / f"{product_id}-{stamp}.{self.fmt}.json"
+        return self.export(spans, path)
+
+    def export(self, spans: list[Span], path: Path) -> Path:
+        payload = self.to_otlp(spans) if self.fmt == "otlp" else self.to_chrome(spans)
+        atomic_write(path, json.dumps(payload))
+        return path
+
+    # ── Formats ────────────────────────────────────────────────────────────
+
+    def to_chrome(self, spans: list[Span]) -> dict[str, Any]:
+        """Complete ("X") events; one process per product, one thread per agent."""
+        pids: dict[str, int] = {}
+        tids: dict[tuple[int, str], int] = {}
+        events: list[dict[str, Any]] = []
+        for span in sorted(spans, key=lambda s: s.start_ns):
+            product = str(span.attrs.get("product_id", "-"))
+            track = str(span.attrs.get("agent_id", "pipeline"))
+            if product not in pids:
+                pids[product] = len(pids) + 1
+                events.append({"ph": "M", "name": "process_name", "pid": pids[product],
+                               "args": {"name": product}})
+            pid = pids[product]
+            if (pid, track) not in tids:
+                tids[(pid, track)] = len(tids) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": pid,
+                               "tid": tids[(pid, track)], "args": {"name": track}})
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ph": "X",
+                "ts": (span.start_ns + self._epoch_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": tids[(pid, track)],
+                "args": span.attrs,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_otlp(self, spans: list[Span]) -> dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attr("service.name", "ai-first-orchestrator")]},
+            "scopeSpans": [{
+                "scope": {"name": "orchestrator"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(span.start_ns + self._epoch_ns),
+                        "endTimeUnixNano": str(span.end_ns + self._epoch_ns),
+                        "attributes": [_otlp_attr(k, v) for k, v in span.attrs.items()],
+                        "status": {"code": 2 if "error" in span.attrs else 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]}
+
+    # ── Summary ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def summary(spans: list[Span]) -> dict[str, dict[str, float]]:
+        """Per-agent totals: where did the wall time go?"""
+        out: dict[str, dict[str, float]] = {}
+        for span in spans:
+            agent_id = span.attrs.get("agent_id")
+            if not agent_id:
+                continue
+            row = out.setdefault(agent_id, {
+                "total_s": 0.0, "semaphore_wait_s": 0.0, "rate_limit_wait_s": 0.0,
+                "backoff_s": 0.0, "context_build_s": 0.0, "generation_s": 0.0,
+                "file_write_s": 0.0, "ttft_s": 0.0, "output_tokens": 0,
+                "input_tokens": 0, "thinking_tokens": 0,
+            })
+            name = span.name
+            if name == "agent.run":
+                row["total_s"] += span.duration
+            elif name == "queue.semaphore":
+                row["semaphore_wait_s"] += span.duration
+            elif name == "queue.rate_limiter":
+                row["rate_limit_wait_s"] += span.duration
+            elif name == "api.backoff":
+                row["backoff_s"] += span.duration
+            elif name == "context.build":
+                row["context_build_s"] += span.duration
+            elif name == "files.write":
+                row["file_write_s"] += span.duration
+            elif name == "api.stream":
+                row["generation_s"] += span.duration
+                row["output_tokens"] += span.attrs.get("output_tokens", 0)
+                row["input_tokens"] += span.attrs.get("input_tokens", 0)
+                row["thinking_tokens"] += span.attrs.get("thinking_tokens", 0)
+                row["ttft_s"] = max(row["ttft_s"], span.attrs.get("ttft_s", 0.0))
+        for row in out.values():
+            row["tokens_per_s"] = (
+                round(row["output_tokens"] / row["generation_s"], 1) if row["generation_s"] else 0.0
+            )
+            for key, value in row.items():
+                if isinstance(value, float):
+                    row[key] = round(value, 3)
+        return out
+
+
+def _otlp_attr(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
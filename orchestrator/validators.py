@@ -0,0 +1,362 @@
+# orchestrator/validators.py
+"""Outcome validation: a validator registry run over every output file.
+
+Each output file is read once (through the context store) into an Artifact
+that all validators share; YAML is parsed at most once per artifact, and the
+agent's parsed_data comes from the same parse. Validators are registered per
+`output_format` ("*" = every format) and only see files with their suffixes:
+
+  min_size         outcome_validation.min_file_size_bytes   all files
+  yaml_syntax      —                                         .yaml/.yml
+  json_syntax      —                                         .json
+  required_keys    outcome_validation.required_keys          first YAML output; or
+                                                             {glob: [keys]} per file
+  required_content outcome_validation.required_content       .html
+  html_structure   —                                         .html
+  js_syntax        — (needs `node` on PATH, skipped without) .js
+
+The (validator, file) checks run concurrently in a shared thread pool, and
+their results are cached by file path + digest + the settings the validator
+reads (messages name the file), so re-validating unchanged files (retries,
+re-runs, resumed runs) is free.
+
+Adding a check:
+
+    @registry.register("javascript", "mixed")
+    class NoConsoleLog(Validator):
+        name = "no_console_log"
+        suffixes = (".js",)
+        def check(self, artifact, settings): ...
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import shutil
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import yaml
+
+from .config import PipelineConfig, load_yaml
+
+# Thread pool shared by all OutcomeValidators of the process
+_MAX_WORKERS = 8
+_JS_CHECK_TIMEOUT = 20
+# Cached check results per OutcomeValidator (least recently used dropped first)
+_MAX_CACHED_RESULTS = 4096
+
+
+class Artifact:
+    """One output file, read once; YAML parsed lazily and at most once."""
+
+    def __init__(self, rel: str, text: Optional[str], digest: Optional[str]):
+        self.rel = rel
+        self.text = text
+        self.digest = digest
+        self.suffix = Path(rel).suffix.lower()
+        self._lock = threading.Lock()
+        self._parsed = False
+        self._data: Any = None
+        self._error = ""
+
+    @property
+    def exists(self) -> bool:
+        return self.text is not None
+
+    @property
+    def size(self) -> int:
+        return len(self.text.encode("utf-8")) if self.text is not None else 0
+
+    def yaml(self) -> tuple[Any, str]:
+        """(data, parse error)."""
+        with self._lock:
+            if not self._parsed:
+                try:
+                    self._data = load_yaml(self.text or "")
+                except yaml.YAMLError as exc:
+                    self._error = str(exc)
+                self._parsed = True
+            return self._data, self._error
+
+
+class Validator(ABC):
+    """Base class: one check of one artifact, given the agent's outcome_validation."""
+
+    name = ""
+    suffixes: tuple[str, ...] = ()     # () → every file
+    settings: tuple[str, ...] = ()     # outcome_validation keys read; all unset → skipped
+
+    def enabled(self, settings: dict[str, Any]) -> bool:
+        return not self.settings or any(settings.get(key) for key in self.settings)
+
+    def select(self, artifacts: list[Artifact], settings: dict[str, Any]) -> list[Artifact]:
+        return [a for a in artifacts if a.exists and (not self.suffixes or a.suffix in self.suffixes)]
+
+    @abstractmethod
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        """Failure message, or None if the artifact passes."""
+
+
+class ValidatorRegistry:
+    def __init__(self) -> None:
+        self._by_format: dict[str, list[Validator]] = {}
+
+    def register(self, *formats: str) -> Callable[[type[Validator]], type[Validator]]:
+        def decorator(cls: type[Validator]) -> type[Validator]:
+            validator = cls()
+            for fmt in formats or ("*",):
+                self._by_format.setdefault(fmt, []).append(validator)
+            return cls
+        return decorator
+
+    def for_format(self, output_format: str) -> list[Validator]:
+        return self._by_format.get("*", []) + self._by_format.get(output_format, [])
+
+
+registry = ValidatorRegistry()
+
+
+# ── Runner ─────────────────────────────────────────────────────────────────
+
+class OutcomeValidator:
+    """Runs the registered validators for an agent over all of its output files."""
+
+    _pool: Optional[ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, config: PipelineConfig, validators: ValidatorRegistry = registry):
+        self.config = config
+        self.validators = validators
+        self._results: OrderedDict[tuple[str, str, Optional[str], str], Optional[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def _executor(cls) -> ThreadPoolExecutor:
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=_MAX_WORKERS,
+                                               thread_name_prefix="validate")
+            return cls._pool
+
+    def load(self, output_files: list[str]) -> list[Artifact]:
+        store, base = self.config.store, self.config.base_dir
+        return [Artifact(rel, store.get(base / rel), store.digest(base / rel)) for rel in output_files]
+
+    def validate(self, artifacts: list[Artifact], agent_cfg: dict[str, Any]) -> Optional[str]:
+        """First failure in (output file, validator) order, or None."""
+        settings: dict[str, Any] = agent_cfg.get("outcome_validation", {})
+        jobs: list[tuple[Validator, Artifact]] = []
+        for validator in self.validators.for_format(agent_cfg.get("output_format", "text")):
+            if validator.enabled(settings):
+                jobs.extend((validator, a) for a in validator.select(artifacts, settings))
+        if not jobs:
+            return None
+        order = {a.rel: i for i, a in enumerate(artifacts)}
+        jobs.sort(key=lambda job: order[job[1].rel])
+        if len(jobs) == 1:
+            results = [self._check(*jobs[0], settings)]
+        else:
+            results = list(self._executor().map(lambda job: self._check(*job, settings), jobs))
+        return next((r for r in results if r), None)
+
+    def _check(self, validator: Validator, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        params = json.dumps({k: settings.get(k) for k in validator.settings}, sort_keys=True, default=str)
+        key = (validator.name, artifact.rel, artifact.digest, params)
+        with self._lock:
+            self.checks += 1
+            if key in self._results:
+                self.cache_hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+        result = validator.check(artifact, settings)
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > _MAX_CACHED_RESULTS:
+                self._results.popitem(last=False)
+        return result
+
+
+# ── Built-in validators ────────────────────────────────────────────────────
+
+@registry.register("*")
+class MinSize(Validator):
+    name = "min_size"
+    settings = ("min_file_size_bytes",)
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        min_size = int(settings["min_file_size_bytes"])
+        if artifact.size < min_size:
+            return f"Output file {artifact.rel} too small ({artifact.size} < {min_size} bytes)"
+        return None
+
+
+@registry.register("*")
+class YamlSyntax(Validator):
+    name = "yaml_syntax"
+    suffixes = (".yaml", ".yml")
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        _, error = artifact.yaml()
+        return f"YAML parse error in {artifact.rel}: {error}" if error else None
+
+
+@registry.register("*")
+class JsonSyntax(Validator):
+    name = "json_syntax"
+    suffixes = (".json",)
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        try:
+            json.loads(artifact.text or "")
+        except json.JSONDecodeError as exc:
+            return f"JSON parse error in {artifact.rel}: {exc}"
+        return None
+
+
+@registry.register("*")
+class RequiredKeys(Validator):
+    """Dot-notation keys. A list applies to the first YAML output (the agent's
+    primary file); a mapping {glob: [keys]} applies per matching output."""
+
+    name = "required_keys"
+    suffixes = (".yaml", ".yml")
+    settings = ("required_keys",)
+
+    def select(self, artifacts: list[Artifact], settings: dict[str, Any]) -> list[Artifact]:
+        candidates = super().select(artifacts, settings)
+        required = settings["required_keys"]
+        if isinstance(required, dict):
+            return [a for a in candidates if any(fnmatch.fnmatch(a.rel, p) for p in required)]
+        return candidates[:1]
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        required = settings["required_keys"]
+        if isinstance(required, dict):
+            keys = [k for pattern, ks in required.items() if fnmatch.fnmatch(artifact.rel, pattern) for k in ks]
+        else:
+            keys = required
+        data, error = artifact.yaml()
+        if error:
+            return f"YAML parse error in {artifact.rel}: {error}"
+        missing = [k for k in keys if not _has_key(data or {}, k)]
+        return f"Required keys missing in {artifact.rel}: {missing}" if missing else None
+
+
+def _has_key(data: Any, dotted: str) -> bool:
+    node = data
+    for part in dotted.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return False
+        node = node[part]
+    return True
+
+
+@registry.register("html", "mixed", "patch")
+class RequiredContent(Validator):
+    name = "required_content"
+    suffixes = (".html",)
+    settings = ("required_content",)
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        missing = [s for s in settings["required_content"] if s not in artifact.text]
+        return f"Required content missing in {artifact.rel}: {missing}" if missing else None
+
+
+# Elements without an end tag, and elements whose end tag may be omitted
+_VOID_ELEMENTS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+_OPTIONAL_END = frozenset(
+    "html head body p li dt dd option optgroup thead tbody tfoot tr td th colgroup rb rt rtc rp".split()
+)
+
+
+class _TagBalance(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.stack: list[tuple[str, int]] = []
+        self.errors: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag not in _VOID_ELEMENTS:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        pass
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _VOID_ELEMENTS:
+            return
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                unclosed = [t for t in self.stack[i + 1:] if t[0] not in _OPTIONAL_END]
+                if unclosed:
+                    name, line = unclosed[-1]
+                    self.errors.append(f"<{name}> from line {line} closed by </{tag}> "
+                                       f"on line {self.getpos()[0]}")
+                del self.stack[i:]
+                return
+        if tag not in _OPTIONAL_END:
+            self.errors.append(f"stray </{tag}> on line {self.getpos()[0]}")
+
+
+@registry.register("html", "mixed", "patch")
+class HtmlStructure(Validator):
+    """Tag balance: no stray end tags, no unclosed elements (optional end tags allowed)."""
+
+    name = "html_structure"
+    suffixes = (".html",)
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        parser = _TagBalance()
+        parser.feed(artifact.text)
+        parser.close()
+        errors = parser.errors + [
+            f"<{name}> from line {line} never closed"
+            for name, line in parser.stack if name not in _OPTIONAL_END
+        ]
+        if errors:
+            more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ""
+            return f"Malformed HTML in {artifact.rel}: {'; '.join(errors[:3])}{more}"
+        return None
+
+
+@registry.register("javascript", "mixed", "patch")
+class JsSyntax(Validator):
+    """`node --check`, as an ES module first, then as a classic script."""
+
+    name = "js_syntax"
+    suffixes = (".js", ".mjs")
+    _node = shutil.which("node")
+
+    def enabled(self, settings: dict[str, Any]) -> bool:
+        return self._node is not None
+
+    def check(self, artifact: Artifact, settings: dict[str, Any]) -> Optional[str]:
+        error = ""
+        for input_type in ("module", "commonjs"):
+            try:
+                proc = subprocess.run(
+                    [self._node, "--check", f"--input-type={input_type}"],
+                    input=artifact.text, capture_output=True, text=True, timeout=_JS_CHECK_TIMEOUT,
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                return None
+            if proc.returncode == 0:
+                return None
+            if not error:
+                lines = proc.stderr.splitlines()
+                where = lines[0].replace("[stdin]:", "line ") if lines else ""
+                message = next((line for line in lines if "Error" in line), proc.stderr.strip()[:200])
+                error = f"{message} ({where})" if where.startswith("line ") else message
+        return f"JavaScript syntax error in {artifact.rel}: {error}"
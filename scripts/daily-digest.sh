@@ -71,20 +71,21 @@ get_pending_decisions() {
 }
 
 get_pipeline_status() {
-  local pfile="$STATE_DIR/pipeline-state.json"
-  if [[ -f "$pfile" ]] && command -v python3 &>/dev/null; then
-    python3 - "$pfile" "$1" <<'EOF'
-import json, sys
+  local pdb="$STATE_DIR/pipeline-state.db"
+  if [[ -f "$pdb" ]] && command -v python3 &>/dev/null; then
+    python3 - "$pdb" "$1" <<'EOF'
+import sqlite3, sys
 try:
-    with open(sys.argv[1]) as f:
-        state = json.load(f)
-    product = sys.argv[2]
-    if product in state and state[product].get("runs"):
-        last_run = state[product]["runs"][-1]
-        stages = last_run.get("stages", {})
-        passed = sum(1 for s in stages.values() if s["status"] == "passed")
-        total = len(stages)
-        print(f"{passed}/{total} stages passed ({last_run['status']})")
+    db = sqlite3.connect(f"file:{sys.argv[1]}?mode=ro", uri=True)
+    run = db.execute(
+        "SELECT run_id, status FROM runs WHERE product_id = ? ORDER BY seq DESC LIMIT 1",
+        (sys.argv[2],),
+    ).fetchone()
+    if run:
+        passed, total = db.execute(
+            "SELECT SUM(status = 'passed'), COUNT(*) FROM stages WHERE run_id = ?", (run[0],)
+        ).fetchone()
+        print(f"{passed or 0}/{total} stages passed ({run[1]})")
     else:
         print("No pipeline runs")
 except Exception:
@@ -7,24 +7,31 @@ Zweck:
   Erlaubt das Fortsetzen unterbrochener Pipelines.
   Trackt welche Stages abgeschlossen sind.
 
+  State liegt in state/pipeline-state.db (SQLite, WAL — geteilt mit dem
+  Orchestrator). Eine alte state/pipeline-state.json wird beim ersten
+  Aufruf einmalig importiert.
+
 Usage:
   python3 scripts/resume-pipeline.py --product <id>
   python3 scripts/resume-pipeline.py --product <id> --resume
   python3 scripts/resume-pipeline.py --product <id> --reset
   python3 scripts/resume-pipeline.py --list
+  python3 scripts/resume-pipeline.py --profile-startup
 """
 
 import argparse
-import json
-import os
 import sys
-from datetime import datetime
 from pathlib import Path
 
 # ─── CONFIG ────────────────────────────────────────────────
 ROOT_DIR = Path(__file__).parent.parent
 STATE_DIR = ROOT_DIR / "state"
-PIPELINE_STATE_FILE = STATE_DIR / "pipeline-state.json"
+PIPELINE_STATE_FILE = STATE_DIR / "pipeline-state.json"   # legacy, migriert
+PIPELINE_STATE_DB = STATE_DIR / "pipeline-state.db"
+
+sys.path.insert(0, str(ROOT_DIR))
+from orchestrator import startup  # noqa: E402
+from orchestrator.state_store import PipelineStateStore, changed_outputs  # noqa: E402
 
 STAGES = ["validate", "spec", "personas", "security", "a11y", "quality", "build"]
 
@@ -81,118 +88,75 @@ def cprint(color: str, msg: str) -> None:
 
 # ─── STATE MANAGEMENT ──────────────────────────────────────
 
-def load_state() -> dict:
-    """Loads pipeline state from JSON file."""
-    if not PIPELINE_STATE_FILE.exists():
-        return {}
-    with open(PIPELINE_STATE_FILE) as f:
-        return json.load(f)
+_store: PipelineStateStore | None = None
 
-def save_state(state: dict) -> None:
-    """Persists pipeline state to JSON file."""
-    STATE_DIR.mkdir(parents=True, exist_ok=True)
-    with open(PIPELINE_STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2, default=str)
+def get_store() -> PipelineStateStore:
+    """Opens the shared state DB (migrates pipeline-state.json on first use)."""
+    global _store
+    if _store is None:
+        _store = PipelineStateStore(PIPELINE_STATE_DB, legacy_json=PIPELINE_STATE_FILE)
+    return _store
 
 def get_product_state(product_id: str) -> dict:
     """Returns state for a specific product, initializing if needed."""
-    state = load_state()
-    if product_id not in state:
-        state[product_id] = {
-            "product_id": product_id,
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-            "current_run": None,
-            "runs": [],
-        }
-        save_state(state)
-    return state[product_id]
+    store = get_store()
+    product = store.product(product_id)
+    if product is None:
+        store.ensure_product(product_id)
+        product = store.product(product_id)
+    return product
 
 def init_run(product_id: str) -> dict:
     """Initializes a new pipeline run."""
-    state = load_state()
-    run = {
-        "run_id": f"run_{int(datetime.now().timestamp())}",
-        "started_at": datetime.now().isoformat(),
-        "completed_at": None,
-        "status": "in_progress",
-        "stages": {stage: {"status": "pending", "started_at": None, "completed_at": None, "result": None}
-                   for stage in STAGES},
-    }
+    store = get_store()
+    return store.get_run(store.init_run(product_id, STAGES))
 
-    if product_id not in state:
-        state[product_id] = {
-            "product_id": product_id,
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-            "runs": [],
-        }
-
-    state[product_id]["current_run"] = run["run_id"]
-    state[product_id]["runs"].append(run)
-    state[product_id]["last_updated"] = datetime.now().isoformat()
-    save_state(state)
-    return run
-
-def update_stage(product_id: str, run_id: str, stage: str, status: str, result: str = None) -> None:
-    """Updates stage status in pipeline state."""
-    state = load_state()
-    product_state = state.get(product_id, {})
-    runs = product_state.get("runs", [])
-
-    for run in runs:
-        if run["run_id"] == run_id:
-            run["stages"][stage]["status"] = status
-            if status == "running":
-                run["stages"][stage]["started_at"] = datetime.now().isoformat()
-            elif status in ("passed", "failed", "skipped"):
-                run["stages"][stage]["completed_at"] = datetime.now().isoformat()
-                run["stages"][stage]["result"] = result
-            break
-
-    state[product_id]["last_updated"] = datetime.now().isoformat()
-    save_state(state)
+def update_stage(product_id: str, run_id: str, stage: str, status: str, result: str = None) -> bool:
+    """Updates stage status in pipeline state (one atomic row update)."""
+    return get_store().update_stage(run_id, stage, status, result)
 
 def get_resume_point(product_id: str) -> tuple[str | None, str | None]:
     """
     Returns (run_id, stage) where pipeline should resume.
     Returns (None, None) if no resumable run found.
     """
-    product_state = get_product_state(product_id)
-    current_run_id = product_state.get("current_run")
-    if not current_run_id:
-        return None, None
+    return get_store().resume_point(product_id)
 
-    for run in reversed(product_state.get("runs", [])):
-        if run["run_id"] == current_run_id and run["status"] == "in_progress":
-            for stage in STAGES:
-                if run["stages"][stage]["status"] in ("pending", "running"):
-                    return current_run_id, stage
-    return None, None
+def get_agent_resume_plan(run_id: str) -> tuple[list[str], list[str], dict[str, list[str]]]:
+    """
+    Agent-level view of an orchestrator run: (done, open, changed) where
+    changed maps checkpointed agents to output files modified since.
+    """
+    store = get_store()
+    checkpoints = store.checkpoints(run_id)
+    done, open_, changed = [], [], {}
+    for stage in store.get_run(run_id)["stages"]:
+        checkpoint = checkpoints.get(stage)
+        diff = changed_outputs(ROOT_DIR, checkpoint["outputs"]) if checkpoint else []
+        if checkpoint and not diff:
+            done.append(stage)
+        else:
+            open_.append(stage)
+            if diff:
+                changed[stage] = diff
+    return done, open_, changed
 
 # ─── DISPLAY FUNCTIONS ─────────────────────────────────────
 
 def print_pipeline_status(product_id: str) -> None:
     """Displays current pipeline state for a product."""
     product_state = get_product_state(product_id)
-    current_run_id = product_state.get("current_run")
 
     print()
     cprint(Colors.BOLD + Colors.CYAN, f"━━━ Pipeline Status: {product_id} ━━━")
     print()
 
-    if not product_state.get("runs"):
+    if not product_state.get("current_run"):
         cprint(Colors.YELLOW, "  Noch keine Pipeline-Runs für dieses Produkt.")
         print()
         return
 
-    # Find current run
-    current_run = None
-    for run in product_state["runs"]:
-        if run["run_id"] == current_run_id:
-            current_run = run
-            break
-
+    current_run = get_store().current_run(product_id)
     if not current_run:
         cprint(Colors.YELLOW, "  Kein aktiver Run.")
         return
@@ -213,11 +177,12 @@ def print_pipeline_status(product_id: str) -> None:
     print(f"  {'STAGE':<15} {'STATUS':<12} {'AGENT':<40} {'AUTONOMY'}")
     print(f"  {'─' * 80}")
 
-    for stage in STAGES:
-        stage_state = current_run["stages"][stage]
+    # Orchestrator-Runs haben eine Stage pro DAG-Knoten (Agent-ID)
+    for stage, stage_state in current_run["stages"].items():
         icon = status_icons.get(stage_state["status"], "❓")
-        agent = STAGE_DETAILS[stage].get("agent", "—") or "—"
-        autonomy = STAGE_DETAILS[stage]["autonomy"]
+        details = STAGE_DETAILS.get(stage, {"agent": stage, "autonomy": "—"})
+        agent = details.get("agent", "—") or "—"
+        autonomy = details["autonomy"]
         autonomy_color = {
             "FULL": Colors.GREEN,
             "BATCH": Colors.YELLOW,
@@ -240,23 +205,22 @@ def print_pipeline_status(product_id: str) -> None:
 
 def list_all_products() -> None:
     """Lists all products with their pipeline states."""
-    state = load_state()
-    if not state:
+    products = get_store().list_products()
+    if not products:
         cprint(Colors.YELLOW, "Keine Pipeline-States gefunden.")
         return
 
     print()
     cprint(Colors.BOLD + Colors.CYAN, "━━━ Alle Pipeline States ━━━")
     print()
-    print(f"  {'PRODUKT':<25} {'STATUS':<15} {'LETZTER RUN'}")
+    print(f"  {'PRODUKT':<25} {'STATUS':<15} {'LETZTER RUN':<18} {'RUNS'}")
     print(f"  {'─' * 70}")
 
-    for product_id, product_state in state.items():
-        runs = product_state.get("runs", [])
-        if runs:
-            last_run = runs[-1]
-            status = last_run["status"]
-            started = last_run["started_at"][:16] if last_run["started_at"] else "—"
+    for product in products:
+        product_id = product["product_id"]
+        if product["run_id"]:
+            status = product["status"]
+            started = product["started_at"][:16] if product["started_at"] else "—"
         else:
             status = "no runs"
             started = "—"
@@ -267,7 +231,7 @@ def list_all_products() -> None:
             "failed": Colors.RED,
         }.get(status, Colors.BLUE)
 
-        print(f"  {product_id:<25} {status_color}{status:<15}{Colors.NC} {started}")
+        print(f"  {product_id:<25} {status_color}{status:<15}{Colors.NC} {started:<18} {product['run_count']}")
 
     print()
 
@@ -287,8 +251,13 @@ def main() -> None:
     parser.add_argument("--stage-pass", metavar="STAGE", help="Mark stage as passed")
     parser.add_argument("--stage-fail", metavar="STAGE", help="Mark stage as failed")
     parser.add_argument("--run-id", help="Run ID for stage updates")
+    startup.add_argument(parser)
     args = parser.parse_args()
 
+    if args.profile_startup:
+        startup.print_profile(__file__, ROOT_DIR)
+        return
+
     if args.list:
         list_all_products()
         return
@@ -306,10 +275,7 @@ def main() -> None:
         sys.exit(1)
 
     if args.reset:
-        state = load_state()
-        if product_id in state:
-            del state[product_id]
-            save_state(state)
+        if get_store().reset_product(product_id):
             cprint(Colors.GREEN, f"[OK] Pipeline-State für '{product_id}' zurückgesetzt.")
         else:
             cprint(Colors.YELLOW, f"[INFO] Kein State für '{product_id}' gefunden.")
@@ -322,12 +288,16 @@ def main() -> None:
         return
 
     if args.stage_pass and args.run_id:
-        update_stage(product_id, args.run_id, args.stage_pass, "passed")
+        if not update_stage(product_id, args.run_id, args.stage_pass, "passed"):
+            cprint(Colors.RED, f"[ERROR] Stage '{args.stage_pass}' in Run '{args.run_id}' nicht gefunden.")
+            sys.exit(1)
         cprint(Colors.GREEN, f"[OK] Stage '{args.stage_pass}' als PASSED markiert.")
         return
 
     if args.stage_fail and args.run_id:
-        update_stage(product_id, args.run_id, args.stage_fail, "failed")
+        if not update_stage(product_id, args.run_id, args.stage_fail, "failed"):
+            cprint(Colors.RED, f"[ERROR] Stage '{args.stage_fail}' in Run '{args.run_id}' nicht gefunden.")
+            sys.exit(1)
         cprint(Colors.RED, f"[FAIL] Stage '{args.stage_fail}' als FAILED markiert.")
         return
 
@@ -336,9 +306,17 @@ def main() -> None:
         if not run_id:
             cprint(Colors.YELLOW, f"[INFO] Kein resumbarer Run für '{product_id}' gefunden.")
             cprint(Colors.BLUE,   f"[INFO] Starte neuen Run: ./scripts/run-pipeline.sh {product_id}")
-        else:
+        elif resume_stage in STAGE_DETAILS:
             cprint(Colors.CYAN, f"[RESUME] Setze fort bei Stage: {resume_stage}")
             cprint(Colors.BLUE, f"[CMD]    ./scripts/run-pipeline.sh {product_id} --stage {resume_stage}")
+        else:
+            # Orchestrator-Run: Checkpoints pro Agent, nur offene Agents laufen erneut
+            done, open_, changed = get_agent_resume_plan(run_id)
+            cprint(Colors.CYAN, f"[RESUME] {run_id}: {len(done)} Agents abgeschlossen, {len(open_)} offen")
+            for agent_id in open_:
+                note = f"  (Outputs geändert: {', '.join(changed[agent_id])})" if agent_id in changed else ""
+                print(f"    → {agent_id}{note}")
+            cprint(Colors.BLUE, "[INFO]   Orchestrator: DagScheduler.run(..., resume=True) setzt hier fort.")
         return
 
     # Default: show status
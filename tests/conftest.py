@@ -0,0 +1,131 @@
+# tests/conftest.py
+"""Shared fixtures: a repository copy with pipeline.yaml and a fake streaming client."""
+
+from __future__ import annotations
+
+import dataclasses
+import importlib.util
+import shutil
+import sys
+import types
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Optional
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+# ── Upstream modules not in this tree ──────────────────────────────────────
+# orchestrator/models.py and orchestrator/rate_limit.py ship with the full
+# pipeline, not with this package. Stand-ins with their upstream signatures
+# (AgentResult has exactly the baseline fields) let the suite import ClaudeAgent.
+
+@dataclasses.dataclass
+class AgentResult:
+    agent_id: str
+    product_id: str
+    success: bool
+    output_files: list[str] = dataclasses.field(default_factory=list)
+    raw_output: str = ""
+    parsed_data: Any = None
+    tokens_used: int = 0
+    duration_seconds: float = 0.0
+    attempt: int = 1
+    error: Optional[str] = None
+    failure_type: Optional[str] = None
+
+
+class PipelinePausedError(Exception):
+    pass
+
+
+class RateLimitHandler:
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], agent_id: str = "") -> Any:
+        return await fn()
+
+
+def _stand_in(name: str, **attrs: Any) -> None:
+    try:
+        found = importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        found = False
+    if not found:
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+
+_stand_in("orchestrator.models", AgentResult=AgentResult)
+_stand_in("orchestrator.rate_limit", RateLimitHandler=RateLimitHandler,
+          PipelinePausedError=PipelinePausedError)
+
+
+class FakeStream:
+    """Async context manager with the parts of MessageStream ClaudeAgent uses."""
+
+    def __init__(self, text: str, chunk: int = 64):
+        self.text = text
+        self.chunk = chunk
+        self.response = SimpleNamespace(headers={})
+        usage = SimpleNamespace(output_tokens=max(1, len(text) // 4), input_tokens=100,
+                                cache_read_input_tokens=0, cache_creation_input_tokens=0)
+        self._final = SimpleNamespace(usage=usage, stop_reason="end_turn",
+                                      content=[SimpleNamespace(type="text", text=text)])
+
+    async def __aenter__(self) -> "FakeStream":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> bool:
+        return False
+
+    @property
+    def text_stream(self) -> Any:
+        async def chunks() -> Any:
+            for i in range(0, len(self.text), self.chunk):
+                yield self.text[i:i + self.chunk]
+        return chunks()
+
+    async def get_final_message(self) -> Any:
+        return self._final
+
+
+class FakeClient:
+    """messages.stream(**kwargs) answered by responder(kwargs) → response text."""
+
+    def __init__(self, responder: Callable[[dict[str, Any]], str]):
+        self.responder = responder
+        self.calls: list[dict[str, Any]] = []
+        self.messages = SimpleNamespace(stream=self._stream)
+
+    def _stream(self, **kwargs: Any) -> FakeStream:
+        self.calls.append(kwargs)
+        return FakeStream(self.responder(kwargs))
+
+
+@pytest.fixture
+def base_dir(tmp_path: Path) -> Path:
+    """Empty workspace with the repository's pipeline.yaml."""
+    shutil.copy(REPO_ROOT / "pipeline.yaml", tmp_path / "pipeline.yaml")
+    return tmp_path
+
+
+@pytest.fixture
+def make_agent(base_dir: Path) -> Callable[..., Any]:
+    """ClaudeAgent on base_dir with a FakeClient, no rate limiter and no batching."""
+    from orchestrator.claude_agent import ClaudeAgent
+    from orchestrator.config import PipelineConfig
+
+    def make(responder: Callable[[dict[str, Any]], str], **kwargs: Any) -> Any:
+        agent = ClaudeAgent(PipelineConfig(base_dir=str(base_dir)), **kwargs)
+        agent.client = FakeClient(responder)
+        agent.limiter = None
+        agent.batch = None
+        return agent
+
+    return make
@@ -0,0 +1,57 @@
+# tests/test_checkpoint_resume.py
+"""A human checkpoint without an approval hook pauses the run; --resume continues it."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+PRODUCT = "p1"
+
+
+@pytest.fixture
+def scheduler(make_agent, monkeypatch):
+    """DagScheduler whose agents succeed without a model call; records what ran."""
+    from orchestrator.scheduler import DagScheduler
+
+    ran: list[str] = []
+
+    async def run_agent(self, agent, node, product_id, priority):
+        ran.append(node.node_id)
+        return SimpleNamespace(success=True, output_files=[], attempt=1, tokens_used=0,
+                               cache_read_tokens=0, duration_seconds=0.0,
+                               failure_type=None, error=None)
+
+    monkeypatch.setattr(DagScheduler, "_run_agent", run_agent)
+    sched = DagScheduler(make_agent(lambda kwargs: ""))
+    sched.ran = ran
+    return sched
+
+
+def test_pending_checkpoint_leaves_run_resumable(scheduler):
+    outcome = asyncio.run(scheduler.run(PRODUCT, tier="simple"))
+
+    assert outcome.pending_checkpoints
+    assert not outcome.blocked and not outcome.failed
+    run_id = scheduler.state.resumable_run(PRODUCT)
+    assert run_id == outcome.run_id
+    assert scheduler.state.current_run(PRODUCT)["status"] == "in_progress"
+
+
+def test_resume_after_approval_runs_the_dependents(scheduler):
+    first = asyncio.run(scheduler.run(PRODUCT, tier="simple"))
+    before = set(scheduler.ran)
+
+    async def approve(phase_cfg, phase_results):
+        return True
+
+    scheduler.on_checkpoint = approve
+    scheduler.ran.clear()
+    resumed = asyncio.run(scheduler.run(PRODUCT, tier="simple", resume=True))
+
+    assert resumed.run_id == first.run_id
+    assert resumed.success
+    assert scheduler.ran and not before & set(scheduler.ran)
+    assert scheduler.state.resumable_run(PRODUCT) is None
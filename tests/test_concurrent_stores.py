@@ -0,0 +1,41 @@
+# tests/test_concurrent_stores.py
+"""FingerprintStore and ResultCache are written from many I/O pool threads at once."""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_concurrent_fingerprint_records(base_dir):
+    from orchestrator.config import PipelineConfig
+    from orchestrator.fingerprints import FingerprintStore
+
+    store = FingerprintStore(PipelineConfig(base_dir=str(base_dir)))
+
+    def record(i: int) -> None:
+        store.record("p1", f"agent-{i}", {"pipeline.yaml": "0" * 64}, ["pipeline.yaml"])
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(record, range(200)))      # re-raises the first error
+
+    saved = json.loads((base_dir / "products/p1/state/fingerprints.json").read_text())
+    assert len(saved) == 200
+    assert not list((base_dir / "products/p1/state").glob("*.tmp*"))
+
+
+def test_concurrent_cache_puts(tmp_path):
+    from orchestrator.cache import ResultCache
+
+    cache = ResultCache(tmp_path / "cache")
+
+    def put(i: int) -> None:
+        cache.put("ab" + "0" * 62, f"response {i}", i)   # same key from every thread
+        cache.put(f"{i:064x}", f"response {i}", i)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(put, range(200)))
+
+    assert cache.stats()["writes"] == 400
+    assert cache.get("ab" + "0" * 62) is not None
+    assert cache.get(f"{7:064x}") == ("response 7", 7)
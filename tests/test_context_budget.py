@@ -0,0 +1,66 @@
+# tests/test_context_budget.py
+"""ContextBudget trims reference material only, never the agent's primary inputs."""
+
+from __future__ import annotations
+
+
+def _write(base_dir, rel, text):
+    path = base_dir / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_primary_inputs_stay_full_over_budget(base_dir):
+    from orchestrator.config import PipelineConfig
+    from orchestrator.context_budget import ContextBudget
+
+    html = "<!DOCTYPE html>\n" + "".join(f"<p id=\"p{i}\">paragraph {i}</p>\n" for i in range(400))
+    spec = "# Feature\n\n" + "requirement text " * 400
+    policy = "# Policy\n\n" + "".join(f"## Rule {i}\n\nbody {'x' * 200}\n" for i in range(30))
+    _write(base_dir, "products/p1/app/index.html", html)
+    _write(base_dir, "products/p1/specs/feature-a.md", spec)
+    _write(base_dir, "governance/security-policy.md", policy)
+
+    budget = ContextBudget(PipelineConfig(base_dir=str(base_dir)), budgets={"small": 500, "large": 500})
+    agent = {
+        "id": "gate",
+        "context_size": "small",
+        "context_files": [
+            "governance/security-policy.md",
+            "products/{product_id}/app/index.html",
+            "products/{product_id}/specs/feature-*.md",
+        ],
+    }
+    text, parts = budget.assemble(agent, "p1")
+    modes = {part.rel: part.mode for part in parts}
+
+    assert modes["products/p1/app/index.html"] == "full"
+    assert modes["products/p1/specs/feature-a.md"] == "full"
+    assert modes["governance/security-policy.md"] in ("outline", "omitted")
+    assert html in text and spec in text
+    # Listed order is kept in the prompt
+    assert text.index("governance/security-policy.md") < text.index("products/p1/app/index.html")
+
+
+def test_concurrent_outlines_of_one_file(base_dir):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from orchestrator.config import PipelineConfig
+    from orchestrator.context_budget import ContextBudget
+
+    config = PipelineConfig(base_dir=str(base_dir))
+    for i in range(20):
+        text = f"# Policy {i}\n\n" + "## Rule\n\nbody\n" * 50
+        # One instance per thread (no in-memory hit), all starting together
+        budgets = [ContextBudget(config, summary_dir="state/cache/cs") for _ in range(8)]
+        barrier = threading.Barrier(len(budgets))
+
+        def outline(budget):
+            barrier.wait()
+            return budget.outline(text, ".md")
+
+        with ThreadPoolExecutor(len(budgets)) as pool:
+            outlines = list(pool.map(outline, budgets))
+        assert len(set(outlines)) == 1
+    assert not list((base_dir / "state/cache/cs").rglob("*.tmp"))
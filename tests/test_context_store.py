@@ -0,0 +1,47 @@
+# tests/test_context_store.py
+"""ContextStore: mtime-checked hits and an LRU bounded by cached bytes."""
+
+from __future__ import annotations
+
+from orchestrator.context_store import ContextStore
+
+
+def test_cache_is_bounded_by_bytes(tmp_path):
+    store = ContextStore(max_bytes=250)
+    paths = []
+    for name in "abc":
+        path = tmp_path / f"{name}.md"
+        path.write_text(name * 100)
+        paths.append(path)
+
+    store.get(paths[0])
+    store.get(paths[1])
+    assert store.get(paths[0]) == "a" * 100          # a is now the most recently used
+    store.get(paths[2])                               # 300 bytes > 250: evicts b
+    stats = store.stats()
+    assert stats["cached_files"] == 2 and stats["cached_bytes"] == 200
+    assert stats["evictions"] == 1 and stats["hits"] == 1
+
+    store.get(paths[0])
+    store.get(paths[1])
+    assert store.stats()["disk_reads"] == 4           # a still cached, b read again
+
+    # Files larger than the whole cache are served but never cached
+    big = tmp_path / "big.md"
+    big.write_text("x" * 1000)
+    assert store.get(big) == "x" * 1000
+    assert store.stats()["cached_bytes"] <= 250
+
+
+def test_edits_and_invalidation_are_picked_up(tmp_path):
+    store = ContextStore()
+    path = tmp_path / "policy.md"
+    path.write_text("v1")
+    assert store.get(path) == "v1"
+
+    path.write_text("version 2")                      # different size → new entry
+    assert store.get(path) == "version 2"
+    store.invalidate(path)
+    assert store.stats()["cached_bytes"] == 0
+    path.unlink()
+    assert store.get(path) is None
@@ -0,0 +1,44 @@
+# tests/test_file_stream.py
+"""Streamed FILE blocks: batched parser feeds, per-file callbacks on time."""
+
+from __future__ import annotations
+
+import asyncio
+
+from orchestrator.file_stream import FileBlockParser
+
+LINES = "".join(f"line {i}: some generated content --- with dashes\n" for i in range(120))
+RESPONSE = (
+    "--- FILE: products/p1/a.md ---\n" + LINES + "--- END FILE ---\n"
+    "--- FILE: products/p1/b.md ---\n" + LINES + "--- END FILE ---\n"
+    "Summary: wrote both files.\n"
+)
+AGENT = {"id": "writer", "output_format": "markdown", "thinking_strategy": "disabled",
+         "output_files": ["products/{product_id}/a.md", "products/{product_id}/b.md"]}
+
+
+def test_feeds_are_batched_and_files_complete_on_time(make_agent, base_dir, monkeypatch):
+    fed: list[int] = []
+    feed = FileBlockParser.feed
+
+    def counting_feed(self, text):
+        fed.append(len(text))
+        feed(self, text)
+
+    monkeypatch.setattr(FileBlockParser, "feed", counting_feed)
+    completed: list[tuple[str, int]] = []
+    agent = make_agent(
+        lambda kwargs: RESPONSE,
+        on_file_complete=lambda product_id, agent_id, rel: completed.append((rel, sum(fed))),
+    )
+
+    result = asyncio.run(agent.run(AGENT, "p1"))
+    assert result.success
+    assert (base_dir / "products/p1/a.md").read_text() == LINES
+    assert sum(fed) == len(RESPONSE)
+    assert len(fed) < len(RESPONSE) // 64 // 4          # FakeStream sends 64-char chunks
+
+    # Each callback fires within a chunk of its END marker, not at the end of the stream
+    first_end = RESPONSE.index("--- END FILE ---\n") + len("--- END FILE ---\n")
+    assert [rel for rel, _ in completed] == ["products/p1/a.md", "products/p1/b.md"]
+    assert completed[0][1] < first_end + 64
@@ -0,0 +1,55 @@
+# tests/test_limiter.py
+"""TokenRateLimiter output reservations: running estimate, settled after the call."""
+
+from __future__ import annotations
+
+import asyncio
+
+from orchestrator.limiter import TokenRateLimiter
+
+MODEL = "claude-sonnet-4-5"
+TIER_1 = {"default": {"requests_per_minute": 50, "input_tokens_per_minute": 30000,
+                      "output_tokens_per_minute": 8000, "expected_output_tokens": 2000}}
+
+
+def test_large_max_tokens_do_not_serialise_calls():
+    limiter = TokenRateLimiter(TIER_1)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(limiter.acquire(MODEL, 1000, 16000) for _ in range(4))), timeout=2
+        )
+
+    reservations = asyncio.run(main())
+    assert [r.output_tokens for r in reservations] == [2000] * 4
+    assert limiter.waits == 0
+
+
+def test_release_settles_and_updates_the_estimate():
+    limiter = TokenRateLimiter(TIER_1)
+
+    async def main():
+        reservation = await limiter.acquire(MODEL, 1000, 16000)
+        await limiter.release(reservation, input_tokens=1000, output_tokens=7000)
+
+    asyncio.run(main())
+    budget = limiter._budget(MODEL)
+    # 2000 reserved, 7000 used: the overrun is charged to the bucket
+    assert budget.output_tokens.level < 8000 - 7000 + 1
+    assert budget.output_estimate == 0.8 * 2000 + 0.2 * 7000
+    assert limiter.stats()["models"][MODEL]["output_estimate"] == 3000
+
+
+def test_failed_call_refunds_the_whole_reservation():
+    limiter = TokenRateLimiter(TIER_1)
+
+    async def main():
+        reservation = await limiter.acquire(MODEL, 5000, 16000)
+        await limiter.release(reservation)
+
+    asyncio.run(main())
+    budget = limiter._budget(MODEL)
+    assert budget.requests.level == 50
+    assert budget.input_tokens.level == 30000
+    assert budget.output_tokens.level == 8000
+    assert budget.output_estimate == 2000           # no usage: the estimate is unchanged
@@ -0,0 +1,68 @@
+# tests/test_patcher.py
+"""PATCH blocks: unified-diff parsing and the full-file fallback."""
+
+from __future__ import annotations
+
+import asyncio
+
+from orchestrator.patcher import apply_hunks, parse_patches
+
+SCHEMA = """\
+-- users table
+CREATE TABLE users (id INTEGER);
+-- legacy
+CREATE TABLE old (id INTEGER);
+"""
+
+DIFF = """\
+--- PATCH: products/{product_id}/db/schema.sql ---
+--- a/products/p1/db/schema.sql
++++ b/products/p1/db/schema.sql
+@@ -1,4 +1,2 @@
+ -- users table
+ CREATE TABLE users (id INTEGER);
+--- legacy
+-CREATE TABLE old (id INTEGER);
+--- END PATCH ---
+"""
+
+
+def test_removed_sql_comment_is_part_of_the_hunk():
+    [patch] = parse_patches(DIFF, "p1")
+    assert patch.path == "products/p1/db/schema.sql" and not patch.error
+    [hunk] = patch.hunks
+    assert hunk.search == SCHEMA
+    assert hunk.replace == "-- users table\nCREATE TABLE users (id INTEGER);\n"
+
+    text, methods = apply_hunks(SCHEMA, patch.hunks)
+    assert text == "-- users table\nCREATE TABLE users (id INTEGER);\n"
+    assert methods == ["exact"]
+
+
+def test_headers_of_a_second_file_section_end_the_hunk():
+    body = DIFF.replace("--- END PATCH ---\n", "--- a/other\n+++ b/other\n@@ -1 +1 @@\n-x\n+y\n--- END PATCH ---\n")
+    [patch] = parse_patches(body, "p1")
+    assert [h.search for h in patch.hunks] == [SCHEMA, "x\n"]
+    assert patch.hunks[1].replace == "y\n"
+
+
+def test_regeneration_call_asks_for_full_files(make_agent, base_dir):
+    target = base_dir / "products/p1/app/index.html"
+    target.parent.mkdir(parents=True)
+    target.write_text("<html><body><p>hello</p></body></html>\n")
+    answers = [
+        "--- PATCH: products/p1/app/index.html ---\n<<<<<<< SEARCH\n<p>not in the file</p>\n"
+        "=======\n<p>hi</p>\n>>>>>>> REPLACE\n--- END PATCH ---\n",
+        "--- FILE: products/p1/app/index.html ---\n<html><body><p>hi</p></body></html>\n"
+        "--- END FILE ---\n",
+    ]
+    agent = make_agent(lambda kwargs: answers.pop(0))
+    cfg = {"id": "code-fixer", "output_format": "patch", "thinking_strategy": "disabled",
+           "output_files": ["products/{product_id}/app/index.html"]}
+
+    result = asyncio.run(agent.run(cfg, "p1"))
+    assert result.success and "<p>hi</p>" in target.read_text()
+    first, regen = (" ".join(b["text"] for b in call["system"]) for call in agent.client.calls)
+    assert "--- PATCH:" in first
+    assert "--- PATCH:" not in regen and "--- FILE: path/to/file ---" in regen
+    assert "products/p1/app/index.html" in regen
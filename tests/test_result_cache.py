@@ -0,0 +1,60 @@
+# tests/test_result_cache.py
+"""ResultCache through ClaudeAgent: only responses with a passing outcome are replayed."""
+
+from __future__ import annotations
+
+import asyncio
+
+AGENT = {
+    "id": "writer",
+    "output_files": ["products/p1/out.yaml"],
+    "output_format": "yaml",
+    "thinking_strategy": "disabled",
+    "outcome_validation": {"allow_empty": False, "min_file_size_bytes": 100},
+}
+VALID = "--- FILE: products/p1/out.yaml ---\n" + "".join(
+    f"key_{i}: a value long enough to pass the size check\n" for i in range(5)
+) + "--- END FILE ---\n"
+INVALID = "--- FILE: products/p1/out.yaml ---\nkey: [unclosed\n" + "#" * 120 + "\n--- END FILE ---\n"
+
+
+def _run(agent, **validation):
+    cfg = dict(AGENT, outcome_validation={**AGENT["outcome_validation"], **validation})
+    return asyncio.run(agent.run(cfg, "p1"))
+
+
+def test_failed_outcome_is_not_replayed(make_agent):
+    answers = [INVALID, VALID]
+    agent = make_agent(lambda kwargs: answers.pop(0))
+
+    first = _run(agent)
+    assert not first.success and first.failure_type == "outcome_invalid"
+
+    # Same request again: the invalid response must not come back from the cache
+    second = _run(agent)
+    assert second.success
+    assert len(agent.client.calls) == 2
+
+
+def test_successful_outcome_is_replayed_without_tokens(make_agent):
+    agent = make_agent(lambda kwargs: VALID)
+
+    first = _run(agent)
+    assert first.success and first.tokens_used > 0
+
+    replay = _run(agent)
+    assert replay.success
+    assert len(agent.client.calls) == 1
+    assert replay.tokens_used == 0
+    assert agent.cache.stats()["hits"] == 1
+
+
+def test_replay_that_fails_validation_is_dropped(make_agent):
+    agent = make_agent(lambda kwargs: VALID)
+    assert _run(agent).success
+
+    # Tighter validation: the cached response no longer passes and is dropped
+    replay = _run(agent, required_keys=["missing_key"])
+    assert not replay.success and len(agent.client.calls) == 1
+    again = _run(agent)
+    assert again.success and len(agent.client.calls) == 2
@@ -0,0 +1,33 @@
+# tests/test_routing.py
+"""ModelRouter: which agents run on the fast-model cascade."""
+
+from __future__ import annotations
+
+from orchestrator.routing import ModelRouter, RoutePolicy
+
+FAST, OWN = "claude-haiku-4-5", "claude-sonnet-4-5"
+
+
+def _router() -> ModelRouter:
+    return ModelRouter({
+        "template": RoutePolicy("template", [FAST]),
+        "gate": RoutePolicy("gate", [FAST], frozenset({"RED", "FAIL"})),
+    })
+
+
+def test_blocking_gate_is_not_routed():
+    router = _router()
+    gate = {"id": "a11y-gate", "routing": "gate", "blocking": True}
+    assert router.policy_for(gate) is None
+    assert router.models_for(gate, OWN, attempt=1) == [OWN]
+    # Agents default to blocking
+    assert router.policy_for({"id": "g", "routing": "gate"}) is None
+
+
+def test_non_blocking_gate_and_template_use_the_cascade():
+    router = _router()
+    advisory = {"id": "performance-gate", "routing": "gate", "blocking": False}
+    template = {"id": "deploy-prep", "routing": "template"}
+    assert router.models_for(advisory, OWN, attempt=1) == [FAST, OWN]
+    assert router.models_for(template, OWN, attempt=1) == [FAST, OWN]
+    assert router.models_for(template, OWN, attempt=2) == [OWN]
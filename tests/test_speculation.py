@@ -0,0 +1,28 @@
+# tests/test_speculation.py
+"""Speculative shadow runs write only into their own workspace."""
+
+from __future__ import annotations
+
+import asyncio
+
+
+def test_shadow_agent_keeps_plans_in_the_shadow(make_agent, base_dir):
+    from orchestrator.cache import PlanCache
+    from orchestrator.speculation import Speculation, SpeculativeExecutor
+
+    agent = make_agent(lambda kwargs: "")
+    agent.plan_cache = PlanCache(agent.config, max_age_seconds=60)
+    executor = SpeculativeExecutor(agent.config, "state/speculative")
+
+    async def main():
+        speculation = Speculation(executor, agent, "checkpoint:design", {}, "p1", None)
+        speculation.start()
+        shadow = speculation.shadow
+        shadow.plan_cache.put("p1", "architect", "key", "the plan", 10)
+        assert shadow.plan_cache.get("p1", "architect", "key") == ("the plan", 10)
+        assert shadow.plan_cache.max_age_seconds == 60
+        await speculation.discard()
+
+    asyncio.run(main())
+    assert agent.plan_cache.get("p1", "architect", "key") is None
+    assert not (base_dir / "products/p1/state/plans").exists()
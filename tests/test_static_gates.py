@@ -0,0 +1,90 @@
+# tests/test_static_gates.py
+"""Static security pre-check: CSP sources and heuristic findings."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+NEXT_CONFIG = """\
+const nextConfig = {
+  async headers() {
+    return [{ source: '/(.*)', headers: [
+      { key: 'Content-Security-Policy', value: "default-src 'self'" },
+    ] }]
+  },
+}
+export default nextConfig
+"""
+SINK_JS = "export function render(el, items) {\n  el.innerHTML = items.map(escape).join('');\n}\n"
+
+
+@pytest.fixture
+def gates(base_dir):
+    from orchestrator.config import PipelineConfig
+    from orchestrator.static_gates import StaticGates
+
+    app = base_dir / "products/p1/app"
+    app.mkdir(parents=True)
+    (app / "vercel.json").write_text(json.dumps({"headers": []}))
+    return StaticGates.from_config(PipelineConfig(base_dir=str(base_dir))), app
+
+
+def test_csp_from_next_config_is_accepted(gates):
+    static, app = gates
+    assert [f.rule for f in static.run("security", "p1").findings] == ["csp_missing"]
+
+    (app / "next.config.mjs").write_text(NEXT_CONFIG)
+    static.config.store.invalidate(app / "next.config.mjs")
+    assert static.run("security", "p1").findings == []
+
+
+def test_heuristic_findings_never_replace_the_llm_gate(gates):
+    static, app = gates
+    assert static.on_red == "narrow"
+    (app / "render.js").write_text(SINK_JS)
+
+    report = static.run("security", "p1")
+    assert report.decision == "RED"
+    assert {f.rule for f in report.findings} == {"csp_missing", "unsafe_html_sink"}
+    assert not report.conclusive
+    assert "may be false positives" in report.as_context()
+
+    # A definitive finding alongside a heuristic one still goes to the LLM
+    (app / "index.html").write_text('<html lang="en"><body><a onclick="go()">x</a></body></html>')
+    assert not static.run("security", "p1").conclusive
+
+    # Definitive findings only: the static report may stand in for the gate's
+    (app / "render.js").unlink()
+    (app / "next.config.mjs").write_text(NEXT_CONFIG)
+    report = static.run("security", "p1")
+    assert [f.rule for f in report.findings] == ["inline_event_handler"]
+    assert report.conclusive
+
+
+def test_build_output_is_skipped_and_typescript_is_scanned(gates):
+    static, app = gates
+    (app / "next.config.mjs").write_text(NEXT_CONFIG)
+    for build_dir in (".next/static/chunks", "out", "dist"):
+        (app / build_dir).mkdir(parents=True)
+        (app / build_dir / "bundle.js").write_text(SINK_JS + "console.log(1)\n" * 40000)
+    assert static.run("security", "p1").findings == []
+    assert static.run("performance", "p1").findings == []
+
+    (app / "components").mkdir()
+    (app / "components/Post.tsx").write_text(
+        "export function Post({ body }: { body: string }) {\n"
+        "  console.log(body)\n"
+        "  return <div dangerouslySetInnerHTML={{ __html: body }} />\n"
+        "}\n"
+    )
+    assert [(f.rule, f.line) for f in static.run("security", "p1").findings] == [("unsafe_html_sink", 3)]
+    assert [f.rule for f in static.run("quality", "p1").findings] == ["console_log"]
+
+    # App sources count toward the JS budget; type declarations and tests do not
+    (app / "components/big.ts").write_text("export const x = 1;\n" * 6000)
+    (app / "components/big.test.ts").write_text("export const x = 1;\n" * 30000)
+    (app / "types.d.ts").write_text("export type X = number;\n" * 30000)
+    [budget] = static.run("performance", "p1").findings
+    assert budget.rule == "budget_js_total" and budget.severity == "LOW"
@@ -0,0 +1,53 @@
+# tests/test_validators.py
+"""OutcomeValidator result cache and the Validator base class."""
+
+from __future__ import annotations
+
+import pytest
+
+
+def test_cached_failure_names_the_file_being_checked(base_dir):
+    from orchestrator.config import PipelineConfig
+    from orchestrator.validators import OutcomeValidator
+
+    for product in ("p1", "p2"):
+        path = base_dir / f"products/{product}/app/manifest.json"
+        path.parent.mkdir(parents=True)
+        path.write_text('{"name": "app",')          # same invalid content in both
+
+    validator = OutcomeValidator(PipelineConfig(base_dir=str(base_dir)))
+    agent = {"id": "writer", "output_format": "mixed"}
+    first = validator.validate(validator.load(["products/p1/app/manifest.json"]), agent)
+    second = validator.validate(validator.load(["products/p2/app/manifest.json"]), agent)
+
+    assert first and "products/p1/app/manifest.json" in first
+    assert second and "products/p2/app/manifest.json" in second
+    assert "products/p1" not in second
+
+    again = validator.validate(validator.load(["products/p2/app/manifest.json"]), agent)
+    assert again == second and validator.cache_hits >= 1
+
+
+def test_result_cache_is_bounded(base_dir, monkeypatch):
+    from orchestrator import validators
+    from orchestrator.config import PipelineConfig
+
+    monkeypatch.setattr(validators, "_MAX_CACHED_RESULTS", 3)
+    validator = validators.OutcomeValidator(PipelineConfig(base_dir=str(base_dir)))
+    agent = {"id": "writer", "output_format": "mixed"}
+    for i in range(5):
+        path = base_dir / f"products/p1/app/data-{i}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f'{{"n": {i}}}')
+        assert validator.validate(validator.load([f"products/p1/app/data-{i}.json"]), agent) is None
+    assert len(validator._results) == 3
+
+
+def test_validator_without_check_cannot_be_registered():
+    from orchestrator.validators import Validator, ValidatorRegistry
+
+    class Incomplete(Validator):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        ValidatorRegistry().register("*")(Incomplete)